@@ -2,9 +2,12 @@ import streamlit as st
 import pandas as pd
 from datetime import datetime, date as date_class
 import os
+import sqlite3
 import pytz
 from utils.google_sheets import fetch_google_sheet_data, fetch_initial_balances
 from utils.data_processor import process_data, format_currency_brl
+from utils.incremental import refresh_derived_data
+from utils.balance_store import empty_balances, load_initial_balances
 from views.monthly_view import show_monthly_view
 from views.period_view import show_period_view
 from views.yearly_view import show_yearly_view
@@ -12,6 +15,7 @@ from views.company_view import show_company_view
 from views.daily_view import show_daily_view
 from views.settings_view import show_settings_view
 from views.initial_balances_view import show_initial_balances_view
+from utils.profiler import profile_view, show_profiler_panel
 from config import load_config, save_config, APP_TITLE, APP_ICON
 import json
 
@@ -27,11 +31,11 @@ try:
     config = load_config()
 except json.JSONDecodeError:
     st.warning("Arquivo de configuração corrompido. Resetando para padrão.")
-    config = {"sheet_url": "", "gs_selected_sheet": "", "initial_balances": []}
+    config = {"sheet_url": "", "gs_selected_sheet": ""}
     save_config(config)
 except FileNotFoundError:
     st.info("Arquivo de configuração não encontrado. Criando um novo.")
-    config = {"sheet_url": "", "gs_selected_sheet": "", "initial_balances": []}
+    config = {"sheet_url": "", "gs_selected_sheet": ""}
     save_config(config)
 
 # Inicialização das variáveis de sessão
@@ -42,34 +46,16 @@ if 'sheet_url' not in st.session_state:
 if 'gs_selected_sheet' not in st.session_state:
     st.session_state.gs_selected_sheet = config.get('gs_selected_sheet', '')
 if 'initial_balances' not in st.session_state:
-    # Carrega saldos iniciais da configuração
-    if 'initial_balances' in config and config['initial_balances']:
-        try:
-            balances_data = config['initial_balances']
-            if isinstance(balances_data, list) and all(isinstance(item, dict) for item in balances_data):
-                initial_balances_df = pd.DataFrame(balances_data)
-                if not initial_balances_df.empty:
-                    if 'Date' in initial_balances_df.columns:
-                         # Converter a coluna Date para datetime
-                         initial_balances_df['Date'] = pd.to_datetime(initial_balances_df['Date'])
-                         st.session_state.initial_balances = initial_balances_df
-                    else:
-                        st.warning("Coluna 'Date' não encontrada nos saldos iniciais. Inicializando vazio.")
-                        st.session_state.initial_balances = pd.DataFrame(columns=['Company', 'Balance', 'Date'])
-                else:
-                    st.session_state.initial_balances = pd.DataFrame(columns=['Company', 'Balance', 'Date'])
-            else:
-                 st.warning("Formato inválido dos saldos iniciais na configuração. Inicializando vazio.")
-                 st.session_state.initial_balances = pd.DataFrame(columns=['Company', 'Balance', 'Date'])
-        except (ValueError, KeyError) as e:
-            st.error(f"Erro ao processar saldos iniciais da configuração: {e}. Inicializando vazio.")
-            st.session_state.initial_balances = pd.DataFrame(columns=['Company', 'Balance', 'Date'])
-    else:
-        st.session_state.initial_balances = pd.DataFrame(columns=['Company', 'Balance', 'Date']) # Inicializa como DataFrame vazio
+    # Carrega saldos iniciais da tabela indexada (a lista antiga da configuração é migrada na primeira carga)
+    try:
+        st.session_state.initial_balances = load_initial_balances()
+    except sqlite3.Error as e:
+        st.error(f"Erro ao carregar saldos iniciais: {e}. Inicializando vazio.")
+        st.session_state.initial_balances = empty_balances()
 
 # Garantir que initial_balances seja sempre um DataFrame
 if not isinstance(st.session_state.initial_balances, pd.DataFrame):
-    st.session_state.initial_balances = pd.DataFrame(columns=['Company', 'Balance', 'Date'])
+    st.session_state.initial_balances = empty_balances()
 
 if 'last_refresh' not in st.session_state:
     st.session_state.last_refresh = None
@@ -90,9 +76,13 @@ if st.session_state.sheet_url and st.session_state.gs_selected_sheet and st.sess
         st.error(f"Erro ao carregar dados automaticamente: {e}")
         st.session_state.data = None # Limpar dados em caso de erro
 
-def load_data():
+def load_data(previous_data=None):
     """
     Carrega os dados do Google Sheets ou arquivo local, dependendo da configuração.
+    
+    Args:
+        previous_data (pandas.DataFrame, optional): Versão anterior dos dados; quando a
+            nova versão apenas acrescenta linhas, as agregações são atualizadas só com elas
     """
     try:
         if st.session_state.current_data_source == "google_sheets":
@@ -125,6 +115,8 @@ def load_data():
             
         if df is not None and not df.empty:
             df = process_data(df)
+            if previous_data is not None:
+                refresh_derived_data(previous_data, df)
             st.session_state.data = df
             st.session_state.last_refresh = datetime.now()
             return df
@@ -143,7 +135,7 @@ with st.sidebar:
     st.header("Navegação")
     view = st.radio(
         "Selecione a visualização",
-        ["Visão por Empresa", "Visão Diária", "Visão Mensal", "Saldos Iniciais", "Configurações"]
+        ["Visão por Empresa", "Visão Diária", "Visão Mensal", "Visão Anual", "Saldos Iniciais", "Configurações"]
     )
     
     # Mostrar última atualização se houver dados
@@ -152,38 +144,50 @@ with st.sidebar:
     
     # Botão para forçar atualização dos dados
     if st.button("Atualizar Dados"):
+        previous_data = st.session_state.data
         st.session_state.data = None
         st.session_state.last_refresh = None
-        if load_data():
+        if load_data(previous_data) is not None:
             st.success("Dados atualizados com sucesso!")
         else:
             st.error("Erro ao atualizar os dados.")
 
+    # Perfilador de renderização (tempo, linhas e bytes por etapa de cada rerun)
+    st.checkbox("Modo diagnóstico", key="diagnostics_mode")
+
 # Carregar dados se necessário
 if st.session_state.data is None:
     if not load_data():
         st.warning("Por favor, configure a fonte de dados nas Configurações antes de visualizar.")
 
 # Mostrar a visualização selecionada
-if view == "Visão por Empresa":
-    if st.session_state.data is not None:
-        show_company_view(st.session_state.data)
-    else:
-        st.warning("Por favor, carregue os dados nas Configurações antes de visualizar.")
-elif view == "Visão Diária":
-    if st.session_state.data is not None:
-        show_daily_view(st.session_state.data, st.session_state.initial_balances)
-    else:
-        st.warning("Por favor, carregue os dados nas Configurações antes de visualizar.")
-elif view == "Visão Mensal":
-    if st.session_state.data is not None:
-        show_monthly_view(st.session_state.data)
+with profile_view(view):
+    if view == "Visão por Empresa":
+        if st.session_state.data is not None:
+            show_company_view(st.session_state.data)
+        else:
+            st.warning("Por favor, carregue os dados nas Configurações antes de visualizar.")
+    elif view == "Visão Diária":
+        if st.session_state.data is not None:
+            show_daily_view(st.session_state.data, st.session_state.initial_balances)
+        else:
+            st.warning("Por favor, carregue os dados nas Configurações antes de visualizar.")
+    elif view == "Visão Mensal":
+        if st.session_state.data is not None:
+            show_monthly_view(st.session_state.data)
+        else:
+            st.warning("Por favor, carregue os dados nas Configurações antes de visualizar.")
+    elif view == "Visão Anual":
+        if st.session_state.data is not None:
+            show_yearly_view(st.session_state.data)
+        else:
+            st.warning("Por favor, carregue os dados nas Configurações antes de visualizar.")
+    elif view == "Saldos Iniciais":
+        show_initial_balances_view()
     else:
-        st.warning("Por favor, carregue os dados nas Configurações antes de visualizar.")
-elif view == "Saldos Iniciais":
-    show_initial_balances_view()
-else:
-    show_settings_view()
+        show_settings_view()
+
+show_profiler_panel()
 
 # Rodapé
 st.markdown("---")
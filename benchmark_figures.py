@@ -0,0 +1,94 @@
+"""
+Mede o custo das figuras da comparação entre empresas com e sem o cache de
+especificações (utils.charts.get_figure)
+
+As figuras reproduzem as da visualização (barras por empresa, barras por
+obra, dispersão de margem e tendência diária) sobre dados sintéticos.
+"Sem cache" limpa os caches de figuras e de consultas antes de cada rodada
+(o cubo diário e os níveis de agregação continuam prontos, como em um rerun
+com outro período); "com cache" é a mesma rodada repetida.
+
+Uso: python benchmark_figures.py [linhas] [rodadas]
+"""
+import statistics
+import sys
+import time
+
+import plotly.express as px
+import plotly.graph_objects as go
+
+from tests.helpers import make_processed
+from utils.charts import _figure_cache, get_figure, line_trace
+from utils.cube import get_daily_cube
+from utils.query import _result_cache, aggregate
+from utils.rollups import get_rollups
+
+
+def _figures(df, year):
+    filters = {"Year": year}
+    params = ("benchmark", year)
+
+    def overview():
+        data = aggregate(df, ["Company"], filters, pivot="Type", columns=["Entrada", "Saída"], net=("Entrada", "Saída"))
+        fig = go.Figure()
+        fig.add_trace(go.Bar(x=data["Company"], y=data["Entrada"], name="Entrada"))
+        fig.add_trace(go.Bar(x=data["Company"], y=data["Saída"], name="Saída"))
+        fig.add_trace(go.Scatter(x=data["Company"], y=data["Net"], mode="lines+markers", name="Net"))
+        return fig
+
+    def comparison(column):
+        def build():
+            data = aggregate(df, ["Company"], filters, pivot="Type", columns=["Entrada", "Saída"], net=("Entrada", "Saída"))
+            return px.bar(data, x="Company", y=column, color=column)
+        return build
+
+    def by_work():
+        data = aggregate(df, ["Company", "Work"], filters, pivot="Type", columns=["Entrada", "Saída"], net=("Entrada", "Saída"))
+        return px.bar(data, x="Company", y="Net", color="Work")
+
+    def scatter():
+        data = aggregate(df, ["Company"], filters, pivot="Type", columns=["Entrada", "Saída"], net=("Entrada", "Saída"))
+        return px.scatter(data, x="Entrada", y="Net", size=data["Net"].abs(), color="Company", size_max=50)
+
+    def trend():
+        data = aggregate(df, ["Date"], filters, pivot="Type", columns=["Entrada", "Saída"], net=("Entrada", "Saída"))
+        return go.Figure([line_trace(data["Date"], data["Net"], name="Net")])
+
+    builders = {
+        "overview": overview,
+        "income": comparison("Entrada"),
+        "net": comparison("Net"),
+        "by_work": by_work,
+        "margin": scatter,
+        "trend": trend,
+    }
+    return [get_figure(df, view, params, build) for view, build in builders.items()]
+
+
+def _timed(function):
+    start = time.perf_counter()
+    function()
+    return (time.perf_counter() - start) * 1000
+
+
+def main(n_rows=50_000, rounds=5):
+    df = make_processed(n=n_rows, seed=0, start="2022-01-01", days=1460)
+    get_daily_cube(df)
+    get_rollups(df)
+    year = int(df["Year"].max())
+
+    cold = []
+    cached = []
+    for _ in range(rounds):
+        _figure_cache.clear()
+        _result_cache.clear()
+        cold.append(_timed(lambda: _figures(df, year)))
+        cached.append(_timed(lambda: _figures(df, year)))
+
+    print(f"{n_rows} linhas, 6 figuras, {rounds} rodadas (mediana)")
+    print(f"  sem cache: {statistics.median(cold):8.1f} ms")
+    print(f"  com cache: {statistics.median(cached):8.1f} ms")
+
+
+if __name__ == "__main__":
+    main(*(int(argument) for argument in sys.argv[1:]))
@@ -9,6 +9,7 @@ APP_TITLE = "Painel Financeiro do Grupo Combrasen"
 APP_ICON = "💰"
 DEFAULT_DATA_FILE = "example_financial_data.xlsx"
 CONFIG_FILE = ".streamlit/config.json"
+BALANCES_DB = ".streamlit/initial_balances.db"
 
 # Configurações de cores
 COLORS = {
@@ -0,0 +1,8 @@
+import pytest
+
+from tests.helpers import make_processed
+
+
+@pytest.fixture(scope="session")
+def processed_df():
+    return make_processed()
@@ -0,0 +1,31 @@
+import numpy as np
+import pandas as pd
+
+COMPANIES = ["Combrasen", "SPE Gama 1", "SPE Delta"]
+WORKS = ["Obra 1", "Obra 2", "Obra 3", None]
+COUNTERPARTIES = ["Fornecedor A", "Fornecedor B", "Cliente X", None]
+
+
+def make_processed(n=5000, seed=0, start="2023-01-01", days=900, companies=COMPANIES):
+    """
+    Gera transações no formato de utils.data_processor.process_data
+
+    Cerca de um quarto das linhas não tem Obra e parte não tem
+    Fornecedor/Cliente, como nas planilhas reais.
+    """
+    rng = np.random.default_rng(seed)
+    dates = pd.Timestamp(start) + pd.to_timedelta(rng.integers(0, days, n), unit="D")
+    df = pd.DataFrame({
+        "Company": rng.choice(companies, n),
+        "Type": rng.choice(["Entrada", "Saída"], n, p=[0.4, 0.6]),
+        "Work": rng.choice(np.array(WORKS, dtype=object), n),
+        "Supplier/Client": rng.choice(np.array(COUNTERPARTIES, dtype=object), n),
+        "Value": rng.integers(100, 100_000, n) / 100,
+        "Date": dates,
+    })
+    df["Year"] = df["Date"].dt.year
+    df["Month"] = df["Date"].dt.month
+    df["Month Name"] = df["Date"].dt.strftime("%b")
+    df["Quarter"] = df["Date"].dt.quarter
+    df["Period"] = df["Date"].dt.strftime("%Y-%m")
+    return df.sort_values("Date", kind="stable").reset_index(drop=True)
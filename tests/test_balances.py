@@ -0,0 +1,62 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.balances import get_balance_index
+
+COMPANY = "SPE Gama 1"
+
+
+def _naive_closing(df, companies=None):
+    # Fluxo líquido diário (Saída negativa) acumulado em dias corridos
+    data = df if companies is None else df[df["Company"].isin(companies)]
+    signed = data["Value"].where(data["Type"] == "Entrada", -data["Value"])
+    daily = signed.groupby(data["Date"].dt.normalize()).sum()
+    days = pd.date_range(df["Date"].min().normalize(), df["Date"].max().normalize(), freq="D")
+    return daily.reindex(days, fill_value=0).cumsum()
+
+
+@pytest.fixture(scope="module")
+def index(processed_df):
+    return get_balance_index(processed_df)
+
+
+@pytest.mark.parametrize("companies", [None, COMPANY, ["Combrasen", "SPE Delta"]])
+def test_closing_balance_matches_cumsum(processed_df, index, companies):
+    names = [companies] if isinstance(companies, str) else companies
+    expected = _naive_closing(processed_df, names)
+
+    assert np.allclose(index.closing_balance(expected.index, companies), expected.to_numpy())
+
+
+def test_opening_balance_and_net_flow(processed_df, index):
+    expected = _naive_closing(processed_df, [COMPANY])
+    daily = expected.diff().fillna(expected.iloc[0])
+
+    opening = index.opening_balance(expected.index, COMPANY)
+    assert np.allclose(opening, expected.to_numpy() - daily.to_numpy())
+
+    start, end = expected.index[100], expected.index[400]
+    assert np.isclose(index.net_flow(start, end, COMPANY), daily.loc[start:end].sum())
+
+
+def test_dates_outside_the_index(processed_df, index):
+    expected = _naive_closing(processed_df)
+    before = expected.index[0] - pd.Timedelta(days=30)
+    after = expected.index[-1] + pd.Timedelta(days=30)
+
+    closing = index.closing_balance([before, after])
+    assert np.allclose(closing, [0.0, expected.iloc[-1]])
+
+
+def test_anchor_is_opening_balance_of_its_date(processed_df, index):
+    expected = _naive_closing(processed_df, [COMPANY])
+    anchor_day = expected.index[200]
+    anchors = {COMPANY: (10_000.0, anchor_day.date()), "Sem Movimento": (500.0, anchor_day.date())}
+    shift = 10_000.0 - index.opening_balance([anchor_day], COMPANY)[0]
+
+    assert np.isclose(index.opening_balance([anchor_day], COMPANY, anchors)[0], 10_000.0)
+    assert np.allclose(index.closing_balance(expected.index, COMPANY, anchors), expected.to_numpy() + shift)
+    # Empresa ancorada sem movimentação soma um saldo constante ao total
+    total = index.closing_balance(expected.index, [COMPANY, "Sem Movimento"], anchors)
+    assert np.allclose(total, expected.to_numpy() + shift + 500.0)
@@ -0,0 +1,66 @@
+import numpy as np
+import pandas as pd
+
+from utils.company_metrics import RANKED_MEASURES, build_company_metrics
+
+
+def _expected_totals(df):
+    totals = df.groupby(["Company", "Type"]).Value.sum().unstack(fill_value=0)
+    totals["Net"] = totals["Entrada"] - totals["Saída"]
+    return totals
+
+
+def test_company_totals_match_groupby(processed_df):
+    companies = build_company_metrics(processed_df, {})["companies"].set_index("Company").sort_index()
+    expected = _expected_totals(processed_df)
+
+    assert list(companies.index) == list(expected.index)
+    for column in ["Entrada", "Saída", "Net"]:
+        assert np.allclose(companies[column], expected[column])
+
+
+def test_company_totals_keep_transactions_without_work(processed_df):
+    assert processed_df["Work"].isna().any()
+    companies = build_company_metrics(processed_df, {"Year": 2024})["companies"].set_index("Company").sort_index()
+    expected = _expected_totals(processed_df[processed_df["Year"] == 2024])
+
+    assert np.allclose(companies["Entrada"], expected["Entrada"])
+    assert np.allclose(companies["Saída"], expected["Saída"])
+
+
+def test_margins_and_rankings(processed_df):
+    metrics = build_company_metrics(processed_df, {"Year": 2023, "Quarter": 2})
+    companies = metrics["companies"]
+
+    assert np.allclose(companies["Profit Margin"], companies["Net"] * 100 / companies["Entrada"])
+    assert np.allclose(companies["Expense Ratio"], companies["Saída"] * 100 / companies["Entrada"])
+    assert companies["Net"].is_monotonic_decreasing
+    for measure in RANKED_MEASURES:
+        ranking = metrics["rankings"][measure]
+        assert list(ranking["Rank"]) == list(range(1, len(companies) + 1))
+        assert ranking[measure].is_monotonic_decreasing
+        assert sorted(ranking["Company"]) == sorted(companies["Company"])
+
+
+def test_by_work_matches_groupby(processed_df):
+    by_work = build_company_metrics(processed_df, {})["by_work"].set_index(["Company", "Work"]).sort_index()
+    expected = processed_df.groupby(["Company", "Work", "Type"]).Value.sum().unstack(fill_value=0)
+
+    pd.testing.assert_index_equal(by_work.index, expected.index)
+    assert np.allclose(by_work["Entrada"], expected["Entrada"])
+    assert np.allclose(by_work["Saída"], expected["Saída"])
+
+
+def test_metrics_come_from_one_query(processed_df, monkeypatch):
+    import utils.company_metrics as company_metrics
+
+    calls = []
+    original = company_metrics.aggregate
+
+    def counting_aggregate(*args, **kwargs):
+        calls.append(args[1])
+        return original(*args, **kwargs)
+
+    monkeypatch.setattr(company_metrics, "aggregate", counting_aggregate)
+    build_company_metrics(processed_df, {"Year": 2023, "Quarter": 2})
+    assert calls == [["Company", "Work"]]
@@ -0,0 +1,24 @@
+import pytest
+
+from utils.data_processor import BRL_NUMBER_FORMAT, format_currency_brl
+
+
+def test_money_columns_use_localized_format():
+    # Formatos printf ("R$ %.2f") exibiriam 1234.56 em vez de 1.234,56
+    assert BRL_NUMBER_FORMAT == "localized"
+
+
+def test_brl_column_config_renders_localized_currency():
+    pytest.importorskip("streamlit")
+    from utils.display import brl_column_config
+
+    config = brl_column_config("Receitas", percent=("Margem de Lucro",))
+    money = config["Receitas"]
+    assert money["label"] == "Receitas (R$)"
+    assert money["type_config"]["format"] == "localized"
+    assert money["type_config"]["step"] == 0.01
+    assert config["Margem de Lucro"]["type_config"]["format"] == "%.2f%%"
+
+
+def test_text_formatting_keeps_brazilian_separators():
+    assert format_currency_brl(1234567.891) == "R$ 1.234.567,89"
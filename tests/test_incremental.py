@@ -0,0 +1,152 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.balances import build_balance_index, get_balance_index
+from utils.cache import get_dataset_version
+from utils.cube import _cube_cache, build_daily_cube, get_daily_cube
+from utils.incremental import find_appended_rows, match_row_positions, refresh_derived_data
+from utils.monthly import _matrix_cache, build_monthly_matrix, get_monthly_matrix
+from utils.rollups import _rollup_cache, build_rollups, get_rollups
+from utils.topn import _topn_cache, build_topn_index, get_topn_index, top_counterparties, top_transactions
+from utils.yearly import _summary_cache, build_yearly_summary, get_yearly_summary
+
+from tests.helpers import make_processed
+
+
+def _append(previous_df, delta_df):
+    # Mesma ordenação de utils.data_processor.process_data
+    combined = pd.concat([previous_df, delta_df], ignore_index=True)
+    return combined.sort_values("Date", kind="stable").reset_index(drop=True)
+
+
+@pytest.fixture
+def versions():
+    previous_df = make_processed(n=3000, seed=1, start="2023-06-01", days=400)
+    # Linhas novas: período seguinte e dias já existentes, uma empresa nova,
+    # transações sem Obra e cópias exatas de linhas antigas
+    delta_df = pd.concat([
+        make_processed(n=400, seed=2, start="2024-06-01", days=120),
+        make_processed(n=50, seed=3, start="2024-03-01", days=30, companies=["SPE Nova"]),
+        previous_df.sample(25, random_state=4),
+    ], ignore_index=True)
+    delta_df.loc[delta_df.index[::7], "Work"] = None
+    delta_df.loc[delta_df.index[::11], "Supplier/Client"] = "Cliente Novo"
+    return previous_df, delta_df, _append(previous_df, delta_df)
+
+
+@pytest.fixture
+def refreshed(versions):
+    previous_df, delta_df, new_df = versions
+    # Estruturas da versão anterior em cache, como depois de navegar pelas telas
+    get_daily_cube(previous_df)
+    get_balance_index(previous_df)
+    get_rollups(previous_df)
+    get_monthly_matrix(previous_df)
+    get_yearly_summary(previous_df)
+    get_topn_index(previous_df)
+
+    assert refresh_derived_data(previous_df, new_df) == len(delta_df)
+    return new_df, build_daily_cube(new_df)
+
+
+def test_refresh_matches_full_rebuild(refreshed):
+    new_df, expected_cube = refreshed
+
+    cube = _cube_cache.get(get_dataset_version(new_df))
+    assert cube is not None
+    pd.testing.assert_frame_equal(cube, expected_cube, check_exact=False)
+
+    index = get_balance_index(new_df)
+    expected_index = build_balance_index(expected_cube)
+    assert index.companies == expected_index.companies
+    assert "SPE Nova" in index.companies
+    assert index.start_day == expected_index.start_day
+    assert index.cumulative.shape == expected_index.cumulative.shape
+    assert np.allclose(index.cumulative, expected_index.cumulative)
+
+
+def test_refresh_merges_rollups(refreshed):
+    new_df, expected_cube = refreshed
+
+    rollups = _rollup_cache.get(get_dataset_version(new_df))
+    assert rollups is not None
+    for level, expected in build_rollups(expected_cube).items():
+        pd.testing.assert_frame_equal(rollups[level], expected, check_exact=False, obj=level)
+
+
+def test_refresh_merges_monthly_and_yearly(refreshed):
+    new_df, _ = refreshed
+    key = (get_dataset_version(new_df), "Entrada", "Saída")
+    assert key in _matrix_cache and key in _summary_cache
+
+    matrix = get_monthly_matrix(new_df)
+    expected_matrix = build_monthly_matrix(new_df)
+    assert list(matrix.years) == list(expected_matrix.years)
+    assert np.allclose(matrix.values, expected_matrix.values)
+
+    summary = get_yearly_summary(new_df)
+    expected_summary = build_yearly_summary(new_df)
+    for dimension, table in expected_summary.categories.items():
+        pd.testing.assert_frame_equal(summary.categories[dimension], table, check_exact=False)
+        assert summary.category_counts[dimension] == expected_summary.category_counts[dimension]
+    pd.testing.assert_frame_equal(summary.year_over_year(), expected_summary.year_over_year())
+
+
+def test_refresh_merges_topn_index(refreshed):
+    new_df, _ = refreshed
+
+    index = _topn_cache.get(get_dataset_version(new_df))
+    assert index is not None
+    expected = build_topn_index(new_df)
+    assert list(index.months) == list(expected.months)
+    assert (index.first_day, index.last_day) == (expected.first_day, expected.last_day)
+    assert (np.asarray(index.row_types) == np.asarray(expected.row_types)).all()
+    assert np.array_equal(index.row_values, expected.row_values)
+
+    for transaction_type, by_month in expected.values.items():
+        assert by_month.keys() == index.values[transaction_type].keys()
+        for key, values in by_month.items():
+            assert np.allclose(index.values[transaction_type][key], values)
+            # As posições convertidas apontam para linhas com os mesmos valores
+            positions = index.candidates[transaction_type][key]
+            assert np.allclose(new_df["Value"].to_numpy()[positions], values)
+            assert (new_df["Type"].to_numpy()[positions] == transaction_type).all()
+
+        merged = dict(zip(index.counterparties, zip(*index.counterparty_totals(
+            [(year, month) for year in (2023, 2024) for month in range(1, 13)], transaction_type
+        ))))
+        naive = new_df[new_df["Type"] == transaction_type].groupby("Supplier/Client")["Value"].agg(["sum", "size"])
+        for name, row in naive.iterrows():
+            assert np.isclose(merged[name][0], row["sum"]) and merged[name][1] == row["size"]
+
+    filters = {"start_date": "2024-02-10", "end_date": "2024-08-20"}
+    period = new_df[(new_df["Date"] >= "2024-02-10") & (new_df["Date"] < "2024-08-21")]
+    outflows = period[period["Type"] == "Saída"]
+    assert np.allclose(top_transactions(new_df, filters, "Saída")["Value"], outflows["Value"].nlargest(10))
+    expected_counterparties = outflows.groupby("Supplier/Client")["Value"].sum().nlargest(3)
+    result = top_counterparties(new_df, filters, "Saída", k=3)
+    assert list(result["Supplier/Client"]) == list(expected_counterparties.index)
+    assert np.allclose(result["Value"], expected_counterparties)
+
+
+def test_find_appended_rows_counts_duplicates(versions):
+    previous_df, delta_df, new_df = versions
+
+    appended = find_appended_rows(previous_df, new_df)
+    assert len(appended) == len(delta_df)
+    assert np.isclose(appended["Value"].sum(), delta_df["Value"].sum())
+
+    positions = match_row_positions(previous_df, new_df)
+    assert len(np.unique(positions)) == len(previous_df)
+    pd.testing.assert_frame_equal(new_df.iloc[positions].reset_index(drop=True), previous_df)
+
+
+def test_changed_history_is_not_incremental(versions):
+    previous_df, _, new_df = versions
+
+    changed = new_df.copy()
+    changed.loc[0, "Value"] += 1
+    assert find_appended_rows(previous_df, changed) is None
+    assert find_appended_rows(previous_df, previous_df.iloc[1:].reset_index(drop=True)) is None
+    assert refresh_derived_data(previous_df, previous_df.copy()) == 0
@@ -0,0 +1,42 @@
+from datetime import datetime
+
+import numpy as np
+import pytest
+
+pytest.importorskip("streamlit")
+
+from utils import profiler  # noqa: E402
+from utils.profiler import profile_fragment, rerun_percentiles  # noqa: E402
+
+
+def _run(view, total):
+    return {"view": view, "timestamp": datetime(2024, 1, 1), "stages": [], "total": total}
+
+
+def test_rerun_percentiles_by_view():
+    history = [_run("Visão Diária", seconds / 1000) for seconds in range(1, 21)]
+    history.append(_run("Cenários (fragmento)", 0.005))
+    percentiles = rerun_percentiles(history).set_index("Visualização")
+
+    assert list(percentiles.index) == ["Cenários (fragmento)", "Visão Diária"]
+    assert percentiles.loc["Visão Diária", "Reruns"] == 20
+    assert np.isclose(percentiles.loc["Visão Diária", "p50 (ms)"], np.percentile(range(1, 21), 50))
+    assert np.isclose(percentiles.loc["Visão Diária", "p95 (ms)"], np.percentile(range(1, 21), 95))
+    assert np.isclose(percentiles.loc["Cenários (fragmento)", "p95 (ms)"], 5)
+
+
+def test_fragment_inside_page_run_marks_into_it():
+    run = {"view": "Visão Mensal", "stages": []}
+    profiler._local.run, profiler._local.started, profiler._local.last = run, 0.0, 0.0
+
+    @profile_fragment("Comparação entre anos")
+    def fragment():
+        profiler.mark("Comparação entre anos")
+        return 42
+
+    try:
+        assert fragment() == 42
+        assert fragment.__name__ == "fragment"
+        assert [stage["stage"] for stage in run["stages"]] == ["Comparação entre anos"]
+    finally:
+        profiler._local.run = None
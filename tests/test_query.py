@@ -0,0 +1,109 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.query import aggregate, canonical_spec
+
+
+def _naive(df, group_by, filters=None, measure="Value", pivot=None, dropna=True):
+    # Filtro + groupby direto nas transações, para comparação com o cubo/rollups
+    filters = dict(filters or {})
+    mask = pd.Series(True, index=df.index)
+    if "start_date" in filters:
+        mask &= df["Date"] >= pd.Timestamp(filters.pop("start_date"))
+    if "end_date" in filters:
+        mask &= df["Date"] < pd.Timestamp(filters.pop("end_date")) + pd.Timedelta(days=1)
+    for name, value in filters.items():
+        mask &= df[name].isin(value) if isinstance(value, list) else df[name] == value
+    data = df[mask]
+    keys = list(group_by) + ([pivot] if pivot else [])
+    grouped = data.groupby(keys, dropna=dropna)["Value"]
+    result = grouped.size() if measure == "Count" else grouped.sum()
+    if pivot:
+        result = result.unstack(fill_value=0)
+    return result
+
+
+def _indexed(result, group_by):
+    return result.set_index(list(group_by)).sort_index()
+
+
+@pytest.mark.parametrize("group_by, filters", [
+    (["Company"], {}),
+    (["Company", "Work"], {}),
+    (["Work", "Supplier/Client"], {"Company": "Combrasen"}),
+    (["Year", "Month"], {}),
+    (["Year", "Quarter", "Company"], {"Company": ["Combrasen", "SPE Delta"]}),
+    (["Company"], {"Year": 2024}),
+    (["Work"], {"Year": 2023, "Quarter": 3}),
+    (["Company"], {"Year": 2024, "Month": 2}),
+    (["Company"], {"start_date": "2023-02-14", "end_date": "2024-05-20"}),
+    (["Month"], {"start_date": "2023-12-30", "end_date": "2024-01-02"}),
+])
+def test_aggregate_matches_groupby(processed_df, group_by, filters):
+    result = _indexed(aggregate(processed_df, group_by, filters, pivot="Type"), group_by)
+    expected = _naive(processed_df, group_by, filters, pivot="Type").sort_index()
+
+    assert list(result.index) == list(expected.index)
+    for column in ["Entrada", "Saída"]:
+        assert np.allclose(result[column], expected[column])
+
+
+def test_aggregate_count(processed_df):
+    result = _indexed(aggregate(processed_df, ["Company", "Type"], {"Year": 2023}, measure="Count"), ["Company", "Type"])
+    expected = _naive(processed_df, ["Company", "Type"], {"Year": 2023}, measure="Count")
+
+    assert (result["Count"] == expected.sort_index()).all()
+
+
+def test_aggregate_total_and_net(processed_df):
+    result = aggregate(processed_df, filters={"Company": "SPE Gama 1"}, pivot="Type", net=("Entrada", "Saída"))
+    expected = _naive(processed_df, ["Type"], {"Company": "SPE Gama 1"})
+
+    assert len(result) == 1
+    assert np.isclose(result["Entrada"].iloc[0], expected["Entrada"])
+    assert np.isclose(result["Net"].iloc[0], expected["Entrada"] - expected["Saída"])
+
+
+@pytest.mark.parametrize("granularity, freq", [("day", None), ("week", "W-SUN"), ("month", "M")])
+def test_aggregate_date_granularity(processed_df, granularity, freq):
+    filters = {"Year": 2024, "Type": "Saída"}
+    result = aggregate(processed_df, ["Date"], filters, granularity=granularity).set_index("Date")["Value"]
+
+    data = processed_df[(processed_df["Year"] == 2024) & (processed_df["Type"] == "Saída")]
+    day = data["Date"].dt.normalize()
+    bucket = day if freq is None else day.dt.to_period(freq).dt.start_time
+    expected = data.groupby(bucket.rename("Date"))["Value"].sum()
+
+    pd.testing.assert_index_equal(result.index, expected.index, check_names=False, exact=False)
+    assert np.allclose(result, expected)
+
+
+def test_aggregate_missing_pivot_columns(processed_df):
+    result = aggregate(processed_df, ["Company"], {"Type": "Entrada"}, pivot="Type", columns=["Entrada", "Saída"])
+
+    assert (result["Saída"] == 0).all()
+    assert np.isclose(result["Entrada"].sum(), processed_df.loc[processed_df["Type"] == "Entrada", "Value"].sum())
+
+
+def test_aggregate_dropna(processed_df):
+    kept = aggregate(processed_df, ["Work"], {"Year": 2024}, dropna=False)
+    dropped = aggregate(processed_df, ["Work"], {"Year": 2024})
+    year_total = processed_df.loc[processed_df["Year"] == 2024, "Value"].sum()
+
+    assert kept["Work"].isna().sum() == 1
+    assert dropped["Work"].notna().all()
+    assert np.isclose(kept["Value"].sum(), year_total)
+    assert dropped["Value"].sum() < year_total
+
+
+def test_aggregate_returns_copies(processed_df):
+    first = aggregate(processed_df, ["Company"])
+    first["Value"] = 0
+    assert aggregate(processed_df, ["Company"])["Value"].sum() > 0
+
+
+def test_canonical_spec_ignores_filter_order():
+    assert canonical_spec(["Company"], {"Company": ["B", "A"], "Year": 2024}) == \
+        canonical_spec(["Company"], {"Year": 2024, "Company": ["A", "B"]})
+    assert canonical_spec(["Work"], dropna=True) != canonical_spec(["Work"], dropna=False)
@@ -0,0 +1,35 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+pytest.importorskip("streamlit")
+
+from utils.transaction_grid import SORT_ORDERS, build_sort_permutations, sorted_positions  # noqa: E402
+
+
+def test_descending_is_reverse_of_ascending(processed_df):
+    permutations = build_sort_permutations(processed_df)
+    for column in ["Date", "Value"]:
+        ascending = processed_df.sort_values(column, kind="stable").index.to_numpy()
+        descending = [label for label, (name, flag) in SORT_ORDERS.items() if name == column and flag][0]
+        increasing = [label for label, (name, flag) in SORT_ORDERS.items() if name == column and not flag][0]
+        assert np.array_equal(permutations[increasing], ascending)
+        assert np.array_equal(permutations[descending], ascending[::-1])
+
+
+def test_missing_values_stay_last():
+    df = pd.DataFrame({
+        "Date": pd.to_datetime(["2024-01-02", None, "2024-01-01", "2024-01-02"]),
+        "Value": [1.0, 2.0, np.nan, 1.0],
+    })
+    permutations = build_sort_permutations(df)
+    assert list(permutations["Data (mais recente primeiro)"]) == [3, 0, 2, 1]
+    assert list(permutations["Data (mais antiga primeiro)"]) == [2, 0, 3, 1]
+    assert list(permutations["Valor (maior primeiro)"]) == [1, 3, 0, 2]
+
+
+def test_subset_keeps_global_order(processed_df):
+    subset = processed_df[processed_df["Company"] == "SPE Delta"]
+    order = sorted_positions(processed_df, subset, "Data (mais recente primeiro)")
+    expected = subset.sort_values("Date", kind="stable").index.to_numpy()[::-1]
+    assert np.array_equal(order, expected)
@@ -0,0 +1,49 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from utils.balances import get_balance_index
+from utils.whatif import WhatIfLayer
+
+COMPANY = "SPE Gama 1"
+
+
+@pytest.fixture
+def layer(processed_df):
+    return WhatIfLayer(get_balance_index(processed_df))
+
+
+def test_planned_flow_adds_to_real_balances(layer):
+    days = pd.date_range("2024-03-01", "2024-03-10")
+    real = layer.base.closing_balance(days, COMPANY)
+
+    layer.add_transaction(COMPANY, "2024-03-04", "Saída", 1_000)
+    layer.add_transaction(COMPANY, "2024-03-07", "Entrada", 300)
+    layer.add_transaction("SPE Delta", "2024-03-05", "Entrada", 50_000)
+
+    planned = np.array([0, 0, 0, -1_000, -1_000, -1_000, -700, -700, -700, -700], dtype=float)
+    assert np.allclose(layer.closing_balance(days, COMPANY), real + planned)
+    assert np.allclose(layer.opening_balance(days[3:4], COMPANY), real[2])
+
+
+def test_planned_before_anchor_does_not_move_anchored_balance(layer):
+    anchor_day = pd.Timestamp("2024-03-15")
+    anchors = {COMPANY: (10_000.0, anchor_day.date())}
+    days = pd.date_range(anchor_day, periods=10)
+    real = layer.base.closing_balance(days, COMPANY, anchors)
+
+    # Já refletida no saldo informado da âncora
+    before = layer.add_transaction(COMPANY, "2024-03-01", "Saída", 2_500)
+    assert np.isclose(layer.opening_balance([anchor_day], COMPANY, anchors)[0], 10_000.0)
+    assert np.allclose(layer.closing_balance(days, COMPANY, anchors), real)
+
+    # Prevista na própria data da âncora ou depois: entra no saldo
+    layer.add_transaction(COMPANY, anchor_day, "Entrada", 400)
+    assert np.allclose(layer.closing_balance(days, COMPANY, anchors), real + 400)
+    assert np.allclose(layer.closing_balance(days, None, anchors)[-1:],
+                       layer.base.closing_balance(days[-1:], None, anchors) + 400)
+
+    # Sem âncora, a prevista antiga volta a contar
+    layer.remove_transaction(before)
+    layer.move_transaction(layer.add_transaction(COMPANY, "2024-03-02", "Saída", 100), "2024-03-03")
+    assert np.allclose(layer.closing_balance(days, COMPANY), layer.base.closing_balance(days, COMPANY) + 300)
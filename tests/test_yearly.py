@@ -0,0 +1,85 @@
+import numpy as np
+import pandas as pd
+
+from utils.monthly import get_monthly_matrix
+from utils.yearly import UNASSIGNED_LABELS, build_yearly_summary
+
+DIRECTIONS = {"Income": "Entrada", "Expense": "Saída"}
+
+
+def _by_type(df):
+    return df.groupby("Type").Value.sum().reindex(["Entrada", "Saída"], fill_value=0)
+
+
+def test_year_totals_match_groupby(processed_df):
+    summary = build_yearly_summary(processed_df)
+
+    for year in summary.years:
+        expected = _by_type(processed_df[processed_df["Year"] == year])
+        income, expense, net = summary.totals(year)
+        assert np.isclose(income, expected["Entrada"])
+        assert np.isclose(expense, expected["Saída"])
+        assert np.isclose(net, expected["Entrada"] - expected["Saída"])
+
+
+def test_totals_agree_with_monthly_matrix(processed_df):
+    summary = build_yearly_summary(processed_df)
+    matrix = get_monthly_matrix(processed_df)
+
+    for year in summary.years:
+        frame = matrix.year_frame(year)
+        assert np.isclose(summary.totals(year)[0], frame["Income"].sum())
+        assert np.isclose(summary.totals(year)[1], frame["Expense"].sum())
+
+
+def test_quarterly_and_year_over_year(processed_df):
+    summary = build_yearly_summary(processed_df)
+
+    year = int(summary.years[1])
+    subset = processed_df[processed_df["Year"] == year]
+    expected = subset.groupby(["Quarter", "Type"]).Value.sum().unstack(fill_value=0).reindex(range(1, 5), fill_value=0)
+    quarterly = summary.quarterly(year)
+    assert list(quarterly["Quarter"]) == ["T1", "T2", "T3", "T4"]
+    assert np.allclose(quarterly["Income"], expected["Entrada"])
+    assert np.allclose(quarterly["Expense"], expected["Saída"])
+
+    yearly = summary.year_over_year().set_index("Year")
+    expected = processed_df.groupby(["Year", "Type"]).Value.sum().unstack(fill_value=0)
+    assert list(yearly.index) == list(expected.index)
+    assert np.allclose(yearly["Income"], expected["Entrada"])
+    assert np.allclose(yearly["Net"], expected["Entrada"] - expected["Saída"])
+
+
+def test_categories_add_up_to_year_total(processed_df):
+    summary = build_yearly_summary(processed_df)
+
+    for year in summary.years:
+        subset = processed_df[processed_df["Year"] == year]
+        expected = _by_type(subset)
+        for dimension in UNASSIGNED_LABELS:
+            for direction, type_value in DIRECTIONS.items():
+                values = summary.by_category(year, dimension, direction)
+                assert np.isclose(values["Value"].sum(), expected[type_value])
+
+
+def test_transactions_without_work_are_grouped(processed_df):
+    summary = build_yearly_summary(processed_df)
+    year = int(summary.years[0])
+    subset = processed_df[processed_df["Year"] == year]
+
+    by_work = summary.by_category(year, "Work", "Income").set_index("Work")["Value"]
+    unassigned = subset[subset["Work"].isna() & (subset["Type"] == "Entrada")]["Value"].sum()
+    assert np.isclose(by_work[UNASSIGNED_LABELS["Work"]], unassigned)
+    assert by_work.is_monotonic_decreasing
+
+    # A contagem de obras considera apenas obras informadas
+    assert summary.category_count(year, "Work") == subset["Work"].nunique()
+    assert summary.category_count(year, "Company") == subset["Company"].nunique()
+
+
+def test_missing_year_is_empty(processed_df):
+    summary = build_yearly_summary(processed_df)
+
+    assert summary.by_category(1999, "Work", "Income").empty
+    assert summary.category_count(1999, "Work") == 0
+    assert isinstance(summary.by_category(1999, "Company", "Expense"), pd.DataFrame)
@@ -0,0 +1,183 @@
+import os
+import sqlite3
+from contextlib import contextmanager
+
+import numpy as np
+import pandas as pd
+
+from config import BALANCES_DB, load_config, save_config
+
+BALANCE_COLUMNS = ["Company", "Balance", "Date"]
+
+# Um saldo por empresa e data: a chave primária é o índice da tabela
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS initial_balances (
+    company TEXT NOT NULL,
+    date TEXT NOT NULL,
+    balance REAL NOT NULL,
+    PRIMARY KEY (company, date)
+)
+"""
+
+
+@contextmanager
+def _connect():
+    # Uma transação por bloco: confirmada ao sair, desfeita em caso de erro
+    os.makedirs(os.path.dirname(BALANCES_DB), exist_ok=True)
+    connection = sqlite3.connect(BALANCES_DB)
+    try:
+        with connection:
+            connection.execute(_SCHEMA)
+            yield connection
+    finally:
+        connection.close()
+
+
+def empty_balances():
+    """
+    Tabela de saldos vazia com as colunas esperadas
+
+    Returns:
+        pandas.DataFrame: Colunas Company, Balance e Date (datetime)
+    """
+    return pd.DataFrame({
+        "Company": pd.Series(dtype=object),
+        "Balance": pd.Series(dtype=float),
+        "Date": pd.Series(dtype="datetime64[ns]"),
+    })
+
+
+def load_initial_balances():
+    """
+    Carrega os saldos iniciais da tabela indexada
+
+    Na primeira execução, a lista antiga "initial_balances" do arquivo de
+    configuração é importada para a tabela e removida da configuração.
+
+    Returns:
+        pandas.DataFrame: Colunas Company, Balance e Date, ordenadas por empresa e data
+    """
+    with _connect() as connection:
+        _migrate_config_list(connection)
+        rows = connection.execute(
+            "SELECT company, balance, date FROM initial_balances ORDER BY company, date"
+        ).fetchall()
+    if not rows:
+        return empty_balances()
+    balances = pd.DataFrame(rows, columns=BALANCE_COLUMNS)
+    balances["Date"] = pd.to_datetime(balances["Date"])
+    return balances
+
+
+def _migrate_config_list(connection):
+    config = load_config()
+    if "initial_balances" not in config:
+        return
+    legacy = config.pop("initial_balances")
+    if isinstance(legacy, list) and legacy:
+        balances, errors = validate_balances(pd.DataFrame([item for item in legacy if isinstance(item, dict)]))
+        if errors:
+            print(f"Saldos iniciais inválidos ignorados na migração: {'; '.join(errors)}")
+        # Linhas inválidas ficam de fora; com data repetida vale o último saldo informado
+        connection.executemany(
+            "INSERT OR REPLACE INTO initial_balances (company, date, balance) VALUES (?, ?, ?)",
+            _records(balances.dropna())
+        )
+    save_config(config)
+
+
+def validate_balances(balances):
+    """
+    Valida e normaliza uma tabela de saldos editada
+
+    Linhas totalmente vazias (adicionadas e não preenchidas) são descartadas.
+
+    Args:
+        balances (pandas.DataFrame): Tabela com colunas Company, Balance e Date
+
+    Returns:
+        tuple: (DataFrame normalizado, lista de mensagens de erro); com erros,
+            nada deve ser gravado
+    """
+    if balances is None or balances.empty:
+        return empty_balances(), []
+    missing = [column for column in BALANCE_COLUMNS if column not in balances.columns]
+    if missing:
+        return empty_balances(), [f"Colunas ausentes: {', '.join(missing)}"]
+
+    balances = balances[BALANCE_COLUMNS].dropna(how="all").reset_index(drop=True)
+    company = balances["Company"].astype("string").str.strip()
+    value = pd.to_numeric(balances["Balance"], errors="coerce")
+    date = pd.to_datetime(balances["Date"], errors="coerce").dt.normalize()
+
+    errors = []
+    checks = [
+        (company.isna() | (company == ""), "empresa não informada"),
+        (~np.isfinite(value.to_numpy(dtype=float)), "saldo inválido"),
+        (date.isna(), "data inválida"),
+    ]
+    for invalid, message in checks:
+        errors.extend((position, message) for position in np.flatnonzero(invalid))
+
+    normalized = pd.DataFrame({"Company": company.astype(object), "Balance": value, "Date": date})
+    duplicated = normalized.dropna().duplicated(subset=["Company", "Date"], keep=False)
+    for position in duplicated[duplicated].index:
+        errors.append((position, (
+            f"saldo repetido para {normalized.at[position, 'Company']} "
+            f"em {normalized.at[position, 'Date'].strftime('%d/%m/%Y')}"
+        )))
+    if errors:
+        return normalized, [f"Linha {position + 1}: {message}" for position, message in sorted(errors)]
+    return normalized.sort_values(["Company", "Date"], ignore_index=True), []
+
+
+def save_initial_balances(previous, edited):
+    """
+    Grava as alterações de uma edição em lote em uma única transação
+
+    Compara a tabela editada com a anterior pela chave (empresa, data):
+    somente as linhas removidas são apagadas e somente as novas ou com saldo
+    alterado são gravadas.
+
+    Args:
+        previous (pandas.DataFrame): Saldos antes da edição (já validados)
+        edited (pandas.DataFrame): Saldos após a edição (já validados)
+
+    Returns:
+        dict: Quantidade de linhas em "added", "updated" e "deleted"
+    """
+    before = _keyed(previous)
+    after = _keyed(edited)
+    deleted = before.index.difference(after.index)
+    added = after.index.difference(before.index)
+    common = after.index.intersection(before.index)
+    updated = common[after.loc[common, "Balance"].to_numpy() != before.loc[common, "Balance"].to_numpy()]
+
+    with _connect() as connection:
+        connection.executemany(
+            "DELETE FROM initial_balances WHERE company = ? AND date = ?", list(deleted)
+        )
+        connection.executemany(
+            "INSERT OR REPLACE INTO initial_balances (company, date, balance) VALUES (?, ?, ?)",
+            [(company, date, float(after.at[(company, date), "Balance"])) for company, date in added.append(updated)]
+        )
+    return {"added": len(added), "updated": len(updated), "deleted": len(deleted)}
+
+
+def _keyed(balances):
+    if balances is None or balances.empty:
+        return pd.DataFrame({"Balance": pd.Series(dtype=float)},
+                            index=pd.MultiIndex.from_tuples([], names=["Company", "Date"]))
+    return pd.DataFrame({
+        "Company": balances["Company"],
+        "Date": pd.to_datetime(balances["Date"]).dt.strftime("%Y-%m-%d"),
+        "Balance": balances["Balance"].astype(float),
+    }).set_index(["Company", "Date"])
+
+
+def _records(balances):
+    return list(zip(
+        balances["Company"],
+        pd.to_datetime(balances["Date"]).dt.strftime("%Y-%m-%d"),
+        balances["Balance"].astype(float),
+    ))
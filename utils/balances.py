@@ -0,0 +1,389 @@
+import numpy as np
+import pandas as pd
+
+from utils.cache import LRUCache, get_dataset_version
+from utils.cube import build_daily_cube, get_daily_cube
+
+# Índices de saldo por (versão dos dados, tipo de receita, tipo de despesa)
+_index_cache = LRUCache(maxsize=4)
+
+# Saldos informados ordenados, por versão da tabela de saldos
+_asof_cache = LRUCache(maxsize=4)
+
+
+class BalanceIndex:
+    """
+    Índice de somas prefixadas do fluxo líquido diário por empresa
+
+    O eixo de dias é denso (um dia por coluna, do primeiro ao último dia com
+    movimentação). ``cumulative[c, k]`` guarda o fluxo líquido da empresa ``c``
+    acumulado nos dias anteriores ao dia ``k``, de modo que saldo de abertura,
+    saldo de fechamento e fluxo de um intervalo são consultas diretas no array.
+
+    Saldos iniciais (âncoras) são informados por consulta como
+    ``{empresa: (saldo, data)}``; o saldo de uma âncora é interpretado como o
+    saldo de abertura da data informada. Empresas sem âncora partem de zero
+    antes da primeira movimentação.
+    """
+
+    def __init__(self, start_day, companies, cumulative):
+        self.start_day = np.datetime64(start_day, "D")
+        self.companies = list(companies)
+        self.cumulative = cumulative
+        self._rows = {company: row for row, company in enumerate(self.companies)}
+
+    @property
+    def n_days(self):
+        return self.cumulative.shape[1] - 1
+
+    @property
+    def days(self):
+        return self.start_day + np.arange(self.n_days)
+
+    def _positions(self, dates, shift=0):
+        # Posição de cada data no eixo denso, limitada às bordas do índice
+        dates = np.asarray(pd.to_datetime(dates).values, dtype="datetime64[D]")
+        positions = (dates - self.start_day).astype(np.int64) + shift
+        return np.clip(positions, 0, self.n_days)
+
+    def _select(self, companies):
+        # Linhas do índice e nomes solicitados (None = todas as empresas)
+        if companies is None:
+            return list(range(len(self.companies))), None
+        if isinstance(companies, str):
+            companies = [companies]
+        rows = [self._rows[company] for company in companies if company in self._rows]
+        return rows, set(companies)
+
+    def _offset(self, names, anchors):
+        # Deslocamento que faz a curva acumulada passar pelo saldo de cada âncora;
+        # empresas ancoradas sem movimentação mantêm o saldo constante
+        if not anchors:
+            return 0.0
+        offset = 0.0
+        for name, (balance, anchor_date) in anchors.items():
+            if names is not None and name not in names:
+                continue
+            offset += float(balance)
+            row = self._rows.get(name)
+            if row is not None:
+                offset -= self.cumulative[row, self._positions([anchor_date])[0]]
+        return offset
+
+    def _cumulative_at(self, rows, positions):
+        if not rows:
+            return np.zeros(len(positions))
+        return self.cumulative[rows][:, positions].sum(axis=0)
+
+    def opening_balance(self, dates, companies=None, anchors=None):
+        """
+        Saldo antes das movimentações de cada data
+
+        Args:
+            dates (array-like): Datas consultadas
+            companies (str | list, optional): Empresa(s); None soma todas
+            anchors (dict, optional): Saldos iniciais {empresa: (saldo, data)}
+
+        Returns:
+            numpy.ndarray: Saldo de abertura por data
+        """
+        rows, names = self._select(companies)
+        positions = self._positions(dates)
+        return self._cumulative_at(rows, positions) + self._offset(names, anchors)
+
+    def closing_balance(self, dates, companies=None, anchors=None):
+        """
+        Saldo após as movimentações de cada data (saldo acumulado)
+
+        Args:
+            dates (array-like): Datas consultadas
+            companies (str | list, optional): Empresa(s); None soma todas
+            anchors (dict, optional): Saldos iniciais {empresa: (saldo, data)}
+
+        Returns:
+            numpy.ndarray: Saldo de fechamento por data
+        """
+        rows, names = self._select(companies)
+        positions = self._positions(dates, shift=1)
+        return self._cumulative_at(rows, positions) + self._offset(names, anchors)
+
+    def net_flow(self, start_date, end_date, companies=None):
+        """
+        Fluxo líquido acumulado entre duas datas (inclusive)
+
+        Args:
+            start_date (date): Data inicial
+            end_date (date): Data final
+            companies (str | list, optional): Empresa(s); None soma todas
+
+        Returns:
+            float: Receitas menos despesas no intervalo
+        """
+        return float(
+            self.closing_balance([end_date], companies)[0]
+            - self.opening_balance([start_date], companies)[0]
+        )
+
+
+def build_balance_index(cube, income_type="Entrada", expense_type="Saída"):
+    """
+    Constrói o índice de saldos a partir do cubo diário
+
+    Args:
+        cube (pandas.DataFrame): Cubo diário (ver utils.cube.build_daily_cube)
+        income_type (str): Valor de Type que representa receitas
+        expense_type (str): Valor de Type que representa despesas
+
+    Returns:
+        BalanceIndex: Índice de somas prefixadas por empresa
+    """
+    flows = cube[cube["Type"].isin([income_type, expense_type])]
+    companies = sorted(cube["Company"].dropna().unique().tolist())
+
+    if flows.empty:
+        start_day = cube["Day"].min() if not cube.empty else pd.Timestamp.today().normalize()
+        return BalanceIndex(start_day, companies, np.zeros((len(companies), 1)))
+
+    start_day = flows["Day"].min().to_datetime64().astype("datetime64[D]")
+    end_day = flows["Day"].max().to_datetime64().astype("datetime64[D]")
+    n_days = int((end_day - start_day).astype(np.int64)) + 1
+
+    signed = np.where(flows["Type"].to_numpy() == expense_type, -1.0, 1.0) * flows["Value"].to_numpy(dtype=float)
+    day_positions = (flows["Day"].to_numpy().astype("datetime64[D]") - start_day).astype(np.int64)
+    company_rows = pd.Categorical(flows["Company"], categories=companies).codes
+
+    # Fluxo diário denso por empresa e soma prefixada com uma coluna inicial zerada
+    valid = company_rows >= 0
+    daily = np.zeros((len(companies), n_days))
+    np.add.at(daily, (company_rows[valid], day_positions[valid]), signed[valid])
+    cumulative = np.zeros((len(companies), n_days + 1))
+    np.cumsum(daily, axis=1, out=cumulative[:, 1:])
+
+    return BalanceIndex(start_day, companies, cumulative)
+
+
+def get_balance_index(df, income_type="Entrada", expense_type="Saída"):
+    """
+    Retorna o índice de saldos do DataFrame, construído uma vez por versão dos dados
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+        income_type (str): Valor de Type que representa receitas
+        expense_type (str): Valor de Type que representa despesas
+
+    Returns:
+        BalanceIndex: Índice de saldos
+    """
+    key = (get_dataset_version(df), income_type, expense_type)
+    return _index_cache.get_or_compute(
+        key, lambda: build_balance_index(get_daily_cube(df), income_type, expense_type)
+    )
+
+
+def merge_balance_index(index, delta_index):
+    """
+    Soma dois índices de saldos (ex.: histórico + transações acrescentadas)
+
+    Os eixos de dias e de empresas são unidos; o custo depende do número de
+    dias e empresas, não do número de transações.
+
+    Args:
+        index (BalanceIndex): Índice existente
+        delta_index (BalanceIndex): Índice das novas transações
+
+    Returns:
+        BalanceIndex: Índice equivalente ao construído sobre o conjunto completo
+    """
+    if delta_index.n_days == 0 or not delta_index.cumulative.any():
+        return index
+
+    start_day = min(index.start_day, delta_index.start_day)
+    end_day = max(index.start_day + index.n_days, delta_index.start_day + delta_index.n_days)
+    n_days = int((end_day - start_day).astype(np.int64))
+    companies = sorted(set(index.companies) | set(delta_index.companies))
+
+    cumulative = _expand(index, start_day, n_days, companies) + _expand(delta_index, start_day, n_days, companies)
+    return BalanceIndex(start_day, companies, cumulative)
+
+
+def _expand(index, start_day, n_days, companies):
+    # Reposiciona a soma prefixada em um eixo maior; depois do último dia o
+    # acumulado permanece constante
+    expanded = np.zeros((len(companies), n_days + 1))
+    if index.n_days == 0:
+        return expanded
+    rows = [companies.index(company) for company in index.companies]
+    offset = int((index.start_day - start_day).astype(np.int64))
+    expanded[rows, offset + 1:offset + 1 + index.n_days] = index.cumulative[:, 1:]
+    expanded[rows, offset + 1 + index.n_days:] = index.cumulative[:, -1:]
+    return expanded
+
+
+def extend_balance_index(previous_df, new_df, delta_df):
+    """
+    Registra os índices de saldo da nova versão a partir dos índices da versão anterior
+
+    Args:
+        previous_df (pandas.DataFrame): Versão anterior dos dados
+        new_df (pandas.DataFrame): Nova versão (anterior + delta_df)
+        delta_df (pandas.DataFrame): Linhas acrescentadas
+
+    Returns:
+        bool: True se algum índice da versão anterior foi atualizado
+    """
+    previous_version = get_dataset_version(previous_df)
+    new_version = get_dataset_version(new_df)
+    delta_cube = None
+    updated = False
+    for (version, income_type, expense_type), index in _index_cache.items():
+        if version != previous_version:
+            continue
+        if delta_cube is None:
+            delta_cube = build_daily_cube(delta_df)
+        delta_index = build_balance_index(delta_cube, income_type, expense_type)
+        _index_cache.set((new_version, income_type, expense_type), merge_balance_index(index, delta_index))
+        updated = True
+    return updated
+
+
+class AsOfBalances:
+    """
+    Saldos informados (SaldoContas ou configuração) ordenados por empresa e data
+
+    As linhas ficam ordenadas pela chave (empresa, dia); "saldo mais recente
+    até a data D" vira uma busca binária pela chave (empresa, D), feita de uma
+    só vez para todas as empresas e datas consultadas.
+
+    Args:
+        companies (list): Empresas com saldo informado
+        keys (numpy.ndarray): Chaves ordenadas (código da empresa, dia) combinadas em int64
+        balances (numpy.ndarray): Saldo de cada chave
+        days (numpy.ndarray): Data (datetime64[D]) de cada chave
+    """
+
+    def __init__(self, companies, keys, balances, days):
+        self.companies = list(companies)
+        self.keys = keys
+        self.balances = balances
+        self.days = days
+        self._codes = {company: code for code, company in enumerate(self.companies)}
+
+    def lookup(self, dates, companies=None):
+        """
+        Saldo mais recente de cada empresa em cada data (inclusive)
+
+        Args:
+            dates (list): Datas de referência
+            companies (list, optional): Empresas consultadas (padrão: todas com saldo)
+
+        Returns:
+            tuple: (empresas, saldos, datas dos saldos); os arrays têm forma
+            (empresas, datas), com NaN/NaT onde não há saldo até a data
+        """
+        companies = self.companies if companies is None else [c for c in companies if c in self._codes]
+        query_days = pd.to_datetime(pd.Index(dates)).normalize().to_numpy().astype("datetime64[D]")
+        codes = np.array([self._codes[company] for company in companies], dtype=np.int64)
+
+        query = _asof_key(codes[:, None], query_days[None, :])
+        position = self.keys.searchsorted(query.ravel(), side="right") - 1
+        position = position.reshape(query.shape)
+
+        # Encontrado só se a chave anterior pertence à mesma empresa
+        found = np.zeros(query.shape, dtype=bool)
+        if len(self.keys):
+            owner = self.keys[np.maximum(position, 0)] >> _DAY_BITS
+            found = (position >= 0) & (owner == codes[:, None])
+
+        balances = np.full(query.shape, np.nan)
+        days = np.full(query.shape, np.datetime64("NaT"), dtype="datetime64[D]")
+        balances[found] = self.balances[position[found]]
+        days[found] = self.days[position[found]]
+        return companies, balances, days
+
+    def at(self, as_of, companies=None):
+        """
+        Saldo mais recente de cada empresa até uma data, no formato de âncoras
+        de BalanceIndex
+
+        Args:
+            as_of (date): Data de referência (inclusive)
+            companies (list, optional): Restringe às empresas informadas
+
+        Returns:
+            dict: {empresa: (saldo, data)}
+        """
+        companies, balances, days = self.lookup([as_of], companies)
+        return {
+            company: (float(balances[row, 0]), pd.Timestamp(days[row, 0]).date())
+            for row, company in enumerate(companies)
+            if not np.isnat(days[row, 0])
+        }
+
+    def at_dates(self, dates, companies=None):
+        """
+        Saldo mais recente de cada empresa em um vetor de datas
+
+        Args:
+            dates (list): Datas de referência
+            companies (list, optional): Restringe às empresas informadas
+
+        Returns:
+            pandas.DataFrame: Datas nas linhas, empresas nas colunas (NaN sem saldo)
+        """
+        companies, balances, _ = self.lookup(dates, companies)
+        return pd.DataFrame(balances.T, index=pd.to_datetime(pd.Index(dates)), columns=companies)
+
+
+# Dias ocupam os bits baixos da chave; o código da empresa, os altos
+_DAY_BITS = 32
+_DAY_OFFSET = 1 << 31
+
+
+def _asof_key(codes, days):
+    return (codes << _DAY_BITS) + (days.astype(np.int64) + _DAY_OFFSET)
+
+
+def build_asof_balances(initial_balances):
+    """
+    Ordena os saldos informados por empresa e data, uma única vez
+
+    Args:
+        initial_balances (pandas.DataFrame): Saldos com colunas Company, Balance e Date
+
+    Returns:
+        AsOfBalances: Motor de consultas as-of
+    """
+    if initial_balances is None or initial_balances.empty:
+        return AsOfBalances([], np.empty(0, dtype=np.int64), np.empty(0), np.empty(0, dtype="datetime64[D]"))
+
+    balances = pd.DataFrame({
+        "Company": initial_balances["Company"],
+        "Balance": pd.to_numeric(initial_balances["Balance"], errors="coerce"),
+        "Date": pd.to_datetime(initial_balances["Date"], errors="coerce").dt.normalize(),
+    }).dropna(subset=["Company", "Date"])
+
+    codes, companies = pd.factorize(balances["Company"])
+    days = balances["Date"].to_numpy().astype("datetime64[D]")
+    keys = _asof_key(codes.astype(np.int64), days)
+    # Ordenação estável: com datas repetidas vale o último saldo informado
+    order = np.argsort(keys, kind="stable")
+    return AsOfBalances(
+        list(companies), keys[order], balances["Balance"].to_numpy(dtype=float)[order], days[order]
+    )
+
+
+def get_asof_balances(initial_balances):
+    """
+    Retorna o motor as-of dos saldos informados, construído uma vez por versão dos saldos
+
+    Args:
+        initial_balances (pandas.DataFrame): Saldos com colunas Company, Balance e Date
+
+    Returns:
+        AsOfBalances: Motor de consultas as-of
+    """
+    if initial_balances is None or initial_balances.empty:
+        return build_asof_balances(None)
+    return _asof_cache.get_or_compute(
+        get_dataset_version(initial_balances), lambda: build_asof_balances(initial_balances)
+    )
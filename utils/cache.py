@@ -0,0 +1,133 @@
+import hashlib
+import threading
+import weakref
+from collections import OrderedDict
+
+import pandas as pd
+
+# Registro id(df) -> (referência fraca, versão, hashes das linhas) para não recalcular o hash
+# do mesmo DataFrame a cada rerun do Streamlit
+_version_registry = {}
+_version_lock = threading.Lock()
+
+
+class LRUCache:
+    """
+    Cache LRU simples e thread-safe, compartilhado entre sessões do Streamlit
+
+    Args:
+        maxsize (int): Número máximo de entradas mantidas em memória
+    """
+
+    def __init__(self, maxsize=32):
+        self.maxsize = maxsize
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key, default=None):
+        with self._lock:
+            if key in self._data:
+                self._data.move_to_end(key)
+                self.hits += 1
+                return self._data[key]
+            self.misses += 1
+            return default
+
+    def set(self, key, value):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def get_or_compute(self, key, compute):
+        """
+        Retorna o valor em cache ou calcula, armazena e retorna um novo valor
+
+        Args:
+            key (hashable): Chave do cache
+            compute (callable): Função sem argumentos que produz o valor
+
+        Returns:
+            object: Valor associado à chave
+        """
+        sentinel = object()
+        value = self.get(key, sentinel)
+        if value is sentinel:
+            value = compute()
+            self.set(key, value)
+        return value
+
+    def pop(self, key, default=None):
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def items(self):
+        with self._lock:
+            return list(self._data.items())
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def __contains__(self, key):
+        with self._lock:
+            return key in self._data
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
+
+
+def get_dataset_version(df):
+    """
+    Retorna um identificador estável do conteúdo de um DataFrame processado
+
+    O hash é calculado uma única vez por objeto DataFrame; reruns que recebem
+    o mesmo objeto (guardado em st.session_state) reutilizam a versão.
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+
+    Returns:
+        str: Versão do conjunto de dados
+    """
+    return _fingerprint(df)[0]
+
+
+def get_row_hashes(df):
+    """
+    Retorna o hash de cada linha do DataFrame (calculado junto com a versão)
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+
+    Returns:
+        numpy.ndarray: Array uint64 com um hash por linha, na ordem do DataFrame
+    """
+    return _fingerprint(df)[1]
+
+
+def _fingerprint(df):
+    key = id(df)
+    with _version_lock:
+        entry = _version_registry.get(key)
+        if entry is not None and entry[0]() is df:
+            return entry[1], entry[2]
+
+    row_hashes = pd.util.hash_pandas_object(df, index=False).to_numpy()
+    digest = hashlib.sha1(row_hashes.tobytes())
+    digest.update(",".join(map(str, df.columns)).encode("utf-8"))
+    version = digest.hexdigest()[:16]
+
+    def _forget(_ref, key=key):
+        with _version_lock:
+            entry = _version_registry.get(key)
+            if entry is not None and entry[0] is _ref:
+                del _version_registry[key]
+
+    with _version_lock:
+        _version_registry[key] = (weakref.ref(df, _forget), version, row_hashes)
+    return version, row_hashes
@@ -0,0 +1,218 @@
+import html
+
+import numpy as np
+import pandas as pd
+
+from utils.balances import get_balance_index
+from utils.cache import LRUCache, get_dataset_version
+from utils.data_processor import format_currency_brl_array
+from utils.query import aggregate
+
+# Modelos e HTML da tabela por (versão, intervalo, empresa, saldos iniciais, previstos)
+_table_cache = LRUCache(maxsize=32)
+_html_cache = LRUCache(maxsize=32)
+
+
+def cash_flow_table_key(df, start_date, end_date, company=None, anchors=None, what_if=None):
+    """
+    Chave de cache da tabela de fluxo de caixa diário
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+        start_date (date): Data inicial
+        end_date (date): Data final
+        company (str, optional): Empresa (None = todas)
+        anchors (dict, optional): Saldos iniciais {empresa: (saldo, data)}
+        what_if (utils.whatif.WhatIfLayer, optional): Camada de transações previstas
+
+    Returns:
+        tuple: Chave hashable
+    """
+    return (
+        get_dataset_version(df),
+        pd.Timestamp(start_date).date(),
+        pd.Timestamp(end_date).date(),
+        company,
+        tuple(sorted((anchors or {}).items())),
+        what_if.revision if what_if is not None else None,
+    )
+
+
+def get_cash_flow_table(df, start_date, end_date, company=None, anchors=None, what_if=None):
+    """
+    Modelo da tabela de fluxo de caixa diário (Obra × data), calculado uma vez por chave
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+        start_date (date): Data inicial
+        end_date (date): Data final (inclusive)
+        company (str, optional): Empresa (None = todas)
+        anchors (dict, optional): Saldos iniciais {empresa: (saldo, data)}
+        what_if (utils.whatif.WhatIfLayer, optional): Camada de transações previstas
+
+    Returns:
+        dict: Modelo da tabela com as chaves
+            - key: chave de cache do modelo
+            - dates: lista de datas (colunas)
+            - income / expense: DataFrames Obra × data, só com obras que têm valor
+            - income_total / expense_total / net: arrays por data
+            - planned: fluxo previsto por data (None sem transações previstas no período)
+            - opening / closing: saldo anterior e saldo acumulado por data
+    """
+    key = cash_flow_table_key(df, start_date, end_date, company, anchors, what_if)
+    return _table_cache.get_or_compute(
+        key, lambda: build_cash_flow_table(df, start_date, end_date, company, anchors, what_if, key)
+    )
+
+
+def build_cash_flow_table(df, start_date, end_date, company=None, anchors=None, what_if=None, key=None):
+    """
+    Constrói o modelo da tabela de fluxo de caixa diário (ver get_cash_flow_table)
+    """
+    filters = {"start_date": start_date, "end_date": end_date}
+    if company is not None:
+        filters["Company"] = company
+    companies = None if company is None else [company]
+
+    dates = list(aggregate(df, ["Date"], filters)["Date"].dt.date)
+    planned_dates = what_if.planned_dates(start_date, end_date, companies) if what_if is not None else []
+    if planned_dates:
+        dates = sorted(set(dates) | set(planned_dates))
+    columns = pd.Index(dates)
+
+    def _section(transaction_type):
+        type_filters = {**filters, "Type": transaction_type}
+        pivot = aggregate(df, ["Date"], type_filters, pivot="Work")
+        matrix = (
+            pivot.set_index(pd.to_datetime(pivot["Date"]).dt.date).drop(columns="Date")
+            .reindex(index=columns, fill_value=0).T.sort_index()
+        )
+        matrix.columns = columns
+        totals = aggregate(df, ["Date"], type_filters)
+        totals = totals.set_index(pd.to_datetime(totals["Date"]).dt.date)["Value"].reindex(columns, fill_value=0)
+        # Remove obras sem nenhum valor positivo no período
+        return matrix[(matrix.to_numpy() > 0).any(axis=1)], totals.to_numpy(dtype=float)
+
+    income, income_total = _section("Entrada")
+    expense, expense_total = _section("Saída")
+
+    balances = what_if if what_if is not None else get_balance_index(df)
+    return {
+        "key": key,
+        "dates": dates,
+        "income": income,
+        "expense": expense,
+        "income_total": income_total,
+        "expense_total": expense_total,
+        "net": income_total - expense_total,
+        "planned": what_if.planned_flow(dates, companies) if planned_dates else None,
+        "opening": np.asarray(balances.opening_balance(dates, companies, anchors), dtype=float),
+        "closing": np.asarray(balances.closing_balance(dates, companies, anchors), dtype=float),
+    }
+
+
+def _cells(values, balance=False):
+    formatted = format_currency_brl_array(values)
+    if not balance:
+        return "<td>" + "</td><td>".join(formatted) + "</td>" if len(formatted) else ""
+    classes = np.where(np.asarray(values) < 0, "negative-balance", "")
+    return "".join(f"<td class='{css}'>{text}</td>" for css, text in zip(classes, formatted))
+
+
+def _row(label, cells, css=None):
+    opening = f"<tr class='{css}'>" if css else "<tr>"
+    return f"{opening}<td style='text-align:left;'>{html.escape(str(label))}</td>{cells}</tr>"
+
+
+def _section_rows(matrix):
+    # Uma única formatação para a matriz inteira; cada linha vira uma string
+    formatted = format_currency_brl_array(matrix.to_numpy(dtype=float))
+    return [
+        _row(obra, "<td>" + "</td><td>".join(row) + "</td>" if len(row) else "")
+        for obra, row in zip(matrix.index, formatted)
+    ]
+
+
+def render_cash_flow_html(table, palette):
+    """
+    Gera o HTML da tabela de fluxo de caixa diário a partir do modelo
+
+    Args:
+        table (dict): Modelo da tabela (ver get_cash_flow_table)
+        palette (dict): Cores de fundo com as chaves header_receita,
+            header_despesa, total e balance
+
+    Returns:
+        str: HTML da tabela (com estilos)
+    """
+    if table["key"] is None:
+        return _build_html(table, palette)
+    key = (table["key"], tuple(sorted(palette.items())))
+    return _html_cache.get_or_compute(key, lambda: _build_html(table, palette))
+
+
+def _build_html(table, palette):
+    dates = table["dates"]
+    span = len(dates) + 1
+
+    parts = [f"""
+            <style>
+            .cash-flow-table {{
+                width: 100%;
+                border-collapse: collapse;
+                font-family: Arial, sans-serif;
+                font-size: 14px;
+            }}
+            .cash-flow-table th, .cash-flow-table td {{
+                border: 1px solid #ddd;
+                padding: 6px;
+                text-align: center;
+            }}
+            .table-header {{
+                background-color: #f2f2f2;
+                font-weight: bold;
+            }}
+            .income-header {{
+                background-color: {palette["header_receita"]};
+                font-weight: bold;
+            }}
+            .expense-header {{
+                background-color: {palette["header_despesa"]};
+                font-weight: bold;
+            }}
+            .total-row {{
+                background-color: {palette["total"]};
+                font-weight: bold;
+            }}
+            .balance-row {{
+                background-color: {palette["balance"]};
+                font-weight: bold;
+                color: #009900;
+            }}
+            .negative-balance {{
+                color: #cc0000;
+            }}
+            </style>
+            """]
+
+    parts.append("<table class='cash-flow-table'><tr class='table-header'><th>OBRA</th>")
+    parts.append("".join(f"<th>{date.strftime('%d/%m/%Y')}</th>" for date in dates))
+    parts.append("</tr>")
+
+    parts.append(_row("SALDO ANTERIOR", _cells(table["opening"], balance=True), "balance-row"))
+
+    parts.append(f"<tr class='income-header'><td colspan='{span}' style='text-align:left;'>RECEITAS</td></tr>")
+    parts.extend(_section_rows(table["income"]))
+    parts.append(_row("TOTAL RECEITAS", _cells(table["income_total"]), "total-row"))
+
+    parts.append(f"<tr class='expense-header'><td colspan='{span}' style='text-align:left;'>DESPESAS</td></tr>")
+    parts.extend(_section_rows(table["expense"]))
+    parts.append(_row("TOTAL DESPESAS", _cells(table["expense_total"]), "total-row"))
+
+    parts.append(_row("SALDO", _cells(table["net"], balance=True), "balance-row"))
+    if table["planned"] is not None:
+        parts.append(_row("PREVISTOS", _cells(table["planned"], balance=True), "total-row"))
+    parts.append(_row("SALDO ACUMULADO", _cells(table["closing"], balance=True), "balance-row"))
+
+    parts.append("</table>")
+    return "".join(parts)
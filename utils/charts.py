@@ -0,0 +1,133 @@
+import numpy as np
+import pandas as pd
+import plotly.graph_objects as go
+
+from utils.cache import LRUCache, get_dataset_version
+
+# Granularidade dos gráficos pelo tamanho do intervalo (em dias): até 3 meses
+# por dia, até 2 anos por semana, acima disso por mês
+GRANULARITY_LIMITS = [(92, "day"), (731, "week")]
+GRANULARITY_LABELS = {"day": "Diário", "week": "Semanal", "month": "Mensal"}
+
+# Orçamento de pontos por série de linha (LTTB) e limite para traços WebGL
+LINE_POINT_BUDGET = 1500
+WEBGL_THRESHOLD = 1000
+
+# Especificações serializadas das figuras por (versão dos dados, visualização, parâmetros)
+_figure_cache = LRUCache(maxsize=64)
+
+
+def choose_granularity(start_date, end_date):
+    """
+    Escolhe a granularidade dos gráficos pelo tamanho do intervalo
+
+    Args:
+        start_date (date): Data inicial
+        end_date (date): Data final
+
+    Returns:
+        str: "day", "week" ou "month" (aceitos por utils.query.aggregate)
+    """
+    if pd.isna(start_date) or pd.isna(end_date):
+        return "day"
+    n_days = (pd.Timestamp(end_date) - pd.Timestamp(start_date)).days + 1
+    for limit, granularity in GRANULARITY_LIMITS:
+        if n_days <= limit:
+            return granularity
+    return "month"
+
+
+def lttb_indices(x, y, threshold):
+    """
+    Seleciona pontos de uma série pelo Largest-Triangle-Three-Buckets (LTTB)
+
+    Mantém o primeiro e o último ponto e, em cada balde intermediário, o
+    ponto que forma o maior triângulo com o ponto escolhido no balde anterior
+    e a média do balde seguinte — preserva picos e vales da linha.
+
+    Args:
+        x (array-like): Abscissas em ordem crescente (números ou datas)
+        y (array-like): Ordenadas
+        threshold (int): Número de pontos desejado
+
+    Returns:
+        numpy.ndarray: Posições dos pontos escolhidos, em ordem crescente
+    """
+    n = len(y)
+    if threshold >= n or threshold < 3:
+        return np.arange(n)
+
+    x = np.asarray(x)
+    if x.dtype.kind == "M":
+        x = x.astype("datetime64[ns]").astype(np.int64)
+    x = x.astype(float)
+    y = np.asarray(y, dtype=float)
+
+    # Baldes dos pontos intermediários (o primeiro e o último ficam fixos)
+    edges = np.linspace(1, n - 1, threshold - 1).astype(int)
+    selected = np.empty(threshold, dtype=np.int64)
+    selected[0], selected[-1] = 0, n - 1
+    previous = 0
+    for bucket in range(threshold - 2):
+        start, stop = edges[bucket], edges[bucket + 1]
+        next_stop = edges[bucket + 2] if bucket + 2 < len(edges) else n
+        next_x = x[stop:next_stop].mean() if next_stop > stop else x[-1]
+        next_y = y[stop:next_stop].mean() if next_stop > stop else y[-1]
+        areas = np.abs(
+            (x[previous] - next_x) * (y[start:stop] - y[previous])
+            - (x[previous] - x[start:stop]) * (next_y - y[previous])
+        )
+        previous = start + int(np.argmax(areas))
+        selected[bucket + 1] = previous
+    return selected
+
+
+def line_trace(x, y, budget=LINE_POINT_BUDGET, **kwargs):
+    """
+    Traço de linha com redução LTTB e WebGL para séries longas
+
+    Args:
+        x (array-like): Abscissas em ordem crescente
+        y (array-like): Ordenadas
+        budget (int): Número máximo de pontos enviados ao navegador
+        **kwargs: Argumentos repassados a go.Scatter / go.Scattergl
+
+    Returns:
+        plotly.graph_objects.Scatter | plotly.graph_objects.Scattergl: Traço
+    """
+    x = np.asarray(x)
+    y = np.asarray(y)
+    if len(y) > budget:
+        keep = lttb_indices(x, y, budget)
+        x, y = x[keep], y[keep]
+    trace = go.Scattergl if len(y) > WEBGL_THRESHOLD else go.Scatter
+    return trace(x=x, y=y, **kwargs)
+
+
+def get_figure(df, view, params, build):
+    """
+    Retorna uma figura do cache ou a constrói e armazena sua especificação
+
+    A figura é guardada serializada (dict do Plotly); cada chamada devolve uma
+    nova go.Figure, que pode ser alterada sem afetar o cache. Reruns em que só
+    widgets não relacionados mudaram reutilizam a especificação em vez de
+    refazer consultas e chamadas ao plotly.express.
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+        view (str): Nome da visualização/gráfico
+        params (hashable): Parâmetros que determinam a figura (filtros, seleções)
+        build (callable): Função sem argumentos que constrói a figura (ou None
+            quando não há dados)
+
+    Returns:
+        plotly.graph_objects.Figure | None: Figura (None se build retornou None)
+    """
+    key = (get_dataset_version(df), view, params)
+    spec = _figure_cache.get_or_compute(key, lambda: _serialize(build()))
+    # A especificação já foi validada ao construir a figura; revalidar custa mais que a cópia
+    return None if spec is None else go.Figure(spec, _validate=False)
+
+
+def _serialize(fig):
+    return None if fig is None else fig.to_plotly_json()
@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+
+from utils.cache import LRUCache, get_dataset_version
+from utils.query import aggregate, canonical_filters
+
+# Métricas por (versão dos dados, período selecionado)
+_metrics_cache = LRUCache(maxsize=16)
+
+# Colunas com ranking (posição 1 = maior valor)
+RANKED_MEASURES = ["Entrada", "Net", "Profit Margin"]
+
+
+def get_company_metrics(df, filters, income_type="Entrada", expense_type="Saída"):
+    """
+    Métricas de comparação entre empresas, calculadas uma vez por período
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+        filters (dict): Filtros do período (ver utils.query.aggregate)
+        income_type (str): Valor de Type que identifica receitas
+        expense_type (str): Valor de Type que identifica despesas
+
+    Returns:
+        dict: Modelo com as chaves
+            - companies: DataFrame por empresa (Company, Entrada, Saída, Net,
+              Profit Margin, Expense Ratio), ordenado pelo líquido decrescente
+            - by_work: DataFrame por empresa e obra (Company, Work, Entrada, Saída, Net),
+              apenas transações com Obra informada
+            - rankings: {medida: DataFrame (Rank, Company, medida)} para RANKED_MEASURES
+    """
+    key = (get_dataset_version(df), canonical_filters(filters), income_type, expense_type)
+    return _metrics_cache.get_or_compute(
+        key, lambda: build_company_metrics(df, filters, income_type, expense_type)
+    )
+
+
+def build_company_metrics(df, filters, income_type="Entrada", expense_type="Saída"):
+    """
+    Constrói as métricas de comparação entre empresas (ver get_company_metrics)
+    """
+    # Uma única consulta Empresa × Obra × Tipo; dropna=False mantém as transações
+    # sem Obra, que entram nos totais por empresa mas não na quebra por obra
+    by_company_work = aggregate(
+        df, ["Company", "Work"], filters,
+        pivot="Type", columns=[income_type, expense_type], net=(income_type, expense_type), dropna=False
+    ).rename(columns={income_type: "Entrada", expense_type: "Saída"})
+    company_totals = by_company_work.groupby("Company", sort=True)[["Entrada", "Saída", "Net"]].sum().reset_index()
+    by_work = by_company_work[by_company_work["Work"].notna()].reset_index(drop=True)
+
+    companies = company_totals["Company"].to_numpy(dtype=object)
+    totals = {column: company_totals[column].to_numpy(dtype=float) for column in ["Entrada", "Saída", "Net"]}
+    income = totals["Entrada"]
+    has_income = income > 0
+    totals["Profit Margin"] = np.divide(totals["Net"] * 100, income, out=np.zeros_like(income), where=has_income)
+    totals["Expense Ratio"] = np.divide(totals["Saída"] * 100, income, out=np.zeros_like(income), where=has_income)
+
+    company_table = pd.DataFrame({"Company": companies, **totals})
+    rankings = {}
+    for measure in RANKED_MEASURES:
+        order = np.argsort(-company_table[measure].to_numpy(), kind="stable")
+        rankings[measure] = pd.DataFrame({
+            "Rank": np.arange(1, len(order) + 1),
+            "Company": company_table["Company"].to_numpy()[order],
+            measure: company_table[measure].to_numpy()[order],
+        })
+    net_order = np.argsort(-totals["Net"], kind="stable")
+
+    return {
+        "companies": company_table.iloc[net_order].reset_index(drop=True),
+        "by_work": by_work,
+        "rankings": rankings,
+    }
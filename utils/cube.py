@@ -0,0 +1,179 @@
+import numpy as np
+import pandas as pd
+
+from utils.cache import LRUCache, get_dataset_version
+
+# Dimensões do cubo diário (dia × empresa × obra × fornecedor/cliente × tipo)
+CUBE_DIMENSIONS = ["Day", "Company", "Work", "Supplier/Client", "Type"]
+
+# Cubos por versão do conjunto de dados (poucas versões ficam vivas ao mesmo tempo)
+_cube_cache = LRUCache(maxsize=4)
+
+
+def build_daily_cube(df):
+    """
+    Agrega as transações em um cubo diário por Empresa, Obra, Fornecedor/Cliente e Tipo
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+
+    Returns:
+        pandas.DataFrame: Cubo ordenado por dia com as colunas das dimensões,
+        Value (soma), Count (número de transações), Year, Month e Quarter
+    """
+    data = df[df["Date"].notna()]
+    columns = {"Day": data["Date"].dt.normalize(), "Value": data["Value"]}
+    for dimension in CUBE_DIMENSIONS[1:]:
+        columns[dimension] = data[dimension] if dimension in data.columns else pd.NA
+    data = pd.DataFrame(columns, index=data.index)
+
+    cube = (
+        data.groupby(CUBE_DIMENSIONS, dropna=False, sort=True)["Value"]
+        .agg(Value="sum", Count="size")
+        .reset_index()
+    )
+
+    # Colunas de calendário derivadas do dia, para filtros por ano/mês/trimestre
+    cube["Year"] = cube["Day"].dt.year
+    cube["Month"] = cube["Day"].dt.month
+    cube["Quarter"] = cube["Day"].dt.quarter
+
+    return cube
+
+
+def get_daily_cube(df):
+    """
+    Retorna o cubo diário do DataFrame, construído uma única vez por versão dos dados
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+
+    Returns:
+        pandas.DataFrame: Cubo diário (ver build_daily_cube)
+    """
+    return _cube_cache.get_or_compute(get_dataset_version(df), lambda: build_daily_cube(df))
+
+
+def slice_cube_by_date(cube, start_date=None, end_date=None):
+    """
+    Seleciona as linhas do cubo entre duas datas (inclusive) por busca binária
+
+    Args:
+        cube (pandas.DataFrame): Cubo diário ordenado por Day
+        start_date (date, optional): Data inicial
+        end_date (date, optional): Data final
+
+    Returns:
+        pandas.DataFrame: Fatia do cubo no intervalo
+    """
+    days = cube["Day"].to_numpy()
+    start = 0
+    stop = len(cube)
+    if start_date is not None:
+        start = days.searchsorted(pd.Timestamp(start_date).to_datetime64(), side="left")
+    if end_date is not None:
+        stop = days.searchsorted(pd.Timestamp(end_date).to_datetime64(), side="right")
+    return cube.iloc[start:stop]
+
+
+def merge_daily_cube(cube, delta_df):
+    """
+    Incorpora novas transações a um cubo existente sem reprocessar o histórico
+
+    Apenas as linhas do cubo nos dias tocados pelas novas transações são
+    reagregadas e intercaladas no lugar; o restante é reaproveitado como está.
+
+    Args:
+        cube (pandas.DataFrame): Cubo diário existente
+        delta_df (pandas.DataFrame): Novas transações (já processadas)
+
+    Returns:
+        pandas.DataFrame: Novo cubo, equivalente a build_daily_cube do conjunto completo
+    """
+    delta_cube = build_daily_cube(delta_df)
+    if delta_cube.empty:
+        return cube
+
+    # Faixas [lo, hi) do cubo ordenado que pertencem aos dias afetados
+    days = cube["Day"].to_numpy()
+    touched = delta_cube["Day"].unique().to_numpy()
+    lo = days.searchsorted(touched, side="left")
+    hi = days.searchsorted(touched, side="right")
+    rows = np.concatenate([np.arange(start, stop) for start, stop in zip(lo, hi)])
+
+    merged = (
+        pd.concat([cube.iloc[rows], delta_cube], ignore_index=True)
+        .groupby(CUBE_DIMENSIONS, dropna=False, sort=True)[["Value", "Count"]]
+        .sum()
+        .reset_index()
+    )
+    merged["Year"] = merged["Day"].dt.year
+    merged["Month"] = merged["Day"].dt.month
+    merged["Quarter"] = merged["Day"].dt.quarter
+
+    # Dias inteiros foram reagregados: basta trocar as faixas desses dias
+    return replace_sorted_rows(cube, "Day", touched, merged)
+
+
+def replace_sorted_rows(frame, column, keys, rows):
+    """
+    Troca as linhas de um DataFrame ordenado cujas chaves estão em keys pelas
+    linhas de rows, mantendo a ordenação
+
+    As linhas novas são intercaladas por posição (busca binária), sem
+    reordenar o DataFrame inteiro.
+
+    Args:
+        frame (pandas.DataFrame): DataFrame ordenado por column
+        column (str): Coluna de ordenação (ex.: "Day")
+        keys (numpy.ndarray): Chaves substituídas, em ordem crescente
+        rows (pandas.DataFrame): Linhas novas, ordenadas por column e apenas com chaves de keys
+
+    Returns:
+        pandas.DataFrame: Novo DataFrame ordenado por column, com índice 0..n-1
+    """
+    values = frame[column].to_numpy()
+    lo = values.searchsorted(keys, side="left")
+    hi = values.searchsorted(keys, side="right")
+    keep = np.ones(len(frame), dtype=bool)
+    for start, stop in zip(lo, hi):
+        keep[start:stop] = False
+    rest = frame[keep]
+
+    # Cada linha nova entra antes da primeira linha mantida com chave maior;
+    # linhas novas com a mesma posição mantêm a ordem em que vieram
+    positions = rest[column].to_numpy().searchsorted(rows[column].to_numpy(), side="left")
+    order = np.insert(np.arange(len(rest)), positions, len(rest) + np.arange(len(rows)))
+    return pd.concat([rest, rows], ignore_index=True).take(order).reset_index(drop=True)
+
+
+def touched_days(delta_df):
+    """
+    Dias (ordenados, sem repetição) com transações em um conjunto de linhas novas
+
+    Args:
+        delta_df (pandas.DataFrame): Linhas acrescentadas (já processadas)
+
+    Returns:
+        numpy.ndarray: Dias em datetime64[ns]
+    """
+    return np.unique(delta_df["Date"].dropna().dt.normalize().to_numpy())
+
+
+def extend_daily_cube(previous_df, new_df, delta_df):
+    """
+    Registra o cubo da nova versão dos dados a partir do cubo da versão anterior
+
+    Args:
+        previous_df (pandas.DataFrame): Versão anterior dos dados
+        new_df (pandas.DataFrame): Nova versão (anterior + delta_df)
+        delta_df (pandas.DataFrame): Linhas acrescentadas
+
+    Returns:
+        bool: True se o cubo anterior estava em cache e foi atualizado
+    """
+    cube = _cube_cache.get(get_dataset_version(previous_df))
+    if cube is None:
+        return False
+    _cube_cache.set(get_dataset_version(new_df), merge_daily_cube(cube, delta_df))
+    return True
@@ -2,6 +2,15 @@ import pandas as pd
 import numpy as np
 from datetime import datetime
 import re
+from functools import lru_cache
+
+# Troca separadores do formato en-US (1,234.56) para o brasileiro (1.234,56) em uma passada
+_BRL_SEPARATORS = str.maketrans(",.", ".,")
+
+# Formato de exibição das colunas monetárias numéricas (st.column_config.NumberColumn).
+# O formato printf do Streamlit não tem separadores brasileiros; "localized" usa a
+# localidade do navegador (pt-BR: 1.234,56) e a moeda vai no rótulo da coluna
+BRL_NUMBER_FORMAT = "localized"
 
 def process_data(df):
     """
@@ -77,6 +86,10 @@ def process_data(df):
     # Criar Período (YYYY-MM) para agrupamento mais fácil
     df_processed["Period"] = df_processed["Date"].dt.strftime("%Y-%m")
     
+    # Manter as transações ordenadas por data (datas inválidas no final) para
+    # permitir filtros por intervalo com busca binária (ver utils/date_index.py)
+    df_processed = df_processed.sort_values("Date", kind="stable", na_position="last").reset_index(drop=True)
+    
     # Resumo do processamento
     print(f"Processamento concluído: {len(df_processed)} linhas válidas")
     print(f"Soma total de valores: R$ {df_processed['Value'].sum():,.2f}".replace(",", "X").replace(".", ",").replace("X", "."))
@@ -147,7 +160,29 @@ def format_currency_brl(value):
     Returns:
         str: Valor formatado como string no formato R$ 1.234,56
     """
-    return f"R$ {value:,.2f}".replace(",", "X").replace(".", ",").replace("X", ".")
+    return f"R$ {value:,.2f}".translate(_BRL_SEPARATORS)
+
+@lru_cache(maxsize=4096)
+def _format_currency_brl_memo(value):
+    return format_currency_brl(value)
+
+def format_currency_brl_array(values):
+    """
+    Formata um array de valores em moeda brasileira
+
+    Cada valor distinto é formatado uma única vez (np.unique), e os valores
+    já formatados em chamadas anteriores vêm de um memo limitado.
+
+    Args:
+        values (array-like): Valores numéricos (qualquer forma)
+
+    Returns:
+        numpy.ndarray: Strings no formato R$ 1.234,56, na mesma forma de values
+    """
+    values = np.asarray(values, dtype=float)
+    unique, inverse = np.unique(values, return_inverse=True)
+    formatted = np.array([_format_currency_brl_memo(float(value)) for value in unique], dtype=object)
+    return formatted[inverse].reshape(values.shape)
 
 def calculate_cash_flow_summary(df):
     """
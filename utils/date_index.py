@@ -0,0 +1,138 @@
+import numpy as np
+import pandas as pd
+
+from utils.cache import LRUCache, get_dataset_version
+
+# Índices de datas por versão do conjunto de dados
+_index_cache = LRUCache(maxsize=4)
+
+
+class DateIndex:
+    """
+    Índice ordenado por data das linhas de um DataFrame processado
+
+    Guarda as datas em ordem crescente (datetime64) e, por empresa, as
+    posições das linhas também em ordem de data. Filtros por intervalo viram
+    duas buscas binárias (``searchsorted``) em vez de máscaras sobre a coluna
+    inteira.
+    """
+
+    def __init__(self, dates, order, company_positions, company_dates):
+        self.dates = dates
+        self.order = order
+        self.company_positions = company_positions
+        self.company_dates = company_dates
+
+    def bounds(self, start_date=None, end_date=None, company=None):
+        """
+        Posições [início, fim) das linhas entre duas datas (dia final inclusive)
+
+        Args:
+            start_date (date, optional): Data inicial
+            end_date (date, optional): Data final
+            company (str, optional): Restringe às linhas da empresa
+
+        Returns:
+            tuple: (início, fim) no array de datas da empresa ou do DataFrame
+        """
+        dates = self.dates if company is None else self.company_dates.get(company, self.dates[:0])
+        start = 0
+        stop = len(dates)
+        if start_date is not None:
+            start = dates.searchsorted(_day_start(start_date), side="left")
+        if end_date is not None:
+            stop = dates.searchsorted(_day_start(end_date) + np.timedelta64(1, "D"), side="left")
+        return int(start), int(max(stop, start))
+
+    def positions(self, start_date=None, end_date=None, company=None):
+        """
+        Posições (iloc) das linhas no intervalo, em ordem de data
+
+        Returns:
+            slice | numpy.ndarray: Fatia contínua quando possível, senão array de posições
+        """
+        start, stop = self.bounds(start_date, end_date, company)
+        if company is not None:
+            return self.company_positions.get(company, np.empty(0, dtype=np.int64))[start:stop]
+        if self.order is None:
+            return slice(start, stop)
+        return self.order[start:stop]
+
+
+def _day_start(value):
+    return pd.Timestamp(value).normalize().to_datetime64()
+
+
+def build_date_index(df):
+    """
+    Constrói o índice de datas de um DataFrame processado
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+
+    Returns:
+        DateIndex: Índice com datas ordenadas e posições por empresa
+    """
+    dates = df["Date"].to_numpy(dtype="datetime64[ns]")
+    valid = ~np.isnat(dates)
+    n_valid = int(valid.sum())
+
+    # process_data já entrega o DataFrame ordenado por data (NaT no final)
+    if valid[:n_valid].all() and (n_valid < 2 or (np.diff(dates[:n_valid]) >= np.timedelta64(0)).all()):
+        order = None
+        sorted_dates = dates[:n_valid]
+    else:
+        order = np.flatnonzero(valid)
+        order = order[np.argsort(dates[order], kind="stable")]
+        sorted_dates = dates[order]
+
+    row_positions = np.arange(n_valid) if order is None else order
+    companies = df["Company"].to_numpy()[row_positions]
+    company_positions = {}
+    if n_valid:
+        codes, uniques = pd.factorize(companies)
+        grouping = np.argsort(codes, kind="stable")
+        grouping = grouping[codes[grouping] >= 0]
+        splits = np.cumsum(np.bincount(codes[codes >= 0], minlength=len(uniques)))[:-1]
+        for company, members in zip(uniques, np.split(grouping, splits)):
+            company_positions[company] = row_positions[members]
+
+    company_dates = {
+        company: dates[positions] for company, positions in company_positions.items()
+    }
+    return DateIndex(sorted_dates, order, company_positions, company_dates)
+
+
+def get_date_index(df):
+    """
+    Retorna o índice de datas do DataFrame, construído uma vez por versão dos dados
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+
+    Returns:
+        DateIndex: Índice de datas
+    """
+    return _index_cache.get_or_compute(get_dataset_version(df), lambda: build_date_index(df))
+
+
+def slice_by_date(df, start_date=None, end_date=None, company=None):
+    """
+    Seleciona as transações entre duas datas (inclusive) por busca binária
+
+    Sem filtro de empresa e com o DataFrame já ordenado, o resultado é uma
+    fatia contínua (iloc[a:b]) que não copia os dados.
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+        start_date (date, optional): Data inicial
+        end_date (date, optional): Data final (inclusive)
+        company (str, optional): Empresa
+
+    Returns:
+        pandas.DataFrame: Transações do intervalo em ordem de data
+    """
+    positions = get_date_index(df).positions(start_date, end_date, company)
+    if isinstance(positions, slice):
+        return df.iloc[positions]
+    return df.take(positions)
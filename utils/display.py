@@ -0,0 +1,27 @@
+import streamlit as st
+
+from utils.data_processor import BRL_NUMBER_FORMAT
+
+
+def brl_column_config(*columns, percent=()):
+    """
+    Configuração de colunas do st.dataframe para valores numéricos formatados
+
+    Os valores continuam numéricos no payload (ordenação numérica na tabela);
+    apenas a exibição usa o formato monetário ou percentual. Valores
+    monetários seguem a localidade do navegador (1.234,56) com duas casas e
+    o rótulo da coluna indica a moeda ("Receitas (R$)").
+
+    Args:
+        *columns (str): Colunas monetárias (nomes exibidos)
+        percent (tuple): Colunas percentuais (nomes exibidos)
+
+    Returns:
+        dict: column_config para st.dataframe
+    """
+    config = {
+        column: st.column_config.NumberColumn(f"{column} (R$)", format=BRL_NUMBER_FORMAT, step=0.01)
+        for column in columns
+    }
+    config.update({column: st.column_config.NumberColumn(column, format="%.2f%%") for column in percent})
+    return config
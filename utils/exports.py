@@ -0,0 +1,354 @@
+import functools
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
+from openpyxl.styles import Font, PatternFill
+from openpyxl.utils import get_column_letter
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4, landscape
+from reportlab.platypus import PageBreak, SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+
+from utils.cache import LRUCache
+from utils.data_processor import format_currency_brl_array
+
+# Exportações rodam fora do rerun do Streamlit, em threads de trabalho
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="export")
+
+# Jobs de exportação (Future) por (formato, chave da tabela)
+_jobs = LRUCache(maxsize=16)
+_jobs_lock = threading.Lock()
+
+
+def request_export(key, build):
+    """
+    Agenda a geração de um arquivo de exportação, se ainda não houver job para a chave
+
+    Args:
+        key (tuple): Chave do arquivo (ex.: ("pdf", chave da tabela))
+        build (callable): Função sem argumentos que retorna os bytes do arquivo
+
+    Returns:
+        concurrent.futures.Future: Job da exportação
+    """
+    with _jobs_lock:
+        job = _jobs.get(key)
+        if job is None or (job.done() and job.exception() is not None):
+            job = _executor.submit(build)
+            _jobs.set(key, job)
+        return job
+
+
+def export_status(key):
+    """
+    Situação da exportação de uma chave
+
+    Args:
+        key (tuple): Chave do arquivo
+
+    Returns:
+        str | None: None (não solicitada), "running", "done" ou "error"
+    """
+    job = _jobs.get(key)
+    if job is None:
+        return None
+    if not job.done():
+        return "running"
+    return "error" if job.exception() is not None else "done"
+
+
+def export_result(key):
+    """
+    Bytes de uma exportação concluída
+
+    Args:
+        key (tuple): Chave do arquivo
+
+    Returns:
+        bytes | None: Conteúdo do arquivo, ou None se não estiver pronto
+    """
+    job = _jobs.get(key)
+    if job is None or not job.done() or job.exception() is not None:
+        return None
+    return job.result()
+
+
+# Layout do PDF: coluna OBRA fixa e blocos de datas que cabem na largura da página
+_PDF_LABEL_WIDTH = 120
+_PDF_DATE_WIDTH = 90
+_PDF_MARGIN = 30
+
+
+@functools.lru_cache(maxsize=1)
+def _pdf_styles():
+    """
+    Estilos do PDF, criados uma única vez por processo
+
+    Returns:
+        dict: Estilos de parágrafo (title, header, block) e os comandos fixos da tabela (table)
+    """
+    styles = getSampleStyleSheet()
+    return {
+        "title": ParagraphStyle(
+            name='TitleStyle',
+            parent=styles['Heading1'],
+            fontSize=16,
+            alignment=1,  # Centralizado
+            spaceAfter=12
+        ),
+        "header": ParagraphStyle(
+            name='HeaderStyle',
+            parent=styles['Heading2'],
+            fontSize=12,
+            alignment=1,  # Centralizado
+            spaceAfter=10
+        ),
+        "block": ParagraphStyle(
+            name='BlockStyle',
+            parent=styles['Normal'],
+            fontSize=9,
+            alignment=1,  # Centralizado
+            spaceAfter=6
+        ),
+        "table": (
+            ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),  # Cabeçalho
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
+            ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
+            ('BACKGROUND', (0, 1), (-1, 1), colors.lightgreen),  # Seção de receitas
+            ('FONTNAME', (0, 1), (-1, 1), 'Helvetica-Bold'),
+            ('ALIGN', (0, 1), (0, 1), 'LEFT'),
+            ('SPAN', (0, 1), (-1, 1)),  # Mesclar células do cabeçalho de receitas
+            ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
+        ),
+    }
+
+
+def _positive_brl(values):
+    # Receitas e despesas: valores não positivos aparecem como R$ 0,00
+    values = np.asarray(values, dtype=float)
+    return np.where(values > 0, format_currency_brl_array(values), "R$ 0,00")
+
+
+def build_cash_flow_pdf(cash_flow, start_date, end_date):
+    """
+    Gera o PDF da tabela de fluxo de caixa diário
+
+    Intervalos longos são divididos em blocos de datas que cabem na largura
+    da página (A4 paisagem), cada bloco em sua própria página com a coluna
+    OBRA repetida; blocos com muitas obras continuam na página seguinte com o
+    cabeçalho repetido. Os valores são formatados uma única vez para o
+    período inteiro e fatiados por bloco.
+
+    Args:
+        cash_flow (dict): Modelo da tabela (ver utils.cash_flow_table.get_cash_flow_table)
+        start_date (date): Data inicial
+        end_date (date): Data final
+
+    Returns:
+        bytes: Conteúdo do PDF
+    """
+    styles = _pdf_styles()
+    buffer = io.BytesIO()
+    doc = SimpleDocTemplate(
+        buffer, pagesize=landscape(A4),
+        leftMargin=_PDF_MARGIN, rightMargin=_PDF_MARGIN, topMargin=_PDF_MARGIN, bottomMargin=_PDF_MARGIN
+    )
+    block_size = max(1, int((doc.width - _PDF_LABEL_WIDTH) // _PDF_DATE_WIDTH))
+
+    # Linhas completas (todas as datas), formatadas de uma vez
+    dates = cash_flow["dates"]
+    income, expense = cash_flow["income"], cash_flow["expense"]
+    labels = (
+        ["OBRA", "RECEITAS"] + [str(obra) for obra in income.index] + ["TOTAL RECEITA", "DESPESAS"]
+        + [str(obra) for obra in expense.index] + ["TOTAL DESPESA", "SALDO"]
+    )
+    empty = np.full(len(dates), "", dtype=object)
+    values = np.vstack([
+        np.array([date.strftime("%d/%m/%Y") for date in dates], dtype=object),
+        empty,
+        _positive_brl(income.to_numpy(dtype=float)).reshape(len(income), len(dates)),
+        _positive_brl(cash_flow["income_total"]),
+        empty,
+        _positive_brl(expense.to_numpy(dtype=float)).reshape(len(expense), len(dates)),
+        _positive_brl(cash_flow["expense_total"]),
+        format_currency_brl_array(cash_flow["net"]),
+    ])
+
+    # Estilo da tabela (mesmas linhas em todos os blocos): comandos fixos + linhas variáveis
+    total_income_row = 2 + len(income)
+    expense_header_row = total_income_row + 1
+    total_expense_row = expense_header_row + 1 + len(expense)
+    balance_row = total_expense_row + 1
+    style = TableStyle(list(styles["table"]) + [
+        ('BACKGROUND', (0, total_income_row), (-1, total_income_row), colors.lightyellow),
+        ('FONTNAME', (0, total_income_row), (-1, total_income_row), 'Helvetica-Bold'),
+        ('BACKGROUND', (0, expense_header_row), (-1, expense_header_row), colors.lightcoral),
+        ('FONTNAME', (0, expense_header_row), (-1, expense_header_row), 'Helvetica-Bold'),
+        ('ALIGN', (0, expense_header_row), (0, expense_header_row), 'LEFT'),
+        ('SPAN', (0, expense_header_row), (-1, expense_header_row)),  # Mesclar células
+        ('BACKGROUND', (0, total_expense_row), (-1, total_expense_row), colors.lightyellow),
+        ('FONTNAME', (0, total_expense_row), (-1, total_expense_row), 'Helvetica-Bold'),
+        ('BACKGROUND', (0, balance_row), (-1, balance_row), colors.lightyellow),
+        ('FONTNAME', (0, balance_row), (-1, balance_row), 'Helvetica-Bold'),
+    ])
+
+    title = Paragraph("Combrasen Group - Fluxo de Caixa Diário", styles["title"])
+    subtitle = Paragraph(
+        f"Período: {start_date.strftime('%d/%m/%Y')} a {end_date.strftime('%d/%m/%Y')}", styles["header"]
+    )
+
+    elements = []
+    blocks = range(0, max(len(dates), 1), block_size)
+    for number, start in enumerate(blocks, start=1):
+        stop = min(start + block_size, len(dates))
+        if number > 1:
+            elements.append(PageBreak())
+        elements.extend([title, subtitle])
+        if len(blocks) > 1:
+            elements.append(Paragraph(
+                f"Datas {dates[start].strftime('%d/%m/%Y')} a {dates[stop - 1].strftime('%d/%m/%Y')}"
+                f" (bloco {number} de {len(blocks)})",
+                styles["block"]
+            ))
+        elements.append(Spacer(1, 10))
+
+        table_data = [[label] + list(row[start:stop]) for label, row in zip(labels, values)]
+        table = Table(
+            table_data,
+            colWidths=[_PDF_LABEL_WIDTH] + [_PDF_DATE_WIDTH] * (stop - start),
+            repeatRows=1
+        )
+        table.setStyle(style)
+        elements.append(table)
+
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+# Formatos numéricos reais na planilha (o Excel aplica os separadores do idioma)
+_EXCEL_CURRENCY_FORMAT = '"R$" #,##0.00;[Red]-"R$" #,##0.00'
+_EXCEL_DATE_FORMAT = "DD/MM/YYYY"
+
+
+def build_cash_flow_excel(cash_flow, start_date, end_date):
+    """
+    Gera a planilha Excel da tabela de fluxo de caixa diário em modo de escrita
+    sequencial (memória constante: as linhas são gravadas à medida que são geradas)
+
+    Mantém o layout OBRA × data da tela. Totais, saldo e saldo acumulado são
+    fórmulas sobre as células de valores, e todas as células são numéricas
+    com formato de moeda (não textos já formatados).
+
+    Args:
+        cash_flow (dict): Modelo da tabela (ver utils.cash_flow_table.get_cash_flow_table)
+        start_date (date): Data inicial
+        end_date (date): Data final
+
+    Returns:
+        bytes: Conteúdo do arquivo .xlsx
+    """
+    workbook = Workbook(write_only=True)
+    sheet = workbook.create_sheet("Fluxo de Caixa")
+    sheet.freeze_panes = "B2"
+    sheet.column_dimensions["A"].width = 32
+
+    dates = cash_flow["dates"]
+    letters = [get_column_letter(column) for column in range(2, len(dates) + 2)]
+    for letter in letters:
+        sheet.column_dimensions[letter].width = 16
+
+    bold = Font(bold=True)
+    fills = {
+        "header": PatternFill("solid", fgColor="F2F2F2"),
+        "income": PatternFill("solid", fgColor="D7FFE5"),
+        "expense": PatternFill("solid", fgColor="FFE5E5"),
+        "total": PatternFill("solid", fgColor="FFFFCC"),
+        "balance": PatternFill("solid", fgColor="E6F3FF"),
+    }
+
+    def _cell(value, number_format=_EXCEL_CURRENCY_FORMAT, style=None):
+        cell = WriteOnlyCell(sheet, value=value)
+        if number_format is not None:
+            cell.number_format = number_format
+        if style is not None:
+            cell.font = bold
+            cell.fill = fills[style]
+        return cell
+
+    def _line(label, values, style=None):
+        # Fórmulas ficam como texto "=..."; valores numpy viram float
+        return [_cell(label, None, style)] + [
+            _cell(value if isinstance(value, str) else float(value), style=style) for value in values
+        ]
+
+    def _section(matrix, total):
+        # Linhas por obra; diferenças entre o total e a soma das obras (lançamentos
+        # sem obra) viram uma linha própria para que a fórmula do total feche
+        rows = [(obra, values) for obra, values in zip(matrix.index, matrix.to_numpy(dtype=float))]
+        residual = total - matrix.to_numpy(dtype=float).sum(axis=0)
+        if len(dates) and abs(residual).max() > 0.005:
+            rows.append(("SEM OBRA", residual))
+        return rows
+
+    def _rows():
+        yield [_cell("OBRA", None, "header")] + [_cell(date, _EXCEL_DATE_FORMAT, "header") for date in dates]
+
+        # Saldo anterior: primeira data com o valor calculado; as demais apontam
+        # para o saldo acumulado da coluna anterior quando os saldos são contínuos
+        opening, closing = cash_flow["opening"], cash_flow["closing"]
+        continuous = len(dates) > 1 and abs(opening[1:] - closing[:-1]).max() < 0.005
+        income_rows = _section(cash_flow["income"], cash_flow["income_total"])
+        expense_rows = _section(cash_flow["expense"], cash_flow["expense_total"])
+        income_start = 4
+        income_total_row = income_start + len(income_rows)
+        expense_start = income_total_row + 2
+        expense_total_row = expense_start + len(expense_rows)
+        net_row = expense_total_row + 1
+        planned_row = net_row + 1 if cash_flow["planned"] is not None else None
+        closing_row = (planned_row or net_row) + 1
+
+        opening_values = [
+            opening[0] if index == 0 or not continuous else f"={letters[index - 1]}{closing_row}"
+            for index in range(len(dates))
+        ]
+        yield _line("SALDO ANTERIOR", opening_values, "balance")
+
+        yield [_cell("RECEITAS", None, "income")]
+        for obra, values in income_rows:
+            yield _line(obra, values)
+        yield _line("TOTAL RECEITAS", [
+            f"=SUM({letter}{income_start}:{letter}{income_total_row - 1})" if income_rows else 0
+            for letter in letters
+        ], "total")
+
+        yield [_cell("DESPESAS", None, "expense")]
+        for obra, values in expense_rows:
+            yield _line(obra, values)
+        yield _line("TOTAL DESPESAS", [
+            f"=SUM({letter}{expense_start}:{letter}{expense_total_row - 1})" if expense_rows else 0
+            for letter in letters
+        ], "total")
+
+        yield _line("SALDO", [
+            f"={letter}{income_total_row}-{letter}{expense_total_row}" for letter in letters
+        ], "balance")
+        if planned_row is not None:
+            yield _line("PREVISTOS", cash_flow["planned"], "total")
+        planned_term = (lambda letter: f"+{letter}{planned_row}") if planned_row else (lambda letter: "")
+        yield _line("SALDO ACUMULADO", [
+            f"={letter}2+{letter}{net_row}{planned_term(letter)}" for letter in letters
+        ], "balance")
+
+    for row in _rows():
+        sheet.append(row)
+
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    return buffer.getvalue()
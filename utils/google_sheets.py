@@ -3,52 +3,140 @@ import io
 import requests
 import re
 import os
+import threading
 import streamlit as st
 from datetime import datetime
 import pytz
+from utils.cache import LRUCache
 from utils.data_processor import process_data, convert_currency_to_float
 
-def fetch_google_sheet_data(url, sheet_name=None):
+# Planilhas abertas por URL (ou arquivo enviado), reaproveitadas entre reruns e sessões
+_workbook_cache = LRUCache(maxsize=4)
+
+
+class Workbook:
+    """
+    Arquivo Excel aberto uma única vez, com leituras por aba limitadas em linhas
+
+    As leituras são serializadas por um lock: o mesmo objeto é compartilhado
+    entre as sessões do Streamlit.
+
+    Args:
+        content (bytes): Conteúdo do arquivo .xlsx/.xls
+    """
+
+    def __init__(self, content):
+        self._file = pd.ExcelFile(io.BytesIO(content))
+        self._lock = threading.Lock()
+        self.sheet_names = self._file.sheet_names
+        # Lido antes de qualquer leitura: o pandas descarta as dimensões da aba ao lê-la
+        self._row_counts = {name: self._dimension_rows(name) for name in self.sheet_names}
+
+    def read(self, sheet_name, nrows=None):
+        """
+        Lê uma aba (apenas as primeiras nrows linhas, se informado)
+
+        Args:
+            sheet_name (str): Nome da aba
+            nrows (int, optional): Número máximo de linhas lidas
+
+        Returns:
+            pandas.DataFrame: Dados brutos da aba
+        """
+        with self._lock:
+            return pd.read_excel(self._file, sheet_name=sheet_name, nrows=nrows)
+
+    def row_count(self, sheet_name):
+        """
+        Número de linhas de dados da aba, lido dos metadados (sem ler as células)
+
+        Args:
+            sheet_name (str): Nome da aba
+
+        Returns:
+            int | None: Linhas sem o cabeçalho (None se o arquivo não informar)
+        """
+        return self._row_counts.get(sheet_name)
+
+    def _dimension_rows(self, sheet_name):
+        book = self._file.book
+        if hasattr(book, "sheet_by_name"):  # .xls (xlrd)
+            return book.sheet_by_name(sheet_name).nrows - 1
+        max_row = book[sheet_name].max_row
+        return None if max_row is None else max_row - 1
+
+
+def _export_url(url):
+    # Verificar se a URL foi fornecida
+    if not url:
+        raise ValueError("URL do Google Sheets não fornecida")
+
+    # Extrair o ID do arquivo da URL
+    file_id = re.search(r'/d/([a-zA-Z0-9-_]+)', url)
+    if not file_id:
+        raise ValueError("URL do Google Sheets inválida")
+
+    return f"https://docs.google.com/spreadsheets/d/{file_id.group(1)}/export?format=xlsx"
+
+
+def _download_workbook(url):
+    response = requests.get(_export_url(url))
+    response.raise_for_status()
+    return Workbook(response.content)
+
+
+def get_workbook(url, reload=False):
+    """
+    Retorna a planilha do Google Sheets, baixada uma única vez por URL
+
+    Args:
+        url (str): URL da planilha do Google Sheets
+        reload (bool): Descarta a cópia em cache e baixa novamente
+
+    Returns:
+        Workbook: Planilha aberta
+    """
+    if reload:
+        _workbook_cache.pop(url)
+    return _workbook_cache.get_or_compute(url, lambda: _download_workbook(url))
+
+
+def get_uploaded_workbook(uploaded_file):
+    """
+    Retorna um arquivo Excel enviado pelo usuário, aberto uma única vez
+
+    Args:
+        uploaded_file (streamlit.runtime.uploaded_file_manager.UploadedFile): Arquivo enviado
+
+    Returns:
+        Workbook: Planilha aberta
+    """
+    key = ("upload", getattr(uploaded_file, "file_id", None), uploaded_file.name, uploaded_file.size)
+    return _workbook_cache.get_or_compute(key, lambda: Workbook(uploaded_file.getvalue()))
+
+def fetch_google_sheet_data(url, sheet_name=None, workbook=None):
     """
     Busca dados de uma planilha do Google Sheets
     
     Args:
         url (str): URL da planilha do Google Sheets
         sheet_name (str, optional): Nome da aba específica para carregar
+        workbook (Workbook, optional): Planilha já aberta (ver get_workbook); sem ela,
+            a planilha é baixada novamente e substitui a cópia em cache
     
     Returns:
         pandas.DataFrame: DataFrame com os dados processados
     """
     try:
-        # Verificar se a URL foi fornecida
-        if not url:
-            raise ValueError("URL do Google Sheets não fornecida")
+        if workbook is None:
+            # Debug - mostrar URL sendo acessada
+            print(f"Acessando URL: {_export_url(url)}")
             
-        # Extrair o ID do arquivo da URL
-        file_id = re.search(r'/d/([a-zA-Z0-9-_]+)', url)
-        if not file_id:
-            raise ValueError("URL do Google Sheets inválida")
-        
-        file_id = file_id.group(1)
-        
-        # Criar URL de exportação
-        export_url = f"https://docs.google.com/spreadsheets/d/{file_id}/export?format=xlsx"
-        
-        # Debug - mostrar URL sendo acessada
-        print(f"Acessando URL: {export_url}")
-        
-        # Fazer o download do arquivo
-        response = requests.get(export_url)
-        response.raise_for_status()  # Levantar exceção se houver erro
-        
-        # Debug - mostrar status da resposta
-        print(f"Status da resposta: {response.status_code}")
-        
-        # Ler o arquivo Excel
-        excel_file = pd.ExcelFile(io.BytesIO(response.content))
+            # Fazer o download do arquivo (atualiza também a planilha em cache)
+            workbook = get_workbook(url, reload=True)
         
         # Listar abas disponíveis
-        available_sheets = excel_file.sheet_names
+        available_sheets = workbook.sheet_names
         print(f"Abas disponíveis: {available_sheets}")
         
         # Se não foi especificada uma aba, usar a primeira
@@ -63,7 +151,7 @@ def fetch_google_sheet_data(url, sheet_name=None):
         print(f"Carregando aba: {sheet_name}")
         
         # Ler os dados da aba
-        df = pd.read_excel(excel_file, sheet_name=sheet_name)
+        df = workbook.read(sheet_name)
         
         # Debug - mostrar informações sobre os dados carregados
         print(f"Dados carregados: {df.shape[0]} linhas x {df.shape[1]} colunas")
@@ -98,32 +186,15 @@ def fetch_initial_balances(url):
         pandas.DataFrame: DataFrame com os saldos iniciais
     """
     try:
-        # Verificar se a URL foi fornecida
-        if not url:
-            raise ValueError("URL do Google Sheets não fornecida")
-            
-        # Extrair o ID do arquivo da URL
-        file_id = re.search(r'/d/([a-zA-Z0-9-_]+)', url)
-        if not file_id:
-            raise ValueError("URL do Google Sheets inválida")
-        
-        file_id = file_id.group(1)
-        
-        # Criar URL de exportação
-        export_url = f"https://docs.google.com/spreadsheets/d/{file_id}/export?format=xlsx"
-        
-        # Fazer o download do arquivo
-        response = requests.get(export_url)
-        response.raise_for_status()
+        # Planilha em cache (baixada uma vez por URL, renovada a cada fetch_google_sheet_data)
+        workbook = get_workbook(url)
         
         # Ler a aba SaldoContas
-        excel_file = pd.ExcelFile(io.BytesIO(response.content))
-        
-        if "SaldoContas" not in excel_file.sheet_names:
+        if "SaldoContas" not in workbook.sheet_names:
             print("Aba SaldoContas não encontrada")
             return None
             
-        df = pd.read_excel(excel_file, sheet_name="SaldoContas")
+        df = workbook.read("SaldoContas")
         
         # Verificar se as colunas necessárias existem
         required_columns = ["Company", "Balance", "Date"]
@@ -167,15 +238,8 @@ def get_sheet_names(url):
         if not file_id_match:
             st.error("URL do Google Sheets inválida.")
             return None
-        file_id = file_id_match.group(1)
-
-        export_url = f"https://docs.google.com/spreadsheets/d/{file_id}/export?format=xlsx"
-
-        response = requests.get(export_url)
-        response.raise_for_status() # Verifica erros HTTP
 
-        excel_file = pd.ExcelFile(io.BytesIO(response.content))
-        return excel_file.sheet_names
+        return get_workbook(url).sheet_names
 
     except requests.exceptions.RequestException as e:
         st.error(f"Erro de conexão ao buscar nomes das abas: {e}")
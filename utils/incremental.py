@@ -0,0 +1,113 @@
+import numpy as np
+
+from utils.cache import get_row_hashes
+from utils.cube import extend_daily_cube
+from utils.balances import extend_balance_index
+from utils.monthly import extend_monthly_matrix
+from utils.rollups import extend_rollups
+from utils.topn import extend_topn_index
+from utils.yearly import extend_yearly_summary
+
+
+def match_row_positions(previous_df, new_df):
+    """
+    Localiza cada linha da versão anterior dos dados processados na nova versão
+
+    As linhas são comparadas pelo hash (como multiconjunto, já que a ordem muda
+    ao reordenar por data); linhas iguais são pareadas pela ordem de
+    ocorrência. Se alguma linha da versão anterior sumiu ou foi alterada, não
+    há como atualizar incrementalmente e o retorno é None.
+
+    Args:
+        previous_df (pandas.DataFrame): Versão anterior dos dados processados
+        new_df (pandas.DataFrame): Nova versão dos dados processados
+
+    Returns:
+        numpy.ndarray | None: Posição em new_df de cada linha de previous_df, ou
+        None se a nova versão não for a anterior acrescida de linhas
+    """
+    if previous_df is None or list(previous_df.columns) != list(new_df.columns):
+        return None
+    if len(new_df) < len(previous_df):
+        return None
+
+    old_hashes = get_row_hashes(previous_df)
+    new_hashes = get_row_hashes(new_df)
+    old_order = np.argsort(old_hashes, kind="stable")
+    new_order = np.argsort(new_hashes, kind="stable")
+    old_sorted = old_hashes[old_order]
+    new_sorted = new_hashes[new_order]
+
+    # A k-ésima linha antiga de um hash corresponde à k-ésima linha nova com
+    # o mesmo hash (toda linha antiga precisa continuar presente)
+    occurrence = np.arange(len(old_sorted)) - old_sorted.searchsorted(old_sorted, side="left")
+    target = new_sorted.searchsorted(old_sorted, side="left") + occurrence
+    if (target >= len(new_sorted)).any() or not (new_sorted[target] == old_sorted).all():
+        return None
+
+    positions = np.empty(len(old_hashes), dtype=np.int64)
+    positions[old_order] = new_order[target]
+    return positions
+
+
+def _appended_positions(positions, n_rows):
+    appended = np.ones(n_rows, dtype=bool)
+    appended[positions] = False
+    return np.flatnonzero(appended)
+
+
+def find_appended_rows(previous_df, new_df):
+    """
+    Identifica as linhas acrescentadas entre duas versões dos dados processados
+
+    Args:
+        previous_df (pandas.DataFrame): Versão anterior dos dados processados
+        new_df (pandas.DataFrame): Nova versão dos dados processados
+
+    Returns:
+        pandas.DataFrame | None: Linhas novas de new_df, ou None se a nova
+        versão não for a anterior acrescida de linhas
+    """
+    positions = match_row_positions(previous_df, new_df)
+    if positions is None:
+        return None
+    return new_df.iloc[_appended_positions(positions, len(new_df))]
+
+
+def refresh_derived_data(previous_df, new_df):
+    """
+    Atualiza as estruturas derivadas da nova versão dos dados a partir da
+    versão anterior, processando apenas as linhas novas
+
+    O cubo diário e os índices de saldo são mesclados com as linhas novas; os
+    níveis de agregação, a matriz mensal, o resumo anual e o índice top-N
+    recalculam apenas os baldes (dias, meses, anos) tocados, a partir do cubo
+    já atualizado. Estruturas sem versão anterior em cache são construídas
+    normalmente no primeiro acesso; o mesmo vale quando a nova versão não é
+    apenas a anterior acrescida de linhas. O índice de datas, que é uma
+    varredura linear da coluna já ordenada, é reconstruído no primeiro acesso.
+
+    Args:
+        previous_df (pandas.DataFrame): Versão anterior dos dados processados
+        new_df (pandas.DataFrame): Nova versão dos dados processados
+
+    Returns:
+        int | None: Número de linhas novas processadas, ou None se foi
+        necessário reconstruir tudo
+    """
+    positions = match_row_positions(previous_df, new_df)
+    if positions is None:
+        return None
+    appended = _appended_positions(positions, len(new_df))
+    if not len(appended):
+        return 0
+
+    delta_df = new_df.iloc[appended]
+    # O cubo vem primeiro: as demais estruturas são derivadas do cubo novo
+    extend_daily_cube(previous_df, new_df, delta_df)
+    extend_balance_index(previous_df, new_df, delta_df)
+    extend_rollups(previous_df, new_df, delta_df)
+    extend_monthly_matrix(previous_df, new_df, delta_df)
+    extend_yearly_summary(previous_df, new_df, delta_df)
+    extend_topn_index(previous_df, new_df, positions, appended)
+    return len(appended)
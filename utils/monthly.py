@@ -0,0 +1,166 @@
+import calendar
+
+import numpy as np
+import pandas as pd
+
+from utils.cache import LRUCache, get_dataset_version
+from utils.cube import get_daily_cube, slice_cube_by_date, touched_days
+from utils.query import aggregate
+from utils.rollups import bucket_end
+
+# Matrizes Ano × Mês × direção por versão do conjunto de dados
+_matrix_cache = LRUCache(maxsize=4)
+
+MONTHS = np.arange(1, 13)
+DIRECTIONS = ["Income", "Expense"]
+
+
+class MonthlyMatrix:
+    """
+    Receitas e despesas por ano e mês em um array (anos, 12, 2)
+
+    Trocar o ano selecionado ou comparar vários anos são apenas fatias do
+    array; meses sem movimento valem 0.
+
+    Args:
+        years (numpy.ndarray): Anos com dados, em ordem crescente
+        values (numpy.ndarray): Valores (anos, 12 meses, [receita, despesa])
+    """
+
+    def __init__(self, years, values):
+        self.years = years
+        self.values = values
+        self._positions = {int(year): position for position, year in enumerate(years)}
+
+    def __contains__(self, year):
+        return int(year) in self._positions
+
+    def year_frame(self, year):
+        """
+        Série mensal de um ano
+
+        Args:
+            year (int): Ano
+
+        Returns:
+            pandas.DataFrame: Colunas Month, Month Name, Income, Expense e Net (12 linhas)
+        """
+        values = self.values[self._positions[int(year)]] if year in self else np.zeros((12, 2))
+        return pd.DataFrame({
+            "Month": MONTHS,
+            "Month Name": [calendar.month_name[month] for month in MONTHS],
+            "Income": values[:, 0],
+            "Expense": values[:, 1],
+            "Net": values[:, 0] - values[:, 1],
+        })
+
+    def comparison(self, years, measure="Net"):
+        """
+        Uma medida mensal lado a lado para vários anos
+
+        Args:
+            years (list): Anos comparados
+            measure (str): "Income", "Expense" ou "Net"
+
+        Returns:
+            pandas.DataFrame: Meses (1 a 12) nas linhas e anos nas colunas
+        """
+        positions = [self._positions[int(year)] for year in years if year in self]
+        selected = self.values[positions]
+        if measure == "Net":
+            data = selected[:, :, 0] - selected[:, :, 1]
+        else:
+            data = selected[:, :, DIRECTIONS.index(measure)]
+        return pd.DataFrame(data.T, index=MONTHS, columns=[int(self.years[p]) for p in positions])
+
+
+def build_monthly_matrix(df, income_type="Entrada", expense_type="Saída"):
+    """
+    Constrói a matriz Ano × Mês × direção com uma única agregação
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+        income_type (str): Valor de Type que identifica receitas
+        expense_type (str): Valor de Type que identifica despesas
+
+    Returns:
+        MonthlyMatrix: Matriz mensal
+    """
+    totals = aggregate(df, ["Year", "Month"], pivot="Type", columns=[income_type, expense_type])
+    years = np.sort(totals["Year"].unique()).astype(np.int64)
+    values = np.zeros((len(years), 12, 2))
+    rows = np.searchsorted(years, totals["Year"].to_numpy(dtype=np.int64))
+    months = totals["Month"].to_numpy(dtype=np.int64) - 1
+    values[rows, months, 0] = totals[income_type].to_numpy(dtype=float)
+    values[rows, months, 1] = totals[expense_type].to_numpy(dtype=float)
+    return MonthlyMatrix(years, values)
+
+
+def get_monthly_matrix(df, income_type="Entrada", expense_type="Saída"):
+    """
+    Retorna a matriz mensal, construída uma vez por versão dos dados
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+        income_type (str): Valor de Type que identifica receitas
+        expense_type (str): Valor de Type que identifica despesas
+
+    Returns:
+        MonthlyMatrix: Matriz mensal
+    """
+    key = (get_dataset_version(df), income_type, expense_type)
+    return _matrix_cache.get_or_compute(key, lambda: build_monthly_matrix(df, income_type, expense_type))
+
+
+def merge_monthly_matrix(matrix, cube, days, income_type="Entrada", expense_type="Saída"):
+    """
+    Atualiza a matriz mensal recalculando apenas os meses tocados por novas
+    transações, a partir do cubo já atualizado
+
+    Args:
+        matrix (MonthlyMatrix): Matriz da versão anterior
+        cube (pandas.DataFrame): Cubo diário da nova versão
+        days (numpy.ndarray): Dias tocados pelas novas transações
+        income_type (str): Valor de Type que identifica receitas
+        expense_type (str): Valor de Type que identifica despesas
+
+    Returns:
+        MonthlyMatrix: Matriz equivalente à construída sobre a nova versão
+    """
+    starts = pd.DatetimeIndex(days).to_period("M").unique().start_time
+    years = np.union1d(matrix.years, starts.year).astype(np.int64)
+    values = np.zeros((len(years), 12, 2))
+    values[np.searchsorted(years, matrix.years)] = matrix.values
+
+    for start in starts:
+        month = slice_cube_by_date(cube, start, bucket_end(start, "month"))
+        totals = month.groupby("Type")["Value"].sum()
+        values[np.searchsorted(years, start.year), start.month - 1] = [
+            totals.get(income_type, 0.0), totals.get(expense_type, 0.0)
+        ]
+    return MonthlyMatrix(years, values)
+
+
+def extend_monthly_matrix(previous_df, new_df, delta_df):
+    """
+    Registra as matrizes mensais da nova versão a partir das da versão anterior
+
+    Args:
+        previous_df (pandas.DataFrame): Versão anterior dos dados
+        new_df (pandas.DataFrame): Nova versão (anterior + delta_df)
+        delta_df (pandas.DataFrame): Linhas acrescentadas
+
+    Returns:
+        bool: True se alguma matriz da versão anterior foi atualizada
+    """
+    previous_version = get_dataset_version(previous_df)
+    new_version = get_dataset_version(new_df)
+    days = touched_days(delta_df)
+    updated = False
+    for (version, income_type, expense_type), matrix in _matrix_cache.items():
+        if version != previous_version:
+            continue
+        merged = merge_monthly_matrix(matrix, get_daily_cube(new_df), days, income_type, expense_type)
+        _matrix_cache.set((new_version, income_type, expense_type), merged)
+        updated = True
+    return updated
@@ -0,0 +1,232 @@
+import functools
+import json
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+from datetime import datetime
+
+import pandas as pd
+import plotly.graph_objects as go
+import streamlit as st
+
+# Número de reruns mantidos por sessão
+RING_SIZE = 20
+
+# Execução perfilada em andamento (o Streamlit roda cada sessão em sua própria thread)
+_local = threading.local()
+
+
+def diagnostics_enabled():
+    """
+    Indica se o modo diagnóstico está ligado nesta sessão
+
+    Returns:
+        bool: True quando o perfilador está ativo
+    """
+    return bool(st.session_state.get("diagnostics_mode", False))
+
+
+def payload_size(output):
+    """
+    Estima o tamanho, em bytes, de um objeto enviado ao navegador
+
+    Args:
+        output (object): DataFrame, figura Plotly, string, bytes ou dict
+
+    Returns:
+        int: Tamanho aproximado em bytes
+    """
+    if isinstance(output, pd.DataFrame):
+        return int(output.memory_usage(index=False, deep=True).sum())
+    if isinstance(output, str):
+        return len(output.encode("utf-8"))
+    if isinstance(output, (bytes, bytearray)):
+        return len(output)
+    if isinstance(output, go.Figure):
+        return len(output.to_json())
+    return len(json.dumps(output, default=str))
+
+
+@contextmanager
+def profile_view(name):
+    """
+    Perfila um rerun de uma visualização (apenas no modo diagnóstico)
+
+    As etapas são delimitadas por chamadas a mark(); o tempo após a última
+    marca entra como "(restante)". Ao final, o rerun vai para o buffer
+    circular da sessão.
+
+    Args:
+        name (str): Nome da visualização
+    """
+    if not diagnostics_enabled():
+        yield
+        return
+
+    started = time.perf_counter()
+    run = {"view": name, "timestamp": datetime.now(), "stages": []}
+    _local.run, _local.started, _local.last = run, started, started
+    try:
+        yield
+    finally:
+        finished = time.perf_counter()
+        if finished - _local.last > 0:
+            run["stages"].append(_stage("(restante)", started, _local.last, finished, None, None))
+        _local.run = None
+        run["total"] = finished - started
+        history = st.session_state.setdefault("render_profile", deque(maxlen=RING_SIZE))
+        history.append(run)
+
+
+def profile_fragment(name):
+    """
+    Decorador que perfila os reruns isolados de um fragmento
+
+    Dentro do rerun da página o fragmento roda sob o profile_view da
+    visualização e suas marcas entram nele. Quando só o fragmento reexecuta
+    (ordenar a tabela, trocar anos etc.), não há execução em andamento e o
+    rerun é registrado à parte como "<nome> (fragmento)". Deve ficar abaixo
+    de @st.fragment.
+
+    Args:
+        name (str): Nome do fragmento no histórico
+
+    Returns:
+        function: Decorador
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            if getattr(_local, "run", None) is not None:
+                return func(*args, **kwargs)
+            with profile_view(f"{name} (fragmento)"):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+def rerun_percentiles(history):
+    """
+    Percentis do tempo total dos reruns, por visualização ou fragmento
+
+    Args:
+        history (iterable): Reruns registrados por profile_view
+
+    Returns:
+        pandas.DataFrame: Visualização, Reruns, p50 (ms) e p95 (ms)
+    """
+    totals = pd.DataFrame(
+        [{"view": item["view"], "total": item["total"] * 1000} for item in history],
+        columns=["view", "total"]
+    )
+    grouped = totals.groupby("view", sort=True)["total"]
+    return pd.DataFrame({
+        "Visualização": grouped.size().index,
+        "Reruns": grouped.size().to_numpy(),
+        "p50 (ms)": grouped.quantile(0.5).to_numpy(),
+        "p95 (ms)": grouped.quantile(0.95).to_numpy(),
+    })
+
+
+def mark(stage, rows=None, output=None):
+    """
+    Fecha uma etapa do rerun perfilado: o tempo desde a marca anterior
+
+    Sem execução perfilada em andamento (modo diagnóstico desligado), não
+    faz nada. Reruns isolados de fragmentos decorados com profile_fragment
+    têm sua própria execução.
+
+    Args:
+        stage (str): Nome da etapa
+        rows (int, optional): Linhas processadas na etapa
+        output (object, optional): Objeto enviado ao navegador (para medir bytes)
+    """
+    run = getattr(_local, "run", None)
+    if run is None:
+        return
+    now = time.perf_counter()
+    size = payload_size(output) if output is not None else None
+    run["stages"].append(_stage(stage, _local.started, _local.last, now, rows, size))
+    # O custo de medir o payload não entra na próxima etapa
+    _local.last = time.perf_counter()
+
+
+def _stage(name, run_start, start, end, rows, size):
+    return {"stage": name, "start": start - run_start, "duration": end - start, "rows": rows, "bytes": size}
+
+
+def show_profiler_panel():
+    """
+    Painel recolhível com a cascata do último rerun, o histórico da sessão e
+    os percentis de tempo por visualização e fragmento
+    """
+    history = st.session_state.get("render_profile")
+    if not diagnostics_enabled() or not history:
+        return
+
+    with st.expander("Diagnóstico de renderização"):
+        run = history[-1]
+        stages = pd.DataFrame(run["stages"], columns=["stage", "start", "duration", "rows", "bytes"])
+        st.markdown(
+            f"**{run['view']}** às {run['timestamp'].strftime('%H:%M:%S')} — {run['total'] * 1000:.0f} ms"
+        )
+
+        fig = go.Figure(go.Bar(
+            y=stages["stage"],
+            x=stages["duration"] * 1000,
+            base=stages["start"] * 1000,
+            orientation="h",
+            marker_color="#636EFA",
+            hovertemplate="%{y}: %{x:.1f} ms<extra></extra>"
+        ))
+        fig.update_layout(
+            xaxis_title="Tempo desde o início do rerun (ms)",
+            yaxis=dict(autorange="reversed"),
+            height=120 + 30 * len(stages),
+            margin=dict(l=10, r=10, t=10, b=40)
+        )
+        st.plotly_chart(fig, use_container_width=True)
+
+        st.dataframe(
+            pd.DataFrame({
+                "Etapa": stages["stage"],
+                "Início (ms)": stages["start"] * 1000,
+                "Duração (ms)": stages["duration"] * 1000,
+                "Linhas": stages["rows"],
+                "Bytes": stages["bytes"],
+            }),
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                "Início (ms)": st.column_config.NumberColumn(format="%.1f"),
+                "Duração (ms)": st.column_config.NumberColumn(format="%.1f"),
+            }
+        )
+
+        st.markdown("**Reruns recentes**")
+        st.dataframe(
+            pd.DataFrame([{
+                "Horário": item["timestamp"].strftime("%H:%M:%S"),
+                "Visualização": item["view"],
+                "Total (ms)": item["total"] * 1000,
+                "Linhas": sum(stage["rows"] or 0 for stage in item["stages"]),
+                "Bytes": sum(stage["bytes"] or 0 for stage in item["stages"]),
+            } for item in reversed(history)]),
+            hide_index=True,
+            use_container_width=True,
+            column_config={"Total (ms)": st.column_config.NumberColumn(format="%.0f")}
+        )
+
+        # Reruns isolados de fragmentos entram no histórico, mas o painel só
+        # os mostra no próximo rerun da página
+        st.markdown(f"**Percentis (últimos {len(history)} reruns)**")
+        st.dataframe(
+            rerun_percentiles(history),
+            hide_index=True,
+            use_container_width=True,
+            column_config={
+                "p50 (ms)": st.column_config.NumberColumn(format="%.0f"),
+                "p95 (ms)": st.column_config.NumberColumn(format="%.0f"),
+            }
+        )
@@ -0,0 +1,221 @@
+import datetime
+
+import pandas as pd
+
+from utils.cache import LRUCache, get_dataset_version
+from utils.cube import get_daily_cube, slice_cube_by_date
+from utils.rollups import (
+    LEVELS, LEVELS_WITHIN, ROLLUP_DIMENSIONS, get_rollups, period_intervals, select_period
+)
+
+# Resultados de consultas por (versão dos dados, especificação canônica)
+_result_cache = LRUCache(maxsize=256)
+
+# Filtros que delimitam o período (respondidos pelos níveis de agregação)
+PERIOD_FILTERS = ("start_date", "end_date", "Year", "Quarter", "Month")
+
+# Dimensões de calendário e o nível de agregação que cada uma exige
+CALENDAR_LEVELS = {"Year": "year", "Quarter": "quarter", "Month": "month"}
+
+# Frequências do pandas para cada granularidade da dimensão "Date"
+GRANULARITIES = {
+    "day": None,
+    "week": "W-SUN",
+    "month": "M",
+    "quarter": "Q",
+    "year": "Y",
+}
+
+MEASURES = ("Value", "Count")
+
+
+def aggregate(df, group_by=(), filters=None, measure="Value", granularity="day",
+              pivot=None, columns=None, net=None, dropna=True):
+    """
+    Consulta agregada sobre o cubo diário, com cache de resultados
+
+    Substitui o padrão "filtrar período/empresa, separar por Type, groupby,
+    somar, unstack e completar colunas ausentes" repetido nas visualizações.
+    Quando as dimensões pedidas são Empresa, Obra, Tipo e calendário, o período
+    é respondido combinando baldes pré-agregados (ver utils.rollups).
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+        group_by (list): Dimensões de agrupamento (colunas do cubo ou "Date",
+            que corresponde ao dia agrupado na granularidade escolhida)
+        filters (dict, optional): Filtros; "start_date"/"end_date" delimitam o
+            intervalo de dias (inclusive) e as demais chaves são colunas do
+            cubo com um valor ou uma lista de valores aceitos
+        measure (str): "Value" (soma dos valores) ou "Count" (nº de transações)
+        granularity (str): "day", "week", "month", "quarter" ou "year"
+        pivot (str, optional): Dimensão transformada em colunas (ex.: "Type")
+        columns (list, optional): Colunas do pivot garantidas no resultado (0 se ausentes)
+        net (tuple, optional): Par (receita, despesa) de colunas do pivot para
+            calcular a coluna "Net"
+        dropna (bool): Descarta os grupos com dimensão vazia (ex.: transações
+            sem Obra), como o groupby do pandas; False os mantém com chave NaN
+
+    Returns:
+        pandas.DataFrame: Resultado com as dimensões como colunas (cópia própria,
+        pode ser alterado pelo chamador)
+    """
+    if measure not in MEASURES:
+        raise ValueError(f"Medida inválida: {measure}. Use uma de {MEASURES}")
+    if granularity not in GRANULARITIES:
+        raise ValueError(f"Granularidade inválida: {granularity}. Use uma de {list(GRANULARITIES)}")
+
+    spec = canonical_spec(group_by, filters, measure, granularity, pivot, columns, net, dropna)
+    key = (get_dataset_version(df), spec)
+    result = _result_cache.get_or_compute(
+        key,
+        lambda: _run_query(df, list(group_by), filters or {}, measure,
+                           granularity, pivot, columns, net, dropna)
+    )
+    return result.copy()
+
+
+def canonical_spec(group_by=(), filters=None, measure="Value", granularity="day",
+                   pivot=None, columns=None, net=None, dropna=True):
+    """
+    Representação canônica (hashable) de uma consulta, usada como chave de cache
+
+    Listas de valores de filtro são ordenadas e datas viram strings ISO, de modo
+    que seleções equivalentes produzem a mesma chave.
+
+    Returns:
+        tuple: Especificação canônica
+    """
+    return (
+        tuple(group_by),
+        canonical_filters(filters),
+        measure,
+        granularity,
+        pivot,
+        tuple(columns) if columns is not None else None,
+        tuple(net) if net is not None else None,
+        dropna,
+    )
+
+
+def canonical_filters(filters):
+    """
+    Representação canônica (hashable) de uma especificação de filtros
+
+    Args:
+        filters (dict): Filtros (ver aggregate)
+
+    Returns:
+        tuple: Pares (nome, valor canônico) ordenados por nome
+    """
+    return tuple(sorted(
+        (name, _canonical_value(value)) for name, value in (filters or {}).items()
+    ))
+
+
+def _canonical_value(value):
+    if isinstance(value, (list, tuple, set, frozenset, pd.Index)):
+        return ("in",) + tuple(sorted((_canonical_value(item) for item in value), key=repr))
+    if isinstance(value, (datetime.date, pd.Timestamp)):
+        return pd.Timestamp(value).isoformat()
+    if hasattr(value, "item"):
+        # Escalares numpy (ex.: anos vindos de unique()) viram tipos nativos
+        return value.item()
+    return value
+
+
+def filter_cube(cube, filters):
+    """
+    Aplica uma especificação de filtros ao cubo diário
+
+    Args:
+        cube (pandas.DataFrame): Cubo diário
+        filters (dict): Filtros (ver aggregate)
+
+    Returns:
+        pandas.DataFrame: Linhas do cubo que atendem aos filtros
+    """
+    filters = dict(filters or {})
+    start_date = filters.pop("start_date", None)
+    end_date = filters.pop("end_date", None)
+    if start_date is not None or end_date is not None:
+        cube = slice_cube_by_date(cube, start_date, end_date)
+
+    for name, value in filters.items():
+        if isinstance(value, (list, tuple, set, frozenset, pd.Index)):
+            cube = cube[cube[name].isin(list(value))]
+        else:
+            cube = cube[cube[name] == value]
+    return cube
+
+
+def _query_source(df, group_by, filters, granularity, pivot):
+    """
+    Linhas de partida da consulta: os baldes pré-agregados que cobrem o período
+    quando as dimensões pedidas existem nos níveis de agregação, ou o cubo
+    diário filtrado caso contrário
+
+    Returns:
+        pandas.DataFrame: Linhas com Day, dimensões, Value e Count
+    """
+    cube = get_daily_cube(df)
+
+    # Granularidade mais fina exigida pelo agrupamento (os baldes usados não
+    # podem atravessar a fronteira de um grupo)
+    finest = None
+    dimensions = [name for name in filters if name not in PERIOD_FILTERS]
+    for dimension in list(group_by) + ([pivot] if pivot is not None else []):
+        level = granularity if dimension == "Date" else CALENDAR_LEVELS.get(dimension)
+        if level is None:
+            dimensions.append(dimension)
+        elif finest is None or LEVELS.index(level) < LEVELS.index(finest):
+            finest = level
+
+    if cube.empty or finest == "day" or not all(d in ROLLUP_DIMENSIONS for d in dimensions):
+        return filter_cube(cube, filters)
+
+    intervals = period_intervals(filters, cube["Day"].iloc[0], cube["Day"].iloc[-1])
+    data = select_period(get_rollups(df), intervals, LEVELS_WITHIN[finest])
+    data = data.rename(columns={"Start": "Day"})
+    for dimension, accessor in (("Year", "year"), ("Quarter", "quarter"), ("Month", "month")):
+        if dimension in group_by or dimension == pivot:
+            data[dimension] = getattr(data["Day"].dt, accessor)
+    return filter_cube(data, {k: v for k, v in filters.items() if k not in PERIOD_FILTERS})
+
+
+def _run_query(df, group_by, filters, measure, granularity, pivot, columns, net, dropna=True):
+    data = _query_source(df, group_by, filters, granularity, pivot)
+
+    keys = []
+    for dimension in group_by:
+        if dimension == "Date":
+            freq = GRANULARITIES[granularity]
+            day = data["Day"]
+            keys.append((day if freq is None else day.dt.to_period(freq).dt.start_time).rename("Date"))
+        else:
+            keys.append(data[dimension])
+    if pivot is not None:
+        keys.append(data[pivot])
+
+    if keys:
+        result = data.groupby(keys, dropna=dropna)[measure].sum()
+    else:
+        result = pd.Series([data[measure].sum()], name=measure)
+
+    if pivot is not None:
+        if group_by:
+            result = result.unstack(fill_value=0)
+        else:
+            result = result.to_frame().T.reset_index(drop=True)
+        result.columns.name = None
+        if columns is not None:
+            for column in columns:
+                if column not in result.columns:
+                    result[column] = 0
+        if net is not None:
+            income_column, expense_column = net
+            result["Net"] = result[income_column] - result[expense_column]
+        result = result.reset_index() if group_by else result
+    else:
+        result = result.reset_index() if group_by else result.to_frame()
+
+    return result
@@ -0,0 +1,325 @@
+import numpy as np
+import pandas as pd
+
+from utils.cache import LRUCache, get_dataset_version
+from utils.cube import get_daily_cube, replace_sorted_rows, touched_days
+
+# Níveis do menor para o maior. Semanas não cabem em meses, por isso a
+# semana é montada a partir do dia e o mês também parte do dia; daí em diante
+# cada nível é montado a partir do anterior (mês → trimestre → semestre → ano).
+LEVELS = ["day", "week", "month", "quarter", "semester", "year"]
+PARENT_LEVEL = {
+    "week": "day",
+    "month": "day",
+    "quarter": "month",
+    "semester": "quarter",
+    "year": "semester",
+}
+
+# Dimensões mantidas em cada nível
+ROLLUP_DIMENSIONS = ["Company", "Work", "Type"]
+
+# Níveis cujos baldes não atravessam a fronteira de cada granularidade
+LEVELS_WITHIN = {
+    "day": ["day"],
+    "week": ["day", "week"],
+    "month": ["day", "month"],
+    "quarter": ["day", "month", "quarter"],
+    "year": ["day", "month", "quarter", "semester", "year"],
+    None: LEVELS,
+}
+
+_rollup_cache = LRUCache(maxsize=4)
+
+
+def bucket_start(day, level):
+    """
+    Início do balde do nível que contém o dia
+
+    Args:
+        day (pandas.Timestamp): Dia
+        level (str): Nível (ver LEVELS)
+
+    Returns:
+        pandas.Timestamp: Primeiro dia do balde
+    """
+    day = pd.Timestamp(day).normalize()
+    if level == "day":
+        return day
+    if level == "week":
+        return day - pd.Timedelta(days=day.weekday())
+    if level == "month":
+        return day.replace(day=1)
+    if level == "quarter":
+        return day.replace(month=3 * ((day.month - 1) // 3) + 1, day=1)
+    if level == "semester":
+        return day.replace(month=1 if day.month <= 6 else 7, day=1)
+    if level == "year":
+        return day.replace(month=1, day=1)
+    raise ValueError(f"Nível inválido: {level}")
+
+
+def bucket_end(start, level):
+    """
+    Último dia do balde que começa em start
+
+    Args:
+        start (pandas.Timestamp): Início do balde
+        level (str): Nível (ver LEVELS)
+
+    Returns:
+        pandas.Timestamp: Último dia do balde
+    """
+    offsets = {
+        "day": pd.DateOffset(days=1),
+        "week": pd.DateOffset(weeks=1),
+        "month": pd.DateOffset(months=1),
+        "quarter": pd.DateOffset(months=3),
+        "semester": pd.DateOffset(months=6),
+        "year": pd.DateOffset(years=1),
+    }
+    return start + offsets[level] - pd.Timedelta(days=1)
+
+
+def _bucket_starts(days, level):
+    # Versão vetorizada de bucket_start para uma série de dias
+    if level == "week":
+        return days - pd.to_timedelta(days.dt.weekday, unit="D")
+    if level == "month":
+        return days.dt.to_period("M").dt.start_time
+    if level == "quarter":
+        return days.dt.to_period("Q").dt.start_time
+    if level == "semester":
+        years = days.dt.year.astype(str)
+        months = (days.dt.month > 6).map({False: "-01-01", True: "-07-01"})
+        return pd.to_datetime(years + months)
+    if level == "year":
+        return days.dt.to_period("Y").dt.start_time
+    return days
+
+
+def build_rollups(cube):
+    """
+    Materializa os níveis hierárquicos de agregação a partir do cubo diário
+
+    Args:
+        cube (pandas.DataFrame): Cubo diário
+
+    Returns:
+        dict: {nível: DataFrame com Start, Company, Work, Type, Value e Count,
+        ordenado por Start}
+    """
+    keys = ["Start"] + ROLLUP_DIMENSIONS
+    rollups = {
+        "day": (
+            cube.rename(columns={"Day": "Start"})
+            .groupby(keys, dropna=False, sort=True)[["Value", "Count"]]
+            .sum()
+            .reset_index()
+        )
+    }
+    for level in LEVELS[1:]:
+        parent = rollups[PARENT_LEVEL[level]]
+        rollups[level] = (
+            parent.assign(Start=_bucket_starts(parent["Start"], level))
+            .groupby(keys, dropna=False, sort=True)[["Value", "Count"]]
+            .sum()
+            .reset_index()
+        )
+    return rollups
+
+
+def get_rollups(df):
+    """
+    Retorna os níveis de agregação do DataFrame, construídos uma vez por versão dos dados
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+
+    Returns:
+        dict: Níveis de agregação (ver build_rollups)
+    """
+    return _rollup_cache.get_or_compute(
+        get_dataset_version(df), lambda: build_rollups(get_daily_cube(df))
+    )
+
+
+def merge_rollups(rollups, cube, days):
+    """
+    Atualiza os níveis de agregação depois de novas transações
+
+    Apenas os baldes que contêm os dias tocados são recalculados: o nível
+    diário a partir do cubo já atualizado e cada nível seguinte a partir do
+    nível anterior, como em build_rollups. Os demais baldes são reaproveitados.
+
+    Args:
+        rollups (dict): Níveis de agregação da versão anterior (ver build_rollups)
+        cube (pandas.DataFrame): Cubo diário da nova versão
+        days (numpy.ndarray): Dias tocados pelas novas transações, ordenados
+
+    Returns:
+        dict: Níveis de agregação equivalentes aos de build_rollups(cube)
+    """
+    if not len(days):
+        return rollups
+
+    keys = ["Start"] + ROLLUP_DIMENSIONS
+    days = pd.Series(pd.DatetimeIndex(days))
+    merged = {}
+    for level in LEVELS:
+        starts = pd.DatetimeIndex(_bucket_starts(days, level).unique()).sort_values()
+        if level == "day":
+            source = _rows_between(cube, "Day", starts, starts).rename(columns={"Day": "Start"})
+        else:
+            ends = pd.DatetimeIndex([bucket_end(start, level) for start in starts])
+            parent = _rows_between(merged[PARENT_LEVEL[level]], "Start", starts, ends)
+            source = parent.assign(Start=_bucket_starts(parent["Start"], level))
+        fresh = (
+            source.groupby(keys, dropna=False, sort=True)[["Value", "Count"]]
+            .sum()
+            .reset_index()
+        )
+        merged[level] = replace_sorted_rows(rollups[level], "Start", starts.to_numpy(), fresh)
+    return merged
+
+
+def _rows_between(frame, column, starts, ends):
+    # Linhas de um DataFrame ordenado por column com chave em algum [início, fim]
+    values = frame[column].to_numpy()
+    lo = values.searchsorted(starts.to_numpy(), side="left")
+    hi = values.searchsorted(ends.to_numpy(), side="right")
+    positions = [np.arange(start, stop) for start, stop in zip(lo, hi)]
+    return frame.iloc[np.concatenate(positions) if positions else []]
+
+
+def extend_rollups(previous_df, new_df, delta_df):
+    """
+    Registra os níveis de agregação da nova versão a partir dos da versão anterior
+
+    Args:
+        previous_df (pandas.DataFrame): Versão anterior dos dados
+        new_df (pandas.DataFrame): Nova versão (anterior + delta_df)
+        delta_df (pandas.DataFrame): Linhas acrescentadas
+
+    Returns:
+        bool: True se os níveis da versão anterior estavam em cache e foram atualizados
+    """
+    rollups = _rollup_cache.get(get_dataset_version(previous_df))
+    if rollups is None:
+        return False
+    merged = merge_rollups(rollups, get_daily_cube(new_df), touched_days(delta_df))
+    _rollup_cache.set(get_dataset_version(new_df), merged)
+    return True
+
+
+def decompose_period(start_date, end_date, levels=LEVELS):
+    """
+    Decompõe um intervalo de dias no menor conjunto de baldes alinhados
+
+    A cada passo é usado o maior nível cujo balde começa no cursor e termina
+    dentro do intervalo (ex.: 15/03 a 31/12 vira 17 dias de março + T2 + S2).
+
+    Args:
+        start_date (date): Data inicial
+        end_date (date): Data final (inclusive)
+        levels (list): Níveis que podem ser usados (sempre inclui "day")
+
+    Returns:
+        list: Pares (nível, início do balde)
+    """
+    start = pd.Timestamp(start_date).normalize()
+    end = pd.Timestamp(end_date).normalize()
+    candidates = [level for level in reversed(LEVELS) if level in levels and level != "day"]
+
+    buckets = []
+    cursor = start
+    while cursor <= end:
+        for level in candidates:
+            if bucket_start(cursor, level) == cursor and bucket_end(cursor, level) <= end:
+                buckets.append((level, cursor))
+                cursor = bucket_end(cursor, level) + pd.Timedelta(days=1)
+                break
+        else:
+            buckets.append(("day", cursor))
+            cursor = cursor + pd.Timedelta(days=1)
+    return buckets
+
+
+def period_intervals(filters, first_day, last_day):
+    """
+    Converte filtros de período (Year/Quarter/Month e start_date/end_date) em
+    intervalos contínuos de dias
+
+    Args:
+        filters (dict): Filtros de período (ver utils.query.aggregate)
+        first_day (pandas.Timestamp): Primeiro dia com dados
+        last_day (pandas.Timestamp): Último dia com dados
+
+    Returns:
+        list: Pares (data inicial, data final), ordenados e sem sobreposição
+    """
+    def _values(name, default):
+        value = filters.get(name)
+        if value is None:
+            return set(default)
+        if isinstance(value, (list, tuple, set, frozenset, pd.Index)):
+            return {int(item) for item in value}
+        return {int(value)}
+
+    start = max(pd.Timestamp(filters.get("start_date", first_day)).normalize(), first_day)
+    end = min(pd.Timestamp(filters.get("end_date", last_day)).normalize(), last_day)
+
+    years = sorted(_values("Year", range(first_day.year, last_day.year + 1)))
+    months = _values("Month", range(1, 13))
+    quarters = _values("Quarter", range(1, 5))
+    months = sorted(month for month in months if (month - 1) // 3 + 1 in quarters)
+
+    intervals = []
+    for year in years:
+        # Meses consecutivos viram um único intervalo
+        runs = []
+        for month in months:
+            if runs and runs[-1][1] == month - 1:
+                runs[-1][1] = month
+            else:
+                runs.append([month, month])
+        for first_month, last_month in runs:
+            run_start = pd.Timestamp(year=year, month=first_month, day=1)
+            run_end = bucket_end(pd.Timestamp(year=year, month=last_month, day=1), "month")
+            run_start, run_end = max(run_start, start), min(run_end, end)
+            if run_start <= run_end:
+                intervals.append((run_start, run_end))
+    return intervals
+
+
+def select_period(rollups, intervals, levels=LEVELS):
+    """
+    Linhas pré-agregadas que cobrem exatamente um conjunto de intervalos
+
+    Args:
+        rollups (dict): Níveis de agregação (ver build_rollups)
+        intervals (list): Pares (data inicial, data final) sem sobreposição
+        levels (list): Níveis que podem ser usados
+
+    Returns:
+        pandas.DataFrame: União das linhas dos baldes escolhidos
+    """
+    starts_by_level = {}
+    for start_date, end_date in intervals:
+        for level, start in decompose_period(start_date, end_date, levels):
+            starts_by_level.setdefault(level, []).append(start.to_datetime64())
+
+    parts = []
+    for level, starts in starts_by_level.items():
+        frame = rollups[level]
+        bucket_starts = frame["Start"].to_numpy()
+        # Cada nível está ordenado por Start: cada balde é uma fatia contínua
+        for start in starts:
+            lo = bucket_starts.searchsorted(start, side="left")
+            hi = bucket_starts.searchsorted(start, side="right")
+            if hi > lo:
+                parts.append(frame.iloc[lo:hi])
+
+    if not parts:
+        return rollups["day"].iloc[0:0]
+    return pd.concat(parts, ignore_index=True)
@@ -0,0 +1,129 @@
+import numpy as np
+import pandas as pd
+
+from utils.balances import get_balance_index
+from utils.cube import get_daily_cube, slice_cube_by_date
+
+
+def daily_flow_matrices(df, start_date, end_date, companies, default_clients=(),
+                        income_type="Entrada", expense_type="Saída"):
+    """
+    Matrizes densas (empresa × dia) de receitas e despesas no horizonte
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+        start_date (date): Primeiro dia do horizonte
+        end_date (date): Último dia do horizonte (inclusive)
+        companies (list): Empresas (linhas das matrizes)
+        default_clients (list): Clientes cujas receitas são separadas por cliente
+        income_type (str): Valor de Type que identifica receitas
+        expense_type (str): Valor de Type que identifica despesas
+
+    Returns:
+        tuple: (dias, receitas, despesas, receitas por cliente); as matrizes têm
+        forma (empresas, dias) e as receitas por cliente (clientes, empresas, dias)
+    """
+    days = pd.date_range(pd.Timestamp(start_date).normalize(), pd.Timestamp(end_date).normalize(), freq="D")
+    shape = (len(companies), len(days))
+    cube = slice_cube_by_date(get_daily_cube(df), days[0], days[-1]) if len(days) else get_daily_cube(df).iloc[0:0]
+
+    rows = pd.Index(companies).get_indexer(cube["Company"])
+    columns = ((cube["Day"] - days[0]).dt.days.to_numpy() if len(days) else np.empty(0, dtype=np.int64))
+    valid = rows >= 0
+    flat = rows * len(days) + columns
+
+    def _matrix(mask):
+        mask = mask & valid
+        return np.bincount(
+            flat[mask], weights=cube["Value"].to_numpy(dtype=float)[mask], minlength=shape[0] * shape[1]
+        ).reshape(shape)
+
+    is_income = (cube["Type"] == income_type).to_numpy()
+    income = _matrix(is_income)
+    expense = _matrix((cube["Type"] == expense_type).to_numpy())
+    clients = cube["Supplier/Client"].to_numpy()
+    client_income = np.stack(
+        [_matrix(is_income & (clients == client)) for client in default_clients]
+    ) if len(default_clients) else np.zeros((0,) + shape)
+    return days, income, expense, client_income
+
+
+def simulate_balances(df, start_date, end_date, companies=None, anchors=None, n_paths=10000,
+                      receivable_delay=0, expense_increase=0.0, default_clients=(),
+                      default_probability=0.0, percentiles=(5, 50, 95), seed=None,
+                      income_type="Entrada", expense_type="Saída"):
+    """
+    Simula trajetórias do saldo acumulado diário sob choques de fluxo de caixa
+
+    Cada trajetória sorteia, de forma independente:
+
+    - atraso de 0 a ``receivable_delay`` dias para cada recebimento diário
+      (recebimentos empurrados para depois do horizonte saem do período);
+    - aumento de 0 a ``expense_increase`` (fração) sobre as despesas;
+    - inadimplência de cada cliente de ``default_clients`` com probabilidade
+      ``default_probability``, a partir de um dia sorteado do horizonte.
+
+    Todas as trajetórias de uma empresa são calculadas em um único lote NumPy
+    de forma (trajetórias, dias).
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+        start_date (date): Primeiro dia do horizonte
+        end_date (date): Último dia do horizonte (inclusive)
+        companies (list, optional): Empresas simuladas (padrão: todas)
+        anchors (dict, optional): Saldos iniciais {empresa: (saldo, data)}
+        n_paths (int): Número de trajetórias
+        receivable_delay (int): Atraso máximo dos recebimentos, em dias
+        expense_increase (float): Aumento máximo das despesas (0.1 = 10%)
+        default_clients (list): Clientes sujeitos a inadimplência
+        default_probability (float): Probabilidade de inadimplência de cada cliente
+        percentiles (tuple): Percentis calculados sobre as trajetórias
+        seed (int, optional): Semente do gerador aleatório
+        income_type (str): Valor de Type que identifica receitas
+        expense_type (str): Valor de Type que identifica despesas
+
+    Returns:
+        dict: {"Base": saldo sem choques, "P5": ..., "P50": ..., ...}, cada um
+        um DataFrame com os dias nas linhas e as empresas nas colunas
+    """
+    balance_index = get_balance_index(df, income_type, expense_type)
+    companies = list(balance_index.companies if companies is None else companies)
+    days, income, expense, client_income = daily_flow_matrices(
+        df, start_date, end_date, companies, default_clients, income_type, expense_type
+    )
+    n_days = len(days)
+    rng = np.random.default_rng(seed)
+
+    base = {}
+    bands = {p: {} for p in percentiles}
+    for row, company in enumerate(companies):
+        opening = balance_index.opening_balance([days[0]], [company], anchors)[0] if n_days else 0.0
+        base[company] = opening + np.cumsum(income[row] - expense[row])
+
+        # Receitas de cada trajetória, descontando clientes inadimplentes a partir do dia sorteado
+        incomes = np.broadcast_to(income[row], (n_paths, n_days)).copy()
+        for client in range(len(client_income)):
+            defaulted = rng.random(n_paths) < default_probability
+            default_day = rng.integers(0, max(n_days, 1), n_paths)
+            lost = np.arange(n_days)[None, :] >= default_day[:, None]
+            incomes -= client_income[client, row][None, :] * (lost & defaulted[:, None])
+
+        # Atraso dos recebimentos: cada célula é somada no dia deslocado
+        if receivable_delay > 0:
+            width = n_days + receivable_delay
+            target = np.arange(n_days)[None, :] + rng.integers(0, receivable_delay + 1, (n_paths, n_days))
+            target += (np.arange(n_paths) * width)[:, None]
+            incomes = np.bincount(
+                target.ravel(), weights=incomes.ravel(), minlength=n_paths * width
+            ).reshape(n_paths, width)[:, :n_days]
+
+        multiplier = 1.0 + expense_increase * rng.random((n_paths, 1))
+        paths = opening + np.cumsum(incomes - expense[row][None, :] * multiplier, axis=1)
+
+        for p, band in zip(percentiles, np.percentile(paths, percentiles, axis=0)):
+            bands[p][company] = band
+
+    result = {"Base": pd.DataFrame(base, index=days, columns=companies)}
+    for p in percentiles:
+        result[f"P{p:g}"] = pd.DataFrame(bands[p], index=days, columns=companies)
+    return result
@@ -0,0 +1,400 @@
+import numpy as np
+import pandas as pd
+
+from utils.cache import LRUCache, get_dataset_version
+from utils.date_index import get_date_index
+from utils.cube import get_daily_cube, slice_cube_by_date
+from utils.query import filter_cube
+from utils.rollups import bucket_end, period_intervals
+
+# Candidatos guardados por mês e tipo; consultas com k <= TOP_K são exatas
+TOP_K = 50
+
+_topn_cache = LRUCache(maxsize=4)
+
+
+class TopNIndex:
+    """
+    Maiores transações e maiores fornecedores/clientes por mês e tipo
+
+    Para as transações são guardadas, por mês, as TOP_K linhas de maior valor:
+    as maiores de um conjunto de meses estão necessariamente entre os
+    candidatos desses meses. Para fornecedores/clientes o total depende de
+    todos os meses escolhidos, por isso é guardada a matriz mês × contraparte
+    com os totais, e a consulta soma as linhas dos meses e faz uma seleção parcial.
+
+    Args:
+        months (numpy.ndarray): Chaves dos meses (ano * 12 + mês - 1), ordenadas
+        counterparties (numpy.ndarray): Nomes dos fornecedores/clientes
+        candidates (dict): {tipo: {chave do mês: posições no DataFrame em ordem decrescente de valor}}
+        values (dict): {tipo: {chave do mês: valores das posições correspondentes}}
+        totals (dict): {tipo: matriz (meses, contrapartes) com a soma dos valores}
+        counts (dict): {tipo: matriz (meses, contrapartes) com o número de transações}
+        first_day (pandas.Timestamp): Primeiro dia com transações
+        last_day (pandas.Timestamp): Último dia com transações
+        row_types (pandas.Categorical): Tipo de cada linha do DataFrame
+        row_values (numpy.ndarray): Valor de cada linha do DataFrame
+    """
+
+    def __init__(self, months, counterparties, candidates, values, totals, counts,
+                 first_day, last_day, row_types, row_values):
+        self.months = months
+        self.counterparties = counterparties
+        self.candidates = candidates
+        self.values = values
+        self.totals = totals
+        self.counts = counts
+        self.first_day = first_day
+        self.last_day = last_day
+        self.row_types = row_types
+        self.row_values = row_values
+
+    def top_transactions(self, months, transaction_type, k=10):
+        """
+        Posições das k maiores transações de um tipo nos meses informados
+
+        Args:
+            months (list): Pares (ano, mês)
+            transaction_type (str): Tipo da transação (ex.: "Saída")
+            k (int): Número de transações (no máximo TOP_K)
+
+        Returns:
+            numpy.ndarray: Posições no DataFrame, da maior para a menor
+        """
+        candidates = self.candidates.get(transaction_type, {})
+        values = self.values.get(transaction_type, {})
+        keys = [key for key in (_month_key(year, month) for year, month in months) if key in candidates]
+        if not keys:
+            return np.empty(0, dtype=np.int64)
+
+        positions = np.concatenate([candidates[key] for key in keys])
+        merged = np.concatenate([values[key] for key in keys])
+        return positions[_top_order(merged, k)]
+
+    def counterparty_totals(self, months, transaction_type):
+        """
+        Totais de cada fornecedor/cliente de um tipo nos meses informados
+
+        Args:
+            months (list): Pares (ano, mês)
+            transaction_type (str): Tipo da transação (ex.: "Entrada")
+
+        Returns:
+            tuple: (totais, contagens), arrays alinhados com counterparties
+        """
+        totals = np.zeros(len(self.counterparties))
+        counts = np.zeros(len(self.counterparties), dtype=np.int64)
+        if transaction_type not in self.totals or not len(self.months):
+            return totals, counts
+
+        keys = np.asarray([_month_key(year, month) for year, month in months], dtype=np.int64)
+        rows = np.minimum(self.months.searchsorted(keys), len(self.months) - 1)
+        rows = rows[self.months[rows] == keys]
+        if len(rows):
+            totals += self.totals[transaction_type][rows].sum(axis=0)
+            counts += self.counts[transaction_type][rows].sum(axis=0)
+        return totals, counts
+
+
+def _month_key(year, month):
+    return int(year) * 12 + int(month) - 1
+
+
+def _top_order(values, k):
+    # Seleção parcial (argpartition) seguida da ordenação apenas dos k escolhidos
+    if len(values) > k:
+        chosen = np.argpartition(-values, k - 1)[:k]
+    else:
+        chosen = np.arange(len(values))
+    return chosen[np.argsort(-values[chosen], kind="stable")]
+
+
+def build_topn_index(df):
+    """
+    Constrói o índice de maiores transações e contrapartes por mês e tipo
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+
+    Returns:
+        TopNIndex: Índice pronto para consultas
+    """
+    dated = np.flatnonzero(df["Date"].notna().to_numpy())
+    dates = df["Date"].iloc[dated]
+    month_keys = (dates.dt.year * 12 + dates.dt.month - 1).to_numpy(dtype=np.int64)
+    months, month_rows = np.unique(month_keys, return_inverse=True)
+
+    values = df["Value"].iloc[dated].to_numpy(dtype=float)
+    type_codes, type_names = pd.factorize(df["Type"].iloc[dated])
+    counterparty_codes, counterparties = pd.factorize(df["Supplier/Client"].iloc[dated])
+    counterparties = np.asarray(counterparties, dtype=object)
+
+    # Uma ordenação por grupo (tipo, mês) só para separar os grupos; a seleção
+    # dentro de cada grupo é parcial
+    group = type_codes.astype(np.int64) * max(len(months), 1) + month_rows
+    order = np.argsort(group, kind="stable")
+    boundaries = np.flatnonzero(np.diff(group[order])) + 1
+    starts = np.concatenate([[0], boundaries]) if len(order) else np.empty(0, dtype=np.int64)
+    stops = np.concatenate([boundaries, [len(order)]]) if len(order) else np.empty(0, dtype=np.int64)
+
+    candidates = {}
+    candidate_values = {}
+    for start, stop in zip(starts, stops):
+        members = order[start:stop]
+        type_code = type_codes[members[0]]
+        if type_code < 0:
+            continue
+        transaction_type = type_names[type_code]
+        top = members[_top_order(values[members], TOP_K)]
+        key = int(months[month_rows[members[0]]])
+        candidates.setdefault(transaction_type, {})[key] = dated[top]
+        candidate_values.setdefault(transaction_type, {})[key] = values[top]
+
+    totals = {}
+    counts = {}
+    shape = (len(months), len(counterparties))
+    for type_code, transaction_type in enumerate(type_names):
+        mask = (type_codes == type_code) & (counterparty_codes >= 0)
+        flat = month_rows[mask] * len(counterparties) + counterparty_codes[mask]
+        size = shape[0] * shape[1]
+        totals[transaction_type] = np.bincount(flat, weights=values[mask], minlength=size).reshape(shape)
+        counts[transaction_type] = np.bincount(flat, minlength=size).reshape(shape)
+
+    first_day = dates.min().normalize() if len(dates) else None
+    last_day = dates.max().normalize() if len(dates) else None
+    return TopNIndex(months, counterparties, candidates, candidate_values, totals, counts,
+                     first_day, last_day, pd.Categorical(df["Type"]), df["Value"].to_numpy(dtype=float))
+
+
+def get_topn_index(df):
+    """
+    Retorna o índice de maiores transações e contrapartes, construído uma vez por versão dos dados
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+
+    Returns:
+        TopNIndex: Índice do DataFrame
+    """
+    return _topn_cache.get_or_compute(get_dataset_version(df), lambda: build_topn_index(df))
+
+
+def merge_topn_index(index, new_df, positions, appended, cube):
+    """
+    Atualiza o índice depois de novas transações, recalculando apenas os meses tocados
+
+    Os candidatos de um mês tocado são escolhidos entre os candidatos antigos
+    e as transações novas do mês (as maiores do mês completo estão
+    necessariamente entre eles); as matrizes de contrapartes dos meses tocados
+    são refeitas a partir do cubo já atualizado. Posições antigas são
+    convertidas para a nova versão pelo mapeamento de linhas.
+
+    Args:
+        index (TopNIndex): Índice da versão anterior
+        new_df (pandas.DataFrame): Nova versão dos dados
+        positions (numpy.ndarray): Posição em new_df de cada linha da versão anterior
+        appended (numpy.ndarray): Posições em new_df das linhas acrescentadas
+        cube (pandas.DataFrame): Cubo diário da nova versão
+
+    Returns:
+        TopNIndex: Índice equivalente ao construído sobre a nova versão
+    """
+    delta_dates = new_df["Date"].iloc[appended]
+    delta_types = new_df["Type"].iloc[appended]
+    delta_values = new_df["Value"].iloc[appended].to_numpy(dtype=float)
+
+    # Tipo e valor de cada linha: os antigos vão para as novas posições
+    categories = index.row_types.categories.union(pd.Index(delta_types.dropna().unique()))
+    old_codes = index.row_types.codes
+    remap = categories.get_indexer(index.row_types.categories)
+    codes = np.empty(len(new_df), dtype=np.int64)
+    codes[positions] = np.where(old_codes >= 0, remap[old_codes], -1)
+    codes[appended] = categories.get_indexer(delta_types)
+    row_values = np.empty(len(new_df))
+    row_values[positions] = index.row_values
+    row_values[appended] = delta_values
+
+    dated = delta_dates.notna().to_numpy()
+    month_keys = (delta_dates.dt.year * 12 + delta_dates.dt.month - 1).to_numpy()[dated].astype(np.int64)
+    touched = np.unique(month_keys)
+    months = np.union1d(index.months, touched).astype(np.int64)
+
+    candidates = {
+        transaction_type: {key: positions[members] for key, members in by_month.items()}
+        for transaction_type, by_month in index.candidates.items()
+    }
+    values = {transaction_type: dict(by_month) for transaction_type, by_month in index.values.items()}
+    delta_positions = appended[dated]
+    delta_type_values = delta_types.to_numpy()[dated]
+    for key in touched:
+        in_month = month_keys == key
+        for transaction_type in pd.unique(delta_type_values[in_month]):
+            if pd.isna(transaction_type):
+                continue
+            new_rows = delta_positions[in_month & (delta_type_values == transaction_type)]
+            month_candidates = candidates.setdefault(transaction_type, {})
+            month_values = values.setdefault(transaction_type, {})
+            pool = np.concatenate([month_candidates.get(int(key), np.empty(0, dtype=np.int64)), new_rows])
+            pool_values = row_values[pool]
+            top = _top_order(pool_values, TOP_K)
+            month_candidates[int(key)] = pool[top]
+            month_values[int(key)] = pool_values[top]
+
+    # Contrapartes novas entram no fim do eixo
+    delta_counterparties = pd.unique(new_df["Supplier/Client"].iloc[appended].dropna())
+    existing = pd.Index(index.counterparties)
+    added = [name for name, code in zip(delta_counterparties, existing.get_indexer(delta_counterparties)) if code < 0]
+    counterparties = np.concatenate([index.counterparties, np.asarray(added, dtype=object)])
+
+    shape = (len(months), len(counterparties))
+    old_rows = np.searchsorted(months, index.months)
+    totals = {}
+    counts = {}
+    for transaction_type in categories:
+        totals[transaction_type] = np.zeros(shape)
+        counts[transaction_type] = np.zeros(shape, dtype=np.int64)
+        if transaction_type in index.totals:
+            totals[transaction_type][old_rows, :len(index.counterparties)] = index.totals[transaction_type]
+            counts[transaction_type][old_rows, :len(index.counterparties)] = index.counts[transaction_type]
+
+    counterparty_index = pd.Index(counterparties)
+    for key in touched:
+        row = np.searchsorted(months, key)
+        start = pd.Timestamp(year=int(key) // 12, month=int(key) % 12 + 1, day=1)
+        month = slice_cube_by_date(cube, start, bucket_end(start, "month"))
+        sums = month.groupby(["Type", "Supplier/Client"])[["Value", "Count"]].sum()
+        for transaction_type in totals:
+            totals[transaction_type][row] = 0
+            counts[transaction_type][row] = 0
+        for transaction_type, part in sums.groupby(level="Type"):
+            columns = counterparty_index.get_indexer(part.index.get_level_values("Supplier/Client"))
+            totals[transaction_type][row, columns] = part["Value"].to_numpy(dtype=float)
+            counts[transaction_type][row, columns] = part["Count"].to_numpy()
+
+    first_days = [day for day in (index.first_day, delta_dates.min()) if not pd.isna(day)]
+    last_days = [day for day in (index.last_day, delta_dates.max()) if not pd.isna(day)]
+    first_day = min(first_days).normalize() if first_days else None
+    last_day = max(last_days).normalize() if last_days else None
+    return TopNIndex(months, counterparties, candidates, values, totals, counts, first_day, last_day,
+                     pd.Categorical.from_codes(codes, categories), row_values)
+
+
+def extend_topn_index(previous_df, new_df, positions, appended):
+    """
+    Registra o índice da nova versão dos dados a partir do índice da versão anterior
+
+    Args:
+        previous_df (pandas.DataFrame): Versão anterior dos dados
+        new_df (pandas.DataFrame): Nova versão dos dados
+        positions (numpy.ndarray): Posição em new_df de cada linha de previous_df
+        appended (numpy.ndarray): Posições em new_df das linhas acrescentadas
+
+    Returns:
+        bool: True se o índice anterior estava em cache e foi atualizado
+    """
+    index = _topn_cache.get(get_dataset_version(previous_df))
+    if index is None:
+        return False
+    merged = merge_topn_index(index, new_df, positions, appended, get_daily_cube(new_df))
+    _topn_cache.set(get_dataset_version(new_df), merged)
+    return True
+
+
+def split_period(index, filters):
+    """
+    Separa um período em meses inteiros e trechos parciais de meses
+
+    Um mês conta como inteiro quando o período cobre todos os seus dias com
+    transações (as bordas dos dados também valem como bordas do mês).
+
+    Args:
+        index (TopNIndex): Índice do DataFrame
+        filters (dict): Filtros de período (ver utils.query.aggregate)
+
+    Returns:
+        tuple: (meses, trechos) com pares (ano, mês) e pares (data inicial, data final)
+    """
+    months = []
+    partial = []
+    if not len(index.months):
+        return months, partial
+
+    for start, end in period_intervals(filters, index.first_day, index.last_day):
+        while start <= end:
+            month_end = bucket_end(start.replace(day=1), "month")
+            stop = min(month_end, end)
+            starts_month = start.day == 1 or start == index.first_day
+            ends_month = stop == month_end or stop == index.last_day
+            if starts_month and ends_month:
+                months.append((start.year, start.month))
+            else:
+                partial.append((start, stop))
+            start = stop + pd.Timedelta(days=1)
+    return months, partial
+
+
+def top_transactions(df, filters, transaction_type, k=10):
+    """
+    As k maiores transações de um tipo no período
+
+    Meses inteiros vêm dos candidatos do índice; trechos parciais de meses
+    (ex.: um intervalo de datas que começa no meio do mês) são lidos da fatia
+    de datas e entram na mesma seleção parcial.
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+        filters (dict): Filtros de período (ver utils.query.aggregate)
+        transaction_type (str): Tipo da transação (ex.: "Saída")
+        k (int): Número de transações (no máximo TOP_K)
+
+    Returns:
+        pandas.DataFrame: Linhas do DataFrame, da maior para a menor
+    """
+    if k > TOP_K:
+        raise ValueError(f"O índice guarda no máximo {TOP_K} transações por mês")
+
+    index = get_topn_index(df)
+    months, partial = split_period(index, filters)
+    positions = [index.top_transactions(months, transaction_type, k)]
+
+    date_index = get_date_index(df)
+    for start, end in partial:
+        edge = date_index.positions(start, end)
+        if isinstance(edge, slice):
+            edge = np.arange(edge.start, edge.stop)
+        positions.append(edge[index.row_types[edge] == transaction_type])
+
+    positions = np.concatenate(positions).astype(np.int64)
+    values = index.row_values[positions]
+    return df.take(positions[_top_order(values, k)])
+
+
+def top_counterparties(df, filters, transaction_type, k=10):
+    """
+    Os k fornecedores/clientes de maior total de um tipo no período
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+        filters (dict): Filtros de período (ver utils.query.aggregate)
+        transaction_type (str): Tipo da transação (ex.: "Entrada")
+        k (int): Número de contrapartes
+
+    Returns:
+        pandas.DataFrame: Colunas Supplier/Client e Value, do maior para o menor total
+    """
+    index = get_topn_index(df)
+    months, partial = split_period(index, filters)
+    totals, counts = index.counterparty_totals(months, transaction_type)
+
+    # Trechos parciais de meses somados a partir do cubo diário
+    for start, end in partial:
+        edge = filter_cube(
+            get_daily_cube(df), {"start_date": start, "end_date": end, "Type": transaction_type}
+        ).groupby("Supplier/Client")[["Value", "Count"]].sum()
+        codes = pd.Index(index.counterparties).get_indexer(edge.index)
+        np.add.at(totals, codes, edge["Value"].to_numpy(dtype=float))
+        np.add.at(counts, codes, edge["Count"].to_numpy())
+
+    present = np.flatnonzero(counts > 0)
+    order = present[_top_order(totals[present], k)]
+    return pd.DataFrame({"Supplier/Client": index.counterparties[order], "Value": totals[order]})
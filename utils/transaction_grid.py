@@ -0,0 +1,181 @@
+import numpy as np
+import pandas as pd
+import streamlit as st
+
+from utils.cache import LRUCache, get_dataset_version
+from utils.display import brl_column_config
+from utils.profiler import mark, profile_fragment
+
+# Ordenações disponíveis: rótulo -> (coluna, decrescente)
+SORT_ORDERS = {
+    "Data (mais recente primeiro)": ("Date", True),
+    "Data (mais antiga primeiro)": ("Date", False),
+    "Valor (maior primeiro)": ("Value", True),
+    "Valor (menor primeiro)": ("Value", False),
+}
+
+GRID_COLUMNS = {
+    "Date": "Data",
+    "Company": "Empresa",
+    "Type": "Tipo",
+    "Work": "Obra",
+    "Supplier/Client": "Fornecedor/Cliente",
+    "Value": "Valor",
+}
+
+PAGE_SIZE = 50
+
+# Permutações de ordenação por versão do conjunto de dados
+_permutation_cache = LRUCache(maxsize=4)
+
+
+def _stable_order(column, descending):
+    # Ordenação estável crescente com valores ausentes no final; a decrescente
+    # é o inverso exato da crescente (em empates, a linha posterior vem antes)
+    if column.dtype.kind == "M":
+        values = column.to_numpy(dtype="datetime64[ns]")
+        missing = np.isnat(values)
+        values = values.view(np.int64)
+    else:
+        values = column.to_numpy(dtype=float)
+        missing = np.isnan(values)
+    present = np.flatnonzero(~missing)
+    order = present[np.argsort(values[present], kind="stable")]
+    if descending:
+        order = order[::-1]
+    return np.concatenate([order, np.flatnonzero(missing)])
+
+
+def build_sort_permutations(df):
+    """
+    Calcula a permutação (posições iloc) de cada ordenação da tabela de transações
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+
+    Returns:
+        dict: {rótulo da ordenação: numpy.ndarray de posições}
+    """
+    return {
+        label: _stable_order(df[column], descending)
+        for label, (column, descending) in SORT_ORDERS.items()
+    }
+
+
+def get_sort_permutations(df):
+    """
+    Retorna as permutações de ordenação, calculadas uma vez por versão dos dados
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+
+    Returns:
+        dict: {rótulo da ordenação: numpy.ndarray de posições}
+    """
+    return _permutation_cache.get_or_compute(get_dataset_version(df), lambda: build_sort_permutations(df))
+
+
+def subset_positions(df, subset):
+    """
+    Posições (iloc) em df das linhas de um recorte de df
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+        subset (pandas.DataFrame): Recorte de df (mesmos rótulos de índice)
+
+    Returns:
+        numpy.ndarray: Posições das linhas do recorte
+    """
+    index = df.index
+    if isinstance(index, pd.RangeIndex) and index.start == 0 and index.step == 1:
+        return subset.index.to_numpy(dtype=np.int64)
+    return index.get_indexer(subset.index)
+
+
+def sorted_positions(df, subset, sort_by):
+    """
+    Posições das linhas do recorte na ordem escolhida, sem reordenar dados
+
+    A permutação global já ordenada é filtrada pela máscara de pertinência
+    do recorte: custo O(n), sem nenhuma ordenação por consulta. Empates
+    seguem a ordem das linhas em df nas ordenações crescentes e a ordem
+    inversa nas decrescentes (na mesma data, a transação lançada por último
+    aparece primeiro em "mais recente primeiro").
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+        subset (pandas.DataFrame): Recorte de df exibido na tabela
+        sort_by (str): Rótulo da ordenação (chave de SORT_ORDERS)
+
+    Returns:
+        numpy.ndarray: Posições iloc em df, na ordem da tabela
+    """
+    permutation = get_sort_permutations(df)[sort_by]
+    if len(subset) == len(df):
+        return permutation
+    member = np.zeros(len(df), dtype=bool)
+    member[subset_positions(df, subset)] = True
+    return permutation[member[permutation]]
+
+
+def format_page(df, positions):
+    """
+    Formata para exibição apenas as linhas de uma página
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+        positions (numpy.ndarray): Posições iloc das linhas da página
+
+    Returns:
+        pandas.DataFrame: Página com datas formatadas, valores numéricos e colunas renomeadas
+    """
+    page = df.take(positions)[list(GRID_COLUMNS)]
+    page["Date"] = page["Date"].dt.strftime("%d/%m/%Y")
+    return page.rename(columns=GRID_COLUMNS).reset_index(drop=True)
+
+
+@st.fragment
+@profile_fragment("Transações Detalhadas")
+def show_transaction_grid(df, subset, key, companies=None):
+    """
+    Exibe a tabela de transações paginada
+
+    Roda como fragmento: ordenar, filtrar por empresa ou paginar reexecuta
+    apenas a tabela, não a visualização inteira.
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+        subset (pandas.DataFrame): Recorte de df a exibir
+        key (str): Prefixo das chaves dos widgets
+        companies (list, optional): Empresas oferecidas no filtro próprio da
+            tabela (None = sem filtro de empresa)
+    """
+    if companies:
+        col1, col2, col3 = st.columns([2, 2, 1])
+        with col2:
+            company = st.selectbox("Empresa", options=["Todas"] + list(companies), key=f"{key}_company")
+    else:
+        col1, col3 = st.columns([3, 1])
+        company = "Todas"
+    with col1:
+        sort_by = st.selectbox("Ordenar por", options=list(SORT_ORDERS), key=f"{key}_sort")
+
+    order = sorted_positions(df, subset, sort_by)
+    if company != "Todas":
+        order = order[df["Company"].to_numpy()[order] == company]
+    n_pages = max(1, -(-len(order) // PAGE_SIZE))
+    with col3:
+        page = st.number_input(
+            f"Página (de {n_pages})", min_value=1, max_value=n_pages, value=1, step=1, key=f"{key}_page_{n_pages}"
+        )
+
+    start = (int(page) - 1) * PAGE_SIZE
+    page_df = format_page(df, order[start:start + PAGE_SIZE])
+    st.dataframe(
+        page_df,
+        use_container_width=True,
+        hide_index=True,
+        column_config=brl_column_config("Valor")
+    )
+    st.caption(f"Transações {start + 1 if len(order) else 0}–{min(start + PAGE_SIZE, len(order))} de {len(order)}")
+    mark("Transações Detalhadas", rows=len(order), output=page_df)
@@ -0,0 +1,310 @@
+import itertools
+
+import numpy as np
+import pandas as pd
+
+# Folga (em dias) reservada após o último dia do eixo ao criar ou reposicionar as árvores
+_PADDING_DAYS = 366
+
+# Revisões únicas no processo: identificam o estado de uma camada em chaves de cache
+_revisions = itertools.count(1)
+
+
+class FenwickTree:
+    """
+    Árvore de Fenwick (binary indexed tree) de somas
+
+    Atualização de uma posição e soma de um prefixo custam O(log n).
+
+    Args:
+        size (int): Número de posições
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.tree = [0.0] * (size + 1)
+
+    def add(self, position, delta):
+        """
+        Soma delta à posição informada
+
+        Args:
+            position (int): Posição (0 a size - 1)
+            delta (float): Valor somado
+        """
+        index = position + 1
+        while index <= self.size:
+            self.tree[index] += delta
+            index += index & -index
+
+    def prefix_sum(self, stop):
+        """
+        Soma das posições [0, stop)
+
+        Args:
+            stop (int): Posição final (exclusiva); valores fora do eixo são limitados às bordas
+
+        Returns:
+            float: Soma do prefixo
+        """
+        index = min(max(stop, 0), self.size)
+        total = 0.0
+        while index > 0:
+            total += self.tree[index]
+            index -= index & -index
+        return total
+
+    def range_sum(self, start, stop):
+        """
+        Soma das posições [start, stop)
+
+        Returns:
+            float: Soma do intervalo
+        """
+        return self.prefix_sum(stop) - self.prefix_sum(start)
+
+
+class WhatIfLayer:
+    """
+    Camada de transações previstas sobre o índice de saldos real
+
+    Cada empresa tem uma árvore de Fenwick com o fluxo previsto por dia.
+    Incluir, mover, alterar ou remover uma transação prevista é uma
+    atualização pontual O(log n); os saldos consultados somam ao saldo real
+    (BalanceIndex, que não é alterado) o fluxo previsto acumulado. O atributo
+    ``revision`` muda a cada alteração e pode compor chaves de cache.
+
+    Args:
+        balance_index (utils.balances.BalanceIndex): Índice de saldos real
+        income_type (str): Tipo que identifica receitas
+        expense_type (str): Tipo que identifica despesas
+    """
+
+    def __init__(self, balance_index, income_type="Entrada", expense_type="Saída"):
+        self.base = balance_index
+        self.income_type = income_type
+        self.expense_type = expense_type
+        self.origin = balance_index.start_day
+        self.size = balance_index.n_days + _PADDING_DAYS
+        self.trees = {}
+        self.transactions = {}
+        self.revision = next(_revisions)
+        self._next_id = 1
+
+    def with_base(self, balance_index):
+        """
+        Nova camada com as mesmas transações previstas sobre outro índice real
+        (ex.: após atualizar os dados)
+
+        Args:
+            balance_index (utils.balances.BalanceIndex): Novo índice de saldos
+
+        Returns:
+            WhatIfLayer: Camada reconstruída
+        """
+        layer = WhatIfLayer(balance_index, self.income_type, self.expense_type)
+        for transaction_id, transaction in self.transactions.items():
+            layer._insert(transaction_id, dict(transaction))
+        layer._next_id = self._next_id
+        return layer
+
+    def _position(self, date):
+        return int((np.datetime64(pd.Timestamp(date).date(), "D") - self.origin).astype(np.int64))
+
+    def _signed(self, transaction):
+        value = float(transaction["Value"])
+        return value if transaction["Type"] == self.income_type else -value
+
+    def _apply(self, transaction, sign):
+        tree = self.trees.get(transaction["Company"])
+        if tree is None:
+            tree = self.trees[transaction["Company"]] = FenwickTree(self.size)
+        tree.add(self._position(transaction["Date"]), sign * self._signed(transaction))
+        self.revision = next(_revisions)
+
+    def _ensure_axis(self, date):
+        # Datas fora do eixo atual reposicionam as árvores (raro: O(m log n))
+        position = self._position(date)
+        if 0 <= position < self.size:
+            return
+        day = np.datetime64(pd.Timestamp(date).date(), "D")
+        last = self.origin + self.size - 1
+        self.origin = min(self.origin, day)
+        self.size = int((max(last, day) - self.origin).astype(np.int64)) + 1 + _PADDING_DAYS
+        self.trees = {}
+        for transaction in self.transactions.values():
+            self._apply(transaction, 1)
+
+    def _insert(self, transaction_id, transaction):
+        if transaction["Type"] not in (self.income_type, self.expense_type):
+            raise ValueError(f"Tipo inválido: {transaction['Type']}")
+        self._ensure_axis(transaction["Date"])
+        self.transactions[transaction_id] = transaction
+        self._apply(transaction, 1)
+
+    def add_transaction(self, company, date, transaction_type, value, description=""):
+        """
+        Inclui uma transação prevista
+
+        Args:
+            company (str): Empresa
+            date (date): Data prevista
+            transaction_type (str): Tipo (receita ou despesa)
+            value (float): Valor (positivo)
+            description (str): Descrição livre
+
+        Returns:
+            int: Identificador da transação prevista
+        """
+        transaction_id = self._next_id
+        self._next_id += 1
+        self._insert(transaction_id, {
+            "Company": company,
+            "Date": pd.Timestamp(date).date(),
+            "Type": transaction_type,
+            "Value": float(value),
+            "Description": description,
+        })
+        return transaction_id
+
+    def update_transaction(self, transaction_id, **changes):
+        """
+        Altera campos de uma transação prevista (Company, Date, Type, Value ou Description)
+
+        Args:
+            transaction_id (int): Identificador da transação prevista
+            **changes: Novos valores dos campos
+        """
+        transaction = self.transactions[transaction_id]
+        updated = {**transaction, **changes}
+        updated["Date"] = pd.Timestamp(updated["Date"]).date()
+        updated["Value"] = float(updated["Value"])
+        self.remove_transaction(transaction_id)
+        self._insert(transaction_id, updated)
+
+    def move_transaction(self, transaction_id, new_date):
+        """
+        Move uma transação prevista para outra data
+
+        Args:
+            transaction_id (int): Identificador da transação prevista
+            new_date (date): Nova data
+        """
+        self.update_transaction(transaction_id, Date=new_date)
+
+    def remove_transaction(self, transaction_id):
+        """
+        Remove uma transação prevista
+
+        Args:
+            transaction_id (int): Identificador da transação prevista
+        """
+        transaction = self.transactions.pop(transaction_id)
+        self._apply(transaction, -1)
+
+    def _trees_for(self, companies):
+        if companies is None:
+            return list(self.trees.values())
+        if isinstance(companies, str):
+            companies = [companies]
+        return [self.trees[company] for company in companies if company in self.trees]
+
+    def _planned_prefix(self, dates, companies, shift):
+        trees = self._trees_for(companies)
+        return np.array([
+            sum(tree.prefix_sum(self._position(date) + shift) for tree in trees)
+            for date in dates
+        ], dtype=float)
+
+    def _planned_offset(self, companies, anchors):
+        # Como no saldo real, o saldo de uma âncora já inclui tudo o que veio
+        # antes da data da âncora: o previsto acumulado até ali é descontado
+        if not anchors:
+            return 0.0
+        if isinstance(companies, str):
+            companies = [companies]
+        offset = 0.0
+        for name, (_, anchor_date) in anchors.items():
+            if companies is not None and name not in companies:
+                continue
+            tree = self.trees.get(name)
+            if tree is not None:
+                offset -= tree.prefix_sum(self._position(anchor_date))
+        return offset
+
+    def planned_flow(self, dates, companies=None):
+        """
+        Fluxo líquido previsto em cada data
+
+        Args:
+            dates (array-like): Datas consultadas
+            companies (str | list, optional): Empresa(s); None soma todas
+
+        Returns:
+            numpy.ndarray: Receitas menos despesas previstas por data
+        """
+        trees = self._trees_for(companies)
+        positions = [self._position(date) for date in dates]
+        return np.array([
+            sum(tree.range_sum(position, position + 1) for tree in trees)
+            for position in positions
+        ], dtype=float)
+
+    def planned_dates(self, start_date, end_date, companies=None):
+        """
+        Datas com transações previstas em um intervalo (inclusive)
+
+        Returns:
+            list: Datas ordenadas
+        """
+        if isinstance(companies, str):
+            companies = [companies]
+        start, end = pd.Timestamp(start_date).date(), pd.Timestamp(end_date).date()
+        return sorted({
+            transaction["Date"] for transaction in self.transactions.values()
+            if start <= transaction["Date"] <= end
+            and (companies is None or transaction["Company"] in companies)
+        })
+
+    def opening_balance(self, dates, companies=None, anchors=None):
+        """
+        Saldo de abertura de cada data, real mais previsto
+
+        Args:
+            dates (array-like): Datas consultadas
+            companies (str | list, optional): Empresa(s); None soma todas
+            anchors (dict, optional): Saldos iniciais {empresa: (saldo, data)}
+
+        Returns:
+            numpy.ndarray: Saldo de abertura por data
+        """
+        real = self.base.opening_balance(dates, companies, anchors)
+        return real + self._planned_prefix(dates, companies, 0) + self._planned_offset(companies, anchors)
+
+    def closing_balance(self, dates, companies=None, anchors=None):
+        """
+        Saldo de fechamento de cada data, real mais previsto
+
+        Args:
+            dates (array-like): Datas consultadas
+            companies (str | list, optional): Empresa(s); None soma todas
+            anchors (dict, optional): Saldos iniciais {empresa: (saldo, data)}
+
+        Returns:
+            numpy.ndarray: Saldo de fechamento por data
+        """
+        real = self.base.closing_balance(dates, companies, anchors)
+        return real + self._planned_prefix(dates, companies, 1) + self._planned_offset(companies, anchors)
+
+    def to_frame(self):
+        """
+        Transações previstas como DataFrame
+
+        Returns:
+            pandas.DataFrame: Colunas ID, Company, Date, Type, Value e Description
+        """
+        columns = ["ID", "Company", "Date", "Type", "Value", "Description"]
+        return pd.DataFrame(
+            [{"ID": transaction_id, **transaction} for transaction_id, transaction in self.transactions.items()],
+            columns=columns
+        )
@@ -0,0 +1,240 @@
+import numpy as np
+import pandas as pd
+
+from utils.cache import LRUCache, get_dataset_version
+from utils.cube import get_daily_cube, slice_cube_by_date, touched_days
+from utils.monthly import get_monthly_matrix
+from utils.query import aggregate
+
+# Resumos anuais por versão do conjunto de dados
+_summary_cache = LRUCache(maxsize=4)
+
+CATEGORY_DIMENSIONS = ["Work", "Company"]
+
+# Rótulo das transações sem obra/empresa nas tabelas por categoria
+UNASSIGNED_LABELS = {"Work": "Sem Obra", "Company": "Sem Empresa"}
+
+
+class YearlySummary:
+    """
+    Totais anuais, trimestrais, mensais e por categoria de todos os anos
+
+    Totais anuais, trimestrais e mensais vêm da matriz mensal; as tabelas por
+    categoria incluem as transações sem obra/empresa em um grupo próprio
+    (UNASSIGNED_LABELS), de modo que somam o total do ano. A troca do ano
+    selecionado e a comparação ano a ano apenas leem arrays e tabelas já prontas.
+
+    Args:
+        monthly (utils.monthly.MonthlyMatrix): Receitas e despesas por ano e mês
+        categories (dict): {dimensão: DataFrame indexado por (Year, dimensão)
+            com as colunas Income e Expense}
+        category_counts (dict): {dimensão: {ano: número de categorias informadas
+            com movimento}}
+    """
+
+    def __init__(self, monthly, categories, category_counts):
+        self.monthly = monthly
+        self.years = monthly.years
+        self.categories = categories
+        self.category_counts = category_counts
+
+    def totals(self, year):
+        """
+        Totais do ano
+
+        Returns:
+            tuple: (receitas, despesas, líquido)
+        """
+        frame = self.monthly.year_frame(year)
+        income, expense = frame["Income"].sum(), frame["Expense"].sum()
+        return income, expense, income - expense
+
+    def quarterly(self, year):
+        """
+        Totais por trimestre do ano
+
+        Returns:
+            pandas.DataFrame: Colunas Quarter (T1 a T4), Income, Expense e Net
+        """
+        frame = self.monthly.year_frame(year)
+        quarters = (frame["Month"] - 1) // 3 + 1
+        result = frame[["Income", "Expense", "Net"]].groupby(quarters.to_numpy()).sum()
+        return result.reindex(range(1, 5), fill_value=0).rename_axis("Quarter").reset_index().assign(
+            Quarter=lambda data: "T" + data["Quarter"].astype(str)
+        )
+
+    def year_over_year(self):
+        """
+        Totais de cada ano
+
+        Returns:
+            pandas.DataFrame: Colunas Year, Income, Expense e Net
+        """
+        values = self.monthly.values.sum(axis=1) if len(self.years) else np.zeros((0, 2))
+        return pd.DataFrame({
+            "Year": self.years,
+            "Income": values[:, 0],
+            "Expense": values[:, 1],
+            "Net": values[:, 0] - values[:, 1],
+        })
+
+    def by_category(self, year, dimension, direction):
+        """
+        Totais do ano por categoria (obra ou empresa) em uma direção
+
+        Args:
+            year (int): Ano
+            dimension (str): "Work" ou "Company"
+            direction (str): "Income" ou "Expense"
+
+        Returns:
+            pandas.DataFrame: Colunas dimension e Value, sem valores nulos,
+            em ordem decrescente de valor
+        """
+        table = self.categories[dimension]
+        if int(year) not in table.index.get_level_values("Year"):
+            return pd.DataFrame(columns=[dimension, "Value"])
+        values = table.xs(int(year), level="Year")[direction]
+        values = values[values != 0].sort_values(ascending=False)
+        return values.rename("Value").rename_axis(dimension).reset_index()
+
+    def category_count(self, year, dimension):
+        """
+        Número de obras ou empresas com movimento no ano
+
+        Args:
+            year (int): Ano
+            dimension (str): "Work" ou "Company"
+
+        Returns:
+            int: Quantidade de categorias
+        """
+        return self.category_counts[dimension].get(int(year), 0)
+
+
+def build_yearly_summary(df, income_type="Entrada", expense_type="Saída"):
+    """
+    Constrói o resumo anual a partir da matriz mensal e de uma agregação por categoria
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+        income_type (str): Valor de Type que identifica receitas
+        expense_type (str): Valor de Type que identifica despesas
+
+    Returns:
+        YearlySummary: Resumo de todos os anos
+    """
+    categories = {}
+    category_counts = {}
+    for dimension in CATEGORY_DIMENSIONS:
+        # dropna=False: transações sem obra/empresa entram nos totais por categoria
+        totals = aggregate(
+            df, ["Year", dimension], pivot="Type", columns=[income_type, expense_type], dropna=False
+        ).rename(columns={income_type: "Income", expense_type: "Expense"})
+        categories[dimension], category_counts[dimension] = _category_table(totals, dimension)
+
+    return YearlySummary(get_monthly_matrix(df, income_type, expense_type), categories, category_counts)
+
+
+def _category_table(totals, dimension):
+    # Tabela por (Year, dimensão) com o grupo sem categoria e a contagem de
+    # categorias informadas com movimento em cada ano
+    totals["Year"] = totals["Year"].astype(np.int64)
+
+    named = totals[dimension].notna()
+    moved = (totals["Income"] != 0) | (totals["Expense"] != 0)
+    counts = totals[named & moved].groupby("Year")[dimension].nunique().to_dict()
+
+    totals[dimension] = totals[dimension].where(named, UNASSIGNED_LABELS[dimension])
+    table = totals.groupby(["Year", dimension], sort=True)[["Income", "Expense"]].sum()
+    return table, counts
+
+
+def merge_yearly_summary(summary, monthly, cube, days, income_type="Entrada", expense_type="Saída"):
+    """
+    Atualiza o resumo anual recalculando apenas os anos tocados por novas
+    transações, a partir do cubo já atualizado
+
+    Args:
+        summary (YearlySummary): Resumo da versão anterior
+        monthly (utils.monthly.MonthlyMatrix): Matriz mensal da nova versão
+        cube (pandas.DataFrame): Cubo diário da nova versão
+        days (numpy.ndarray): Dias tocados pelas novas transações
+        income_type (str): Valor de Type que identifica receitas
+        expense_type (str): Valor de Type que identifica despesas
+
+    Returns:
+        YearlySummary: Resumo equivalente ao construído sobre a nova versão
+    """
+    if not len(days):
+        return YearlySummary(monthly, summary.categories, summary.category_counts)
+
+    years = pd.DatetimeIndex(days).year.unique()
+    rows = pd.concat([slice_cube_by_date(cube, f"{year}-01-01", f"{year}-12-31") for year in years])
+
+    categories = {}
+    category_counts = {}
+    for dimension in CATEGORY_DIMENSIONS:
+        totals = (
+            rows.groupby(["Year", dimension, "Type"], dropna=False)["Value"].sum()
+            .unstack("Type", fill_value=0)
+            .reindex(columns=[income_type, expense_type], fill_value=0)
+            .rename(columns={income_type: "Income", expense_type: "Expense"})
+            .rename_axis(columns=None)
+            .reset_index()
+        )
+        table, counts = _category_table(totals, dimension)
+
+        previous = summary.categories[dimension]
+        kept = previous[~previous.index.get_level_values("Year").isin(years)]
+        categories[dimension] = pd.concat([kept, table]).sort_index()
+        category_counts[dimension] = {
+            year: count for year, count in summary.category_counts[dimension].items() if year not in years
+        }
+        category_counts[dimension].update(counts)
+
+    return YearlySummary(monthly, categories, category_counts)
+
+
+def extend_yearly_summary(previous_df, new_df, delta_df):
+    """
+    Registra os resumos anuais da nova versão a partir dos da versão anterior
+
+    Args:
+        previous_df (pandas.DataFrame): Versão anterior dos dados
+        new_df (pandas.DataFrame): Nova versão (anterior + delta_df)
+        delta_df (pandas.DataFrame): Linhas acrescentadas
+
+    Returns:
+        bool: True se algum resumo da versão anterior foi atualizado
+    """
+    previous_version = get_dataset_version(previous_df)
+    new_version = get_dataset_version(new_df)
+    days = touched_days(delta_df)
+    updated = False
+    for (version, income_type, expense_type), summary in _summary_cache.items():
+        if version != previous_version:
+            continue
+        merged = merge_yearly_summary(
+            summary, get_monthly_matrix(new_df, income_type, expense_type), get_daily_cube(new_df),
+            days, income_type, expense_type
+        )
+        _summary_cache.set((new_version, income_type, expense_type), merged)
+        updated = True
+    return updated
+
+
+def get_yearly_summary(df, income_type="Entrada", expense_type="Saída"):
+    """
+    Retorna o resumo anual, construído uma vez por versão dos dados
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+        income_type (str): Valor de Type que identifica receitas
+        expense_type (str): Valor de Type que identifica despesas
+
+    Returns:
+        YearlySummary: Resumo de todos os anos
+    """
+    key = (get_dataset_version(df), income_type, expense_type)
+    return _summary_cache.get_or_compute(key, lambda: build_yearly_summary(df, income_type, expense_type))
@@ -4,6 +4,12 @@ import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
 from utils.data_processor import format_currency_brl
+from utils.display import brl_column_config
+from utils.cube import get_daily_cube
+from utils.query import aggregate, canonical_filters
+from utils.company_metrics import get_company_metrics
+from utils.charts import get_figure
+from utils.profiler import mark
 
 def show_company_view(df):
     """
@@ -18,8 +24,11 @@ def show_company_view(df):
         st.warning("No data available with the current filters.")
         return
     
+    # Aggregations are read from the precomputed daily cube
+    cube = get_daily_cube(df)
+    
     # Get unique companies
-    companies = df["Company"].unique().tolist()
+    companies = cube["Company"].unique().tolist()
     
     if len(companies) <= 1:
         st.info("This view requires multiple companies for comparison. Only one company found in the filtered data.")
@@ -29,13 +38,14 @@ def show_company_view(df):
             company_name = companies[0]
             st.subheader(f"{company_name} Summary")
             
-            company_df = df[df["Company"] == company_name]
-            income_df = company_df[company_df["Type"] == "Entrada"]
-            expense_df = company_df[company_df["Type"] == "Saída"]
+            totals = aggregate(
+                df, filters={"Company": company_name},
+                pivot="Type", columns=["Entrada", "Saída"], net=("Entrada", "Saída")
+            ).iloc[0]
             
-            total_income = income_df["Value"].sum()
-            total_expense = expense_df["Value"].sum()
-            net_cashflow = total_income - total_expense
+            total_income = totals["Entrada"]
+            total_expense = totals["Saída"]
+            net_cashflow = totals["Net"]
             
             col1, col2, col3 = st.columns(3)
             
@@ -61,7 +71,7 @@ def show_company_view(df):
     
     with col1:
         # Get available years
-        available_years = sorted(df["Year"].unique().tolist())
+        available_years = sorted(cube["Year"].unique().tolist())
         
         if datetime.now().year in available_years:
             default_year_index = available_years.index(datetime.now().year)
@@ -98,7 +108,7 @@ def show_company_view(df):
                 
         elif period_type == "Month":
             # Get months with data for the selected year
-            months_with_data = df[df["Year"] == selected_year]["Month"].unique().tolist()
+            months_with_data = cube[cube["Year"] == selected_year]["Month"].unique().tolist()
             month_options = [(i, datetime(2000, i, 1).strftime("%B")) for i in range(1, 13) if i in months_with_data]
             
             if not month_options:
@@ -117,17 +127,22 @@ def show_company_view(df):
     
     # Filter data based on selected time period
     if period_type == "Full Year":
-        filtered_df = df[df["Year"] == selected_year]
+        period_filters = {"Year": selected_year}
         period_title = f"Full Year {selected_year}"
     elif period_type == "Quarter":
-        filtered_df = df[(df["Year"] == selected_year) & (df["Quarter"] == quarter_num)]
+        period_filters = {"Year": selected_year, "Quarter": quarter_num}
         period_title = f"{selected_quarter} {selected_year}"
     else:  # Month
-        filtered_df = df[(df["Year"] == selected_year) & (df["Month"] == month_num)]
+        period_filters = {"Year": selected_year, "Month": month_num}
         period_title = f"{datetime(2000, month_num, 1).strftime('%B')} {selected_year}"
     
+    # Totais, margens, rankings e quebras por obra em uma única passada, em cache por período
+    metrics = get_company_metrics(df, period_filters)
+    company_data = metrics["companies"]
+    mark("Métricas por empresa", rows=len(metrics["by_work"]))
+    
     # Check if we have data for the selected period
-    if filtered_df.empty:
+    if company_data.empty:
         st.warning(f"No data available for the selected period: {period_title}")
         return
     
@@ -137,74 +152,20 @@ def show_company_view(df):
     # Create company comparison visualizations
     st.subheader("Company Financial Comparison")
     
-    # Prepare company data
-    company_data = filtered_df.groupby(["Company", "Type"])["Value"].sum().unstack(fill_value=0).reset_index()
-    
-    if "Entrada" not in company_data.columns:
-        company_data["Entrada"] = 0
-    
-    if "Saída" not in company_data.columns:
-        company_data["Saída"] = 0
-    
-    company_data["Net"] = company_data["Entrada"] - company_data["Saída"]
-    company_data["Profit Margin"] = company_data.apply(
-        lambda row: (row["Net"] / row["Entrada"] * 100) if row["Entrada"] > 0 else 0, 
-        axis=1
-    )
-    
-    # Sort companies by net cash flow
-    company_data = company_data.sort_values("Net", ascending=False)
-    
     # Create visualizations
     tabs = st.tabs(["Overview", "Entrada", "Saída", "Net Cash Flow", "Profit Margin"])
     
+    # Figuras em cache por versão dos dados e período selecionado
+    period_key = canonical_filters(period_filters)
+    
     with tabs[0]:
         # Overview chart with income and expenses for each company
-        fig = go.Figure()
-        
-        fig.add_trace(go.Bar(
-            x=company_data["Company"],
-            y=company_data["Entrada"],
-            name="Entrada",
-            marker_color="green"
-        ))
-        
-        fig.add_trace(go.Bar(
-            x=company_data["Company"],
-            y=company_data["Saída"],
-            name="Saída",
-            marker_color="red"
-        ))
-        
-        fig.add_trace(go.Scatter(
-            x=company_data["Company"],
-            y=company_data["Net"],
-            name="Net Cash Flow",
-            mode="lines+markers",
-            line=dict(color="blue", width=3),
-            marker=dict(size=8)
-        ))
-        
-        fig.update_layout(
-            title=f"Company Financial Overview for {period_title}",
-            xaxis_title="Company",
-            yaxis_title="Amount",
-            legend_title="Category",
-            barmode="group",
-            hovermode="x unified"
-        )
-        
+        fig = get_figure(df, "company_overview", period_key, lambda: _overview_figure(company_data, period_title))
         st.plotly_chart(fig, use_container_width=True)
         
         # Summary table
-        display_df = company_data.copy()
-        display_df["Entrada"] = display_df["Entrada"].apply(format_currency_brl)
-        display_df["Saída"] = display_df["Saída"].apply(format_currency_brl)
-        display_df["Net"] = display_df["Net"].apply(format_currency_brl)
-        display_df["Profit Margin"] = display_df["Profit Margin"].apply(lambda x: f"{x:.2f}%")
-        
-        # Rename columns
-        display_df = display_df[["Company", "Entrada", "Saída", "Net", "Profit Margin"]].rename(columns={
+        # Rename columns (valores numéricos, formatados na exibição)
+        display_df = company_data[["Company", "Entrada", "Saída", "Net", "Profit Margin"]].rename(columns={
             "Company": "Empresa", 
             "Entrada": "Receitas", 
             "Saída": "Despesas", 
@@ -212,191 +173,93 @@ def show_company_view(df):
             "Profit Margin": "Margem de Lucro"
         })
         
-        st.dataframe(display_df, use_container_width=True)
+        st.dataframe(
+            display_df,
+            use_container_width=True,
+            column_config=brl_column_config("Receitas", "Despesas", "Líquido", percent=("Margem de Lucro",))
+        )
     
     with tabs[1]:
         # Entrada comparison
-        fig = px.bar(
-            company_data,
-            x="Company",
-            y="Entrada",
-            title=f"Entrada Comparison for {period_title}",
-            labels={"Entrada": "Entrada Amount", "Company": "Company Name"},
-            color="Entrada",
-            color_continuous_scale="Greens"
-        )
-        
+        fig = get_figure(df, "company_income", period_key, lambda: _comparison_figure(
+            company_data, "Entrada", f"Entrada Comparison for {period_title}", "Entrada Amount", "Greens"
+        ))
         st.plotly_chart(fig, use_container_width=True)
         
         # Entrada by work code for each company
         st.subheader("Entrada by Work Code")
         
-        income_df = filtered_df[filtered_df["Type"] == "Entrada"]
-        
-        if not income_df.empty:
-            income_by_company_work = income_df.groupby(["Company", "Work"])["Value"].sum().reset_index()
-            
-            fig = px.bar(
-                income_by_company_work,
-                x="Company",
-                y="Value",
-                color="Work",
-                title="Entrada by Work Code for Each Company",
-                labels={"Value": "Entrada Amount", "Company": "Company Name"}
-            )
-            
+        fig = get_figure(df, "company_income_work", period_key, lambda: _work_figure(
+            metrics["by_work"], "Entrada", "Entrada by Work Code for Each Company", "Entrada Amount"
+        ))
+        if fig is not None:
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.info("No entrada data available for the selected period.")
     
     with tabs[2]:
         # Saída comparison
-        fig = px.bar(
-            company_data,
-            x="Company",
-            y="Saída",
-            title=f"Saída Comparison for {period_title}",
-            labels={"Saída": "Saída Amount", "Company": "Company Name"},
-            color="Saída",
-            color_continuous_scale="Reds"
-        )
-        
+        fig = get_figure(df, "company_expense", period_key, lambda: _comparison_figure(
+            company_data, "Saída", f"Saída Comparison for {period_title}", "Saída Amount", "Reds"
+        ))
         st.plotly_chart(fig, use_container_width=True)
         
         # Saída by work code for each company
         st.subheader("Saídas by Work Code")
         
-        expense_df = filtered_df[filtered_df["Type"] == "Saída"]
-        
-        if not expense_df.empty:
-            expense_by_company_work = expense_df.groupby(["Company", "Work"])["Value"].sum().reset_index()
-            
-            fig = px.bar(
-                expense_by_company_work,
-                x="Company",
-                y="Value",
-                color="Work",
-                title="Saídas by Work Code for Each Company",
-                labels={"Value": "Saída Amount", "Company": "Company Name"}
-            )
-            
+        fig = get_figure(df, "company_expense_work", period_key, lambda: _work_figure(
+            metrics["by_work"], "Saída", "Saídas by Work Code for Each Company", "Saída Amount"
+        ))
+        if fig is not None:
             st.plotly_chart(fig, use_container_width=True)
         else:
             st.info("No saída data available for the selected period.")
     
     with tabs[3]:
         # Net cash flow comparison
-        fig = px.bar(
-            company_data,
-            x="Company",
-            y="Net",
-            title=f"Net Cash Flow Comparison for {period_title}",
-            labels={"Net": "Net Cash Flow", "Company": "Company Name"},
-            color="Net",
-            color_continuous_scale="RdBu"
-        )
-        
+        fig = get_figure(df, "company_net", period_key, lambda: _comparison_figure(
+            company_data, "Net", f"Net Cash Flow Comparison for {period_title}", "Net Cash Flow", "RdBu"
+        ))
         st.plotly_chart(fig, use_container_width=True)
         
         # Net cash flow by work code for each company
         st.subheader("Net Cash Flow by Work Code")
         
-        if not filtered_df.empty:
-            # Group data by company and work code, and calculate net for each
-            net_by_company_work = filtered_df.groupby(["Company", "Work", "Type"])["Value"].sum().unstack(fill_value=0).reset_index()
-            
-            if "Entrada" not in net_by_company_work.columns:
-                net_by_company_work["Entrada"] = 0
-            
-            if "Saída" not in net_by_company_work.columns:
-                net_by_company_work["Saída"] = 0
-            
-            net_by_company_work["Net"] = net_by_company_work["Entrada"] - net_by_company_work["Saída"]
-            
-            fig = px.bar(
-                net_by_company_work,
-                x="Company",
-                y="Net",
-                color="Work",
-                title="Net Cash Flow by Work Code for Each Company",
-                labels={"Net": "Net Amount", "Company": "Company Name"}
-            )
-            
+        fig = get_figure(df, "company_net_work", period_key, lambda: _work_figure(
+            metrics["by_work"], "Net", "Net Cash Flow by Work Code for Each Company", "Net Amount"
+        ))
+        if fig is not None:
             st.plotly_chart(fig, use_container_width=True)
     
     with tabs[4]:
         # Profit margin comparison
-        fig = px.bar(
-            company_data,
-            x="Company",
-            y="Profit Margin",
-            title=f"Profit Margin Comparison for {period_title}",
-            labels={"Profit Margin": "Profit Margin (%)", "Company": "Company Name"},
-            color="Profit Margin",
-            color_continuous_scale="RdYlGn"
-        )
-        
-        fig.update_layout(yaxis_title="Profit Margin (%)")
-        
+        fig = get_figure(df, "company_margin", period_key, lambda: _comparison_figure(
+            company_data, "Profit Margin", f"Profit Margin Comparison for {period_title}",
+            "Profit Margin (%)", "RdYlGn"
+        ))
         st.plotly_chart(fig, use_container_width=True)
+    mark("Comparação entre empresas", rows=len(company_data))
     
     # Company performance metrics
     st.subheader("Key Performance Metrics")
     
-    # Prepare metrics data
-    company_metrics = company_data.copy()
-    
-    # Add expense-to-income ratio
-    company_metrics["Expense Ratio"] = company_metrics.apply(
-        lambda row: (row["Saída"] / row["Entrada"] * 100) if row["Entrada"] > 0 else 0, 
-        axis=1
-    )
-    
-    # Sort by net value
-    company_metrics = company_metrics.sort_values("Net", ascending=False)
-    
     # Create metrics visualization
     col1, col2 = st.columns(2)
     
     with col1:
         # Profit margin chart
-        fig = px.scatter(
-            company_metrics,
-            x="Entrada",
-            y="Profit Margin",
-            size=company_metrics["Net"].abs(),
-            color="Company",
-            hover_name="Company",
-            size_max=50,
-            title="Profit Margin vs Entrada"
-        )
-        
-        fig.update_layout(
-            xaxis_title="Entrada",
-            yaxis_title="Profit Margin (%)"
-        )
-        
+        fig = get_figure(df, "company_margin_scatter", period_key, lambda: _scatter_figure(
+            company_data, "Profit Margin", "Net", "Profit Margin vs Entrada", "Profit Margin (%)"
+        ))
         st.plotly_chart(fig, use_container_width=True)
     
     with col2:
         # Expense ratio chart
-        fig = px.scatter(
-            company_metrics,
-            x="Entrada",
-            y="Expense Ratio",
-            size=company_metrics["Saída"].abs(),
-            color="Company",
-            hover_name="Company",
-            size_max=50,
-            title="Expense Ratio vs Entrada"
-        )
-        
-        fig.update_layout(
-            xaxis_title="Entrada",
-            yaxis_title="Expense Ratio (%)"
-        )
-        
+        fig = get_figure(df, "company_expense_ratio_scatter", period_key, lambda: _scatter_figure(
+            company_data, "Expense Ratio", "Saída", "Expense Ratio vs Entrada", "Expense Ratio (%)"
+        ))
         st.plotly_chart(fig, use_container_width=True)
+    mark("Indicadores de desempenho")
     
     # Company ranking
     st.subheader("Company Rankings")
@@ -405,51 +268,123 @@ def show_company_view(df):
     
     with col1:
         # Entrada ranking
-        income_rank = company_metrics.sort_values("Entrada", ascending=False).reset_index(drop=True)
-        income_rank.index = income_rank.index + 1
-        income_rank = income_rank.reset_index().rename(columns={"index": "Rank"})
-        
-        income_display = income_rank[["Rank", "Company", "Entrada"]].copy()
-        income_display["Entrada"] = income_display["Entrada"].apply(format_currency_brl)
-        income_display = income_display.rename(columns={
+        income_display = metrics["rankings"]["Entrada"].rename(columns={
             "Rank": "Posição",
             "Company": "Empresa",
             "Entrada": "Receita"
         })
         
         st.markdown("#### Ranking de Receitas")
-        st.dataframe(income_display, use_container_width=True)
+        st.dataframe(income_display, use_container_width=True, column_config=brl_column_config("Receita"))
     
     with col2:
         # Net cash flow ranking
-        net_rank = company_metrics.sort_values("Net", ascending=False).reset_index(drop=True)
-        net_rank.index = net_rank.index + 1
-        net_rank = net_rank.reset_index().rename(columns={"index": "Rank"})
-        
-        net_display = net_rank[["Rank", "Company", "Net"]].copy()
-        net_display["Net"] = net_display["Net"].apply(format_currency_brl)
-        net_display = net_display.rename(columns={
+        net_display = metrics["rankings"]["Net"].rename(columns={
             "Rank": "Posição",
             "Company": "Empresa",
             "Net": "Fluxo Líquido"
         })
         
         st.markdown("#### Ranking de Fluxo de Caixa Líquido")
-        st.dataframe(net_display, use_container_width=True)
+        st.dataframe(net_display, use_container_width=True, column_config=brl_column_config("Fluxo Líquido"))
     
     with col3:
         # Profit margin ranking
-        margin_rank = company_metrics.sort_values("Profit Margin", ascending=False).reset_index(drop=True)
-        margin_rank.index = margin_rank.index + 1
-        margin_rank = margin_rank.reset_index().rename(columns={"index": "Rank"})
-        
-        margin_display = margin_rank[["Rank", "Company", "Profit Margin"]].copy()
-        margin_display["Profit Margin"] = margin_display["Profit Margin"].apply(lambda x: f"{x:.2f}%")
-        margin_display = margin_display.rename(columns={
+        margin_display = metrics["rankings"]["Profit Margin"].rename(columns={
             "Rank": "Posição",
             "Company": "Empresa",
             "Profit Margin": "Margem de Lucro"
         })
         
         st.markdown("#### Ranking de Margem de Lucro")
-        st.dataframe(margin_display, use_container_width=True)
+        st.dataframe(
+            margin_display, use_container_width=True, column_config=brl_column_config(percent=("Margem de Lucro",))
+        )
+    mark("Rankings", rows=3 * len(company_data))
+
+
+def _overview_figure(company_data, period_title):
+    fig = go.Figure()
+    
+    fig.add_trace(go.Bar(
+        x=company_data["Company"],
+        y=company_data["Entrada"],
+        name="Entrada",
+        marker_color="green"
+    ))
+    
+    fig.add_trace(go.Bar(
+        x=company_data["Company"],
+        y=company_data["Saída"],
+        name="Saída",
+        marker_color="red"
+    ))
+    
+    fig.add_trace(go.Scatter(
+        x=company_data["Company"],
+        y=company_data["Net"],
+        name="Net Cash Flow",
+        mode="lines+markers",
+        line=dict(color="blue", width=3),
+        marker=dict(size=8)
+    ))
+    
+    fig.update_layout(
+        title=f"Company Financial Overview for {period_title}",
+        xaxis_title="Company",
+        yaxis_title="Amount",
+        legend_title="Category",
+        barmode="group",
+        hovermode="x unified"
+    )
+    return fig
+
+
+def _comparison_figure(company_data, column, title, label, color_scale):
+    fig = px.bar(
+        company_data,
+        x="Company",
+        y=column,
+        title=title,
+        labels={column: label, "Company": "Company Name"},
+        color=column,
+        color_continuous_scale=color_scale
+    )
+    fig.update_layout(yaxis_title=label)
+    return fig
+
+
+def _work_figure(by_work, column, title, label):
+    # Entrada/Saída mostram só as obras com movimento do tipo; Net mostra todas
+    data = by_work if column == "Net" else by_work[by_work[column] != 0]
+    
+    if data.empty:
+        return None
+    
+    return px.bar(
+        data,
+        x="Company",
+        y=column,
+        color="Work",
+        title=title,
+        labels={column: label, "Company": "Company Name"}
+    )
+
+
+def _scatter_figure(company_metrics, column, size_column, title, label):
+    fig = px.scatter(
+        company_metrics,
+        x="Entrada",
+        y=column,
+        size=company_metrics[size_column].abs(),
+        color="Company",
+        hover_name="Company",
+        size_max=50,
+        title=title
+    )
+    
+    fig.update_layout(
+        xaxis_title="Entrada",
+        yaxis_title=label
+    )
+    return fig
@@ -6,13 +6,34 @@ import plotly.graph_objects as go
 from datetime import datetime, timedelta
 from datetime import date as date_class
 import calendar
-import io
-import base64
-from reportlab.lib import colors
-from reportlab.lib.pagesizes import A4, landscape
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from functools import partial
 from utils.data_processor import format_currency_brl
+from utils.display import brl_column_config
+from utils.cube import get_daily_cube
+from utils.query import aggregate
+from utils.balances import get_asof_balances, get_balance_index
+from utils.date_index import get_date_index, slice_by_date
+from utils.scenarios import simulate_balances
+from utils.whatif import WhatIfLayer
+from utils.cash_flow_table import get_cash_flow_table, render_cash_flow_html
+from utils.transaction_grid import show_transaction_grid
+from utils.charts import GRANULARITY_LABELS, choose_granularity, line_trace
+from utils.profiler import mark, profile_fragment
+from utils.exports import (
+    build_cash_flow_excel, build_cash_flow_pdf, export_result, export_status, request_export
+)
+
+# Cores dos gráficos e da tabela de fluxo de caixa
+RECEITA_COLOR = "#00CC96"  # Verde
+DESPESA_COLOR = "#EF553B"  # Vermelho
+TABLE_BACKGROUNDS = {
+    "header_receita": "#D7FFE5",  # Verde claro
+    "header_despesa": "#FFE5E5",  # Vermelho claro
+    "total": "#FFFFCC",  # Amarelo claro
+    "balance": "#E6F3FF",  # Azul claro
+}
+
+VIEW_OPTIONS = ["Tabela de Fluxo de Caixa", "Análise por Dia", "Análise por Obra"]
 
 def show_daily_view(df, initial_balances):
     """
@@ -28,9 +49,17 @@ def show_daily_view(df, initial_balances):
         st.warning("Não há dados disponíveis com os filtros atuais.")
         return
     
-    # Determinar o intervalo de datas
-    min_date = df["Date"].min()
-    max_date = df["Date"].max()
+    # Determinar o intervalo de datas pelo índice ordenado de datas
+    date_index = get_date_index(df)
+    if len(date_index.dates) == 0:
+        st.warning("Não há datas válidas nos dados carregados.")
+        return
+    min_date = pd.Timestamp(date_index.dates[0])
+    max_date = pd.Timestamp(date_index.dates[-1])
+    
+    # Dias com movimentação, já ordenados no cubo diário
+    cube = get_daily_cube(df)
+    data_days = list(pd.DatetimeIndex(cube["Day"].unique()).date)
     
     # Determinar a data atual (ou a mais próxima com dados)
     today = date_class.today()
@@ -42,12 +71,11 @@ def show_daily_view(df, initial_balances):
         current_date = min_date.date()
     else:
         # Encontrar a data mais próxima da atual que tenha dados
-        dates = sorted(df["Date"].dt.date.unique())
-        current_date = min(dates, key=lambda x: abs((x - today).days))
+        current_date = min(data_days, key=lambda x: abs((x - today).days))
     
     # Encontrar uma data futura dentro dos próximos 10 dias que tenha dados
     # Se não houver, usar a data máxima disponível
-    future_dates = [d for d in df["Date"].dt.date.unique() if d > current_date]
+    future_dates = [d for d in data_days if d > current_date]
     if future_dates and len(future_dates) > 0:
         # Pegar no máximo 10 dias à frente, se disponível
         end_date_default = min(future_dates[min(9, len(future_dates)-1)], max_date.date())
@@ -75,807 +103,661 @@ def show_daily_view(df, initial_balances):
             format="DD/MM/YYYY"
         )
     
-    # Filtrar dados pelo intervalo de datas selecionado
-    filtered_df = df[(df["Date"] >= pd.Timestamp(start_date)) & 
-                      (df["Date"] <= pd.Timestamp(end_date))]
+    # Filtrar dados pelo intervalo de datas selecionado (dia final inclusive)
+    filtered_df = slice_by_date(df, start_date, end_date)
     
     if filtered_df.empty:
         st.warning("Não há dados disponíveis para o período selecionado.")
         return
     
+    # Agregações diárias vêm de consultas ao cubo pré-calculado, não das transações
+    range_filters = {"start_date": start_date, "end_date": end_date}
+    mark("Recorte do período", rows=len(filtered_df))
+    
     # Criar visualização de fluxo de caixa diário por Obra
     st.subheader("Movimentações Diárias por Obra")
     
-    # Separar receitas e despesas
-    income_df = filtered_df[filtered_df["Type"] == "Entrada"]
-    expense_df = filtered_df[filtered_df["Type"] == "Saída"]
+    # Interface para seleção de como agrupar os dados
+    view_option = st.radio("Tipo de visualização:", options=VIEW_OPTIONS, horizontal=True, key="daily_view_option")
     
-    # Formatação visual com cores
-    receita_color = "#00CC96"  # Verde
-    despesa_color = "#EF553B"  # Vermelho
-    background_header_receita = "#D7FFE5"  # Verde claro
-    background_header_despesa = "#FFE5E5"  # Vermelho claro
-    background_total = "#FFFFCC"  # Amarelo claro
-    background_balance = "#E6F3FF"  # Azul claro
+    if view_option == "Tabela de Fluxo de Caixa":
+        _show_cash_flow_panels(df, initial_balances, start_date, end_date, filtered_df, range_filters)
+    elif view_option == "Análise por Dia":
+        _show_day_analysis(df, start_date, end_date, range_filters)
+    else:
+        _show_work_analysis(df, range_filters)
     
-    # Obter todas as Obras únicas
-    obras = sorted(filtered_df["Work"].unique())
+    # Tabela detalhada de transações
+    st.subheader("Transações Detalhadas")
     
-    # Interface para seleção de como agrupar os dados
-    view_option = st.radio(
-        "Tipo de visualização:",
-        options=["Tabela de Fluxo de Caixa", "Análise por Dia", "Análise por Obra"],
-        horizontal=True
+    show_transaction_grid(
+        df, filtered_df, key="daily_transactions",
+        companies=sorted(aggregate(df, ["Company"], range_filters)["Company"])
     )
+
+
+def _show_cash_flow_panels(df, initial_balances, start_date, end_date, filtered_df, range_filters):
+    """
+    Tabela de fluxo de caixa com seus painéis: transações previstas, tabela e
+    gráfico, simulação de cenários e exportação
+
+    Cada painel é um fragmento: interagir com um deles (ex.: "Atualizar" da
+    exportação ou a empresa simulada) reexecuta só aquele painel. As seleções
+    compartilhadas (empresa e camada de transações previstas) ficam em
+    st.session_state, de onde cada fragmento as lê.
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+        initial_balances (pandas.DataFrame): DataFrame com saldos iniciais
+        start_date (date): Data inicial
+        end_date (date): Data final (inclusive)
+        filtered_df (pandas.DataFrame): Transações do intervalo
+        range_filters (dict): Filtros do intervalo (ver utils.query.aggregate)
+    """
+    # Adicionar filtro por empresa (uma seleção que não existe mais volta para "Todas")
+    empresas = sorted(filtered_df["Company"].unique())
+    if st.session_state.get("daily_company") not in ["Todas"] + empresas:
+        st.session_state.pop("daily_company", None)
+    st.selectbox("Filtrar por Empresa", options=["Todas"] + empresas, index=0, key="daily_company")
     
-    # Criar visualização em formato de tabela (semelhante à imagem)
-    if view_option == "Tabela de Fluxo de Caixa":
-        # Adicionar filtro por empresa
-        empresas = sorted(filtered_df["Company"].unique())
-        empresa_selecionada = st.selectbox(
-            "Filtrar por Empresa",
-            options=["Todas"] + empresas,
-            index=0
+    # Determine datas únicas no intervalo selecionado
+    company = _selected_company()
+    table_filters = range_filters if company is None else {**range_filters, "Company": company}
+    if aggregate(df, ["Date"], table_filters).empty:
+        st.warning("Não há dados para exibir no período selecionado.")
+        return
+    
+    # Transações previstas (what-if) ficam em uma camada sobre o índice de saldos real
+    balance_index = get_balance_index(df)
+    what_if = st.session_state.get("what_if_layer")
+    if what_if is None:
+        what_if = WhatIfLayer(balance_index)
+    elif what_if.base is not balance_index:
+        what_if = what_if.with_base(balance_index)
+    st.session_state.what_if_layer = what_if
+    
+    _show_what_if_editor(empresas, start_date)
+    _show_cash_flow_table(df, initial_balances, start_date, end_date)
+    _show_scenarios(df, initial_balances, start_date, end_date, range_filters)
+    _show_exports(df, initial_balances, start_date, end_date)
+
+
+def _selected_company():
+    # Empresa escolhida no filtro da tabela (None = todas)
+    company = st.session_state.get("daily_company", "Todas")
+    return None if company == "Todas" else company
+
+
+def _selected_cash_flow(df, initial_balances, start_date, end_date):
+    """
+    Modelo da tabela de fluxo de caixa para a empresa selecionada
+
+    O modelo fica em cache pela chave (versão, intervalo, empresa, saldos,
+    revisão das previstas): os fragmentos que o usam compartilham o mesmo objeto.
+
+    Returns:
+        dict: Modelo da tabela (ver utils.cash_flow_table.get_cash_flow_table)
+    """
+    company = _selected_company()
+    # Saldos iniciais: o mais recente de cada empresa até a data inicial
+    anchors = get_asof_balances(initial_balances).at(start_date, None if company is None else [company])
+    return get_cash_flow_table(df, start_date, end_date, company, anchors, st.session_state.what_if_layer)
+
+
+@st.fragment
+@profile_fragment("Tabela de fluxo de caixa")
+def _show_cash_flow_table(df, initial_balances, start_date, end_date):
+    """
+    Tabela de fluxo de caixa diário (reais + previstos) e gráfico de barras
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+        initial_balances (pandas.DataFrame): DataFrame com saldos iniciais
+        start_date (date): Data inicial
+        end_date (date): Data final (inclusive)
+    """
+    # Modelo da tabela (matriz Obra × data, totais e saldos reais + previstos),
+    # em cache por versão dos dados, intervalo e empresa
+    cash_flow = _selected_cash_flow(df, initial_balances, start_date, end_date)
+    unique_dates = cash_flow["dates"]
+    
+    # Criar dataframe para a tabela de fluxo de caixa
+    st.markdown("### Fluxo de Caixa Diário")
+    
+    # Renderizar a tabela como HTML para maior controle visual
+    html_table = render_cash_flow_html(cash_flow, TABLE_BACKGROUNDS)
+    st.markdown(html_table, unsafe_allow_html=True)
+    mark("Tabela de fluxo de caixa", rows=len(unique_dates), output=html_table)
+    
+    # Adicionar gráfico de barras após a tabela
+    st.markdown("### Gráfico de Fluxo de Caixa Diário")
+
+    # Preparar dados para o gráfico
+    daily_df = pd.DataFrame({
+        'Data': [date.strftime("%d/%m/%Y") for date in unique_dates],
+        'Receitas': cash_flow["income_total"],
+        'Despesas': -cash_flow["expense_total"],  # Negativo para mostrar abaixo do eixo
+        'Saldo': cash_flow["net"]
+    })
+
+    # Criar gráfico de barras empilhadas
+    fig = go.Figure()
+
+    # Adicionar barras de receitas
+    fig.add_trace(go.Bar(
+        x=daily_df['Data'],
+        y=daily_df['Receitas'],
+        name='Receitas',
+        marker_color=RECEITA_COLOR
+    ))
+
+    # Adicionar barras de despesas
+    fig.add_trace(go.Bar(
+        x=daily_df['Data'],
+        y=daily_df['Despesas'],
+        name='Despesas',
+        marker_color=DESPESA_COLOR
+    ))
+
+    # Adicionar linha de saldo
+    fig.add_trace(go.Scatter(
+        x=daily_df['Data'],
+        y=daily_df['Saldo'],
+        name='Saldo',
+        mode='lines+markers',
+        line=dict(color='#FFD700', width=2),
+        marker=dict(size=8)
+    ))
+
+    # Atualizar layout
+    fig.update_layout(
+        title='Fluxo de Caixa Diário',
+        xaxis_title='Data',
+        yaxis_title='Valor (R$)',
+        barmode='group',
+        height=500,
+        showlegend=True,
+        legend=dict(
+            orientation="h",
+            yanchor="bottom",
+            y=1.02,
+            xanchor="right",
+            x=1
         )
-        
-        # Aplicar filtro de empresa se selecionada
-        if empresa_selecionada != "Todas":
-            filtered_df = filtered_df[filtered_df["Company"] == empresa_selecionada]
-            income_df = income_df[income_df["Company"] == empresa_selecionada]
-            expense_df = expense_df[expense_df["Company"] == empresa_selecionada]
-            obras = sorted(filtered_df["Work"].unique())
-        
-        # Determine datas únicas no intervalo selecionado
-        unique_dates = sorted(filtered_df["Date"].dt.date.unique())
-        
-        if len(unique_dates) == 0:
-            st.warning("Não há dados para exibir no período selecionado.")
-            return
-            
-        # Criar dataframe para a tabela de fluxo de caixa
-        st.markdown("### Fluxo de Caixa Diário")
-        
-        # Calcular saldo anterior - Usar o argumento initial_balances
-        initial_balance_for_period = 0 # Renomeado para clareza
-        daily_balances = {}
-        initial_balance_date = None
-
-        # Usar o DataFrame initial_balances passado como argumento
-        if initial_balances is not None and not initial_balances.empty:
-            if empresa_selecionada != "Todas":
-                company_balances = initial_balances[
-                    initial_balances['Company'] == empresa_selecionada
-                ]
-            else:
-                company_balances = initial_balances
-            
-            if not company_balances.empty:
-                # Garantir que a coluna Date seja do tipo datetime (pode já estar, mas garante)
-                company_balances['Date'] = pd.to_datetime(company_balances['Date'])
-                
-                # Pegar o saldo mais recente ANTES ou NA data inicial do período selecionado
-                valid_balances = company_balances[
-                    company_balances['Date'].dt.date <= start_date
-                ].copy() # Usar .copy() para evitar SettingWithCopyWarning
-                
-                if not valid_balances.empty:
-                    if empresa_selecionada == "Todas":
-                        # Para todas as empresas, somar os saldos mais recentes de cada empresa
-                        # Agrupar por empresa e pegar o saldo mais recente de cada uma ANTES ou NA start_date
-                        latest_balances = valid_balances.sort_values('Date').groupby('Company').last()
-                        initial_balance_for_period = latest_balances['Balance'].sum()
-                        # Encontrar a data mais recente entre os saldos iniciais considerados
-                        initial_balance_date = latest_balances['Date'].max().date()
-                    else:
-                        # Para uma empresa específica, pegar o saldo mais recente ANTES ou NA start_date
-                        latest_balance_row = valid_balances.sort_values('Date').iloc[-1]
-                        initial_balance_for_period = latest_balance_row['Balance']
-                        initial_balance_date = latest_balance_row['Date'].date()
-
-        # Calcular saldos diários
-        current_balance = initial_balance_for_period
-        if initial_balance_date:
-             for date_obj in unique_dates:
-                if date_obj <= initial_balance_date:
-                    # Para datas antes ou na data do saldo inicial, usar o saldo inicial calculado
-                    daily_balances[date_obj] = initial_balance_for_period
-                else:
-                    # Para datas após o saldo inicial, usar o saldo acumulado do dia anterior
-                    previous_day = date_obj - timedelta(days=1)
-                    if previous_day in daily_balances:
-                         current_balance = daily_balances[previous_day]
-                         # Atualizar com as movimentações do dia atual
-                         income = income_df[income_df['Date'].dt.date == date_obj]['Value'].sum()
-                         expense = expense_df[expense_df['Date'].dt.date == date_obj]['Value'].sum()
-                         current_balance += (income - expense)
-                         daily_balances[date_obj] = current_balance
-                    else:
-                         # Se não houver saldo do dia anterior (pode acontecer no primeiro dia após o saldo inicial)
-                         # Calcular com base no saldo inicial
-                         income = income_df[income_df['Date'].dt.date == date_obj]['Value'].sum()
-                         expense = expense_df[expense_df['Date'].dt.date == date_obj]['Value'].sum()
-                         current_balance += (income - expense)
-                         daily_balances[date_obj] = current_balance
-        else:
-             # Se não houver saldo inicial, calcular incrementalmente desde o início
-             temp_balance = 0
-             for date_obj in unique_dates:
-                  previous_day = date_obj - timedelta(days=1)
-                  if previous_day in daily_balances:
-                       temp_balance = daily_balances[previous_day]
-
-                  income = income_df[income_df['Date'].dt.date == date_obj]['Value'].sum()
-                  expense = expense_df[expense_df['Date'].dt.date == date_obj]['Value'].sum()
-                  temp_balance += (income - expense)
-                  daily_balances[date_obj] = temp_balance
-
-
-        # Gerar a tabela de fluxo de caixa no estilo da imagem
-        with st.container():
-            # Renderizar a tabela como HTML para maior controle visual
-            html_table = """
-            <style>
-            .cash-flow-table {
-                width: 100%;
-                border-collapse: collapse;
-                font-family: Arial, sans-serif;
-                font-size: 14px;
-            }
-            .cash-flow-table th, .cash-flow-table td {
-                border: 1px solid #ddd;
-                padding: 6px;
-                text-align: center;
-            }
-            .table-header {
-                background-color: #f2f2f2;
-                font-weight: bold;
-            }
-            .income-header {
-                background-color: """ + background_header_receita + """;
-                font-weight: bold;
-            }
-            .expense-header {
-                background-color: """ + background_header_despesa + """;
-                font-weight: bold;
-            }
-            .total-row {
-                background-color: """ + background_total + """;
-                font-weight: bold;
-            }
-            .balance-row {
-                background-color: """ + background_balance + """;
-                font-weight: bold;
-                color: #009900;
-            }
-            .negative-balance {
-                color: #cc0000;
-            }
-            </style>
-            
-            <table class="cash-flow-table">
-                <tr class="table-header">
-                    <th>OBRA</th>
-            """
-            
-            # Adicionar cabeçalhos de data
-            for date in unique_dates:
-                date_str = date.strftime("%d/%m/%Y")
-                html_table += f"<th>{date_str}</th>"
-            
-            html_table += """
-                </tr>
-                <tr class="balance-row">
-                    <td style="text-align:left;">SALDO ANTERIOR</td>
-            """
-            
-            # Adicionar saldo anterior para cada data
-            for date in unique_dates:
-                balance = daily_balances.get(date, 0)
-                balance_class = "negative-balance" if balance < 0 else ""
-                html_table += f"<td class='{balance_class}'>{format_currency_brl(balance)}</td>"
-            
-            html_table += """
-                </tr>
-                <tr class="income-header">
-                    <td colspan="{}" style="text-align:left;">RECEITAS</td>
-                </tr>
-            """.format(len(unique_dates) + 1)
-            
-            # Dados de receita por obra
-            income_by_date_work = income_df.groupby([income_df["Date"].dt.date, "Work"])["Value"].sum().unstack(fill_value=0)
-            
-            # Total de receitas por data
-            income_totals_by_date = income_df.groupby(income_df["Date"].dt.date)["Value"].sum()
-            
-            # Verificar quais obras têm pelo menos um valor não-zero para receitas
-            obras_com_receita = []
-            for obra in obras:
-                has_value = False
-                for date in unique_dates:
-                    if date in income_by_date_work.index and obra in income_by_date_work.columns:
-                        if income_by_date_work.loc[date, obra] > 0:
-                            has_value = True
-                            break
-                if has_value:
-                    obras_com_receita.append(obra)
-            
-            # Linhas para cada obra com receita (removendo linhas totalmente zeradas)
-            for obra in obras_com_receita:
-                html_table += f"<tr><td style='text-align:left;'>{obra}</td>"
-                
-                for date in unique_dates:
-                    if date in income_by_date_work.index and obra in income_by_date_work.columns:
-                        value = income_by_date_work.loc[date, obra]
-                        html_table += f"<td>{format_currency_brl(value)}</td>"
-                    else:
-                        html_table += "<td>0,00</td>"
-                html_table += "</tr>"
-            
-            # Linha de total de receitas
-            html_table += "<tr class='total-row'><td style='text-align:left;'>TOTAL RECEITAS</td>"
-            for date in unique_dates:
-                total = income_totals_by_date.get(date, 0)
-                html_table += f"<td>{format_currency_brl(total)}</td>"
-            html_table += "</tr>"
-            
-            # Linha de despesas
-            html_table += """
-                <tr class="expense-header">
-                    <td colspan="{}" style="text-align:left;">DESPESAS</td>
-                </tr>
-            """.format(len(unique_dates) + 1)
-            
-            # Dados de despesa por obra
-            expense_by_date_work = expense_df.groupby([expense_df["Date"].dt.date, "Work"])["Value"].sum().unstack(fill_value=0)
-            
-            # Total de despesas por data
-            expense_totals_by_date = expense_df.groupby(expense_df["Date"].dt.date)["Value"].sum()
-            
-            # Verificar quais obras têm pelo menos um valor não-zero para despesas
-            obras_com_despesa = []
-            for obra in obras:
-                has_value = False
-                for date in unique_dates:
-                    if date in expense_by_date_work.index and obra in expense_by_date_work.columns:
-                        if expense_by_date_work.loc[date, obra] > 0:
-                            has_value = True
-                            break
-                if has_value:
-                    obras_com_despesa.append(obra)
-            
-            # Linhas para cada obra com despesa (removendo linhas totalmente zeradas)
-            for obra in obras_com_despesa:
-                html_table += f"<tr><td style='text-align:left;'>{obra}</td>"
-                
-                for date in unique_dates:
-                    if date in expense_by_date_work.index and obra in expense_by_date_work.columns:
-                        value = expense_by_date_work.loc[date, obra]
-                        html_table += f"<td>{format_currency_brl(value)}</td>"
-                    else:
-                        html_table += "<td>0,00</td>"
-                html_table += "</tr>"
-            
-            # Linha de total de despesas
-            html_table += "<tr class='total-row'><td style='text-align:left;'>TOTAL DESPESAS</td>"
-            for date in unique_dates:
-                total = expense_totals_by_date.get(date, 0)
-                html_table += f"<td>{format_currency_brl(total)}</td>"
-            html_table += "</tr>"
-            
-            # Linha de saldo
-            html_table += "<tr class='balance-row'><td style='text-align:left;'>SALDO</td>"
-            for date in unique_dates:
-                income = income_totals_by_date.get(date, 0)
-                expense = expense_totals_by_date.get(date, 0)
-                balance = income - expense
-                balance_class = "negative-balance" if balance < 0 else ""
-                html_table += f"<td class='{balance_class}'>{format_currency_brl(balance)}</td>"
-            html_table += "</tr>"
-            
-            # Linha de saldo acumulado
-            html_table += "<tr class='balance-row'><td style='text-align:left;'>SALDO ACUMULADO</td>"
-            accumulated_balance = initial_balance_for_period
-            for date in unique_dates:
-                income = income_totals_by_date.get(date, 0)
-                expense = expense_totals_by_date.get(date, 0)
-                accumulated_balance += (income - expense)
-                balance_class = "negative-balance" if accumulated_balance < 0 else ""
-                html_table += f"<td class='{balance_class}'>{format_currency_brl(accumulated_balance)}</td>"
-            html_table += "</tr>"
-            
-            html_table += "</table>"
-            st.markdown(html_table, unsafe_allow_html=True)
-            
-            # Adicionar gráfico de barras após a tabela
-            st.markdown("### Gráfico de Fluxo de Caixa Diário")
-            
-            # Preparar dados para o gráfico
-            daily_data = []
-            for date in unique_dates:
-                income = income_totals_by_date.get(date, 0)
-                expense = expense_totals_by_date.get(date, 0)
-                daily_data.append({
-                    'Data': date.strftime("%d/%m/%Y"),
-                    'Receitas': income,
-                    'Despesas': -expense,  # Negativo para mostrar abaixo do eixo
-                    'Saldo': income - expense
-                })
-            
-            daily_df = pd.DataFrame(daily_data)
-            
-            # Criar gráfico de barras empilhadas
-            fig = go.Figure()
-            
-            # Adicionar barras de receitas
-            fig.add_trace(go.Bar(
-                x=daily_df['Data'],
-                y=daily_df['Receitas'],
-                name='Receitas',
-                marker_color=receita_color
+    )
+
+    # Formatar valores do eixo Y como moeda
+    fig.update_yaxes(tickformat="R$,.2f")
+
+    # Exibir o gráfico
+    st.plotly_chart(fig, use_container_width=True)
+    mark("Gráfico de fluxo de caixa", output=fig)
+
+    # Adicionar legenda explicativa
+    st.markdown("""
+    <div style='background-color: #f8f9fa; padding: 10px; border-radius: 5px; margin-top: 10px;'>
+        <p><strong>Legenda:</strong></p>
+        <ul>
+            <li>Barras verdes: Receitas</li>
+            <li>Barras vermelhas: Despesas</li>
+            <li>Linha amarela: Saldo diário</li>
+        </ul>
+    </div>
+    """, unsafe_allow_html=True)
+
+
+@st.fragment
+@profile_fragment("Cenários")
+def _show_scenarios(df, initial_balances, start_date, end_date, range_filters):
+    """
+    Simulação de cenários sobre o saldo acumulado
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+        initial_balances (pandas.DataFrame): DataFrame com saldos iniciais
+        start_date (date): Data inicial
+        end_date (date): Data final (inclusive)
+        range_filters (dict): Filtros do intervalo (ver utils.query.aggregate)
+    """
+    company = _selected_company()
+    balance_companies = None if company is None else [company]
+    table_filters = range_filters if company is None else {**range_filters, "Company": company}
+    anchors = get_asof_balances(initial_balances).at(start_date, balance_companies)
+    
+    with st.expander("Simulação de Cenários"):
+        with st.form("scenario_form"):
+            col1, col2, col3 = st.columns(3)
+            with col1:
+                receivable_delay = st.number_input("Atraso máximo dos recebimentos (dias)", 0, 180, 15)
+            with col2:
+                expense_increase = st.number_input("Aumento máximo das despesas (%)", 0.0, 100.0, 10.0)
+            with col3:
+                n_paths = st.number_input("Trajetórias", 100, 20000, 2000, step=100)
+            clients = aggregate(df, ["Supplier/Client"], {**table_filters, "Type": "Entrada"})["Supplier/Client"]
+            default_clients = st.multiselect("Clientes sujeitos a inadimplência", options=sorted(clients))
+            default_probability = st.slider("Probabilidade de inadimplência (%)", 0, 100, 10)
+            submitted = st.form_submit_button("Simular")
+
+        # Resultado válido apenas para o intervalo e a empresa em que foi simulado
+        scenario_key = (start_date, end_date, company or "Todas")
+        if submitted:
+            with st.spinner("Simulando cenários..."):
+                st.session_state.scenario_bands = scenario_key, simulate_balances(
+                    df, start_date, end_date,
+                    companies=balance_companies or sorted(aggregate(df, ["Company"], range_filters)["Company"]),
+                    anchors=anchors,
+                    n_paths=int(n_paths),
+                    receivable_delay=int(receivable_delay),
+                    expense_increase=expense_increase / 100,
+                    default_clients=default_clients,
+                    default_probability=default_probability / 100,
+                )
+
+        bands_key, bands = st.session_state.get("scenario_bands", (None, None))
+        if bands_key == scenario_key and len(bands["Base"].columns):
+            scenario_company = st.selectbox("Empresa simulada", list(bands["Base"].columns))
+            scenario_fig = go.Figure()
+            scenario_fig.add_trace(go.Scatter(
+                x=bands["P95"].index, y=bands["P95"][scenario_company],
+                name="P95", line=dict(width=0), showlegend=False
             ))
-            
-            # Adicionar barras de despesas
-            fig.add_trace(go.Bar(
-                x=daily_df['Data'],
-                y=daily_df['Despesas'],
-                name='Despesas',
-                marker_color=despesa_color
+            scenario_fig.add_trace(go.Scatter(
+                x=bands["P5"].index, y=bands["P5"][scenario_company],
+                name="P5 – P95", line=dict(width=0), fill="tonexty",
+                fillcolor="rgba(239, 85, 59, 0.2)"
             ))
-            
-            # Adicionar linha de saldo
-            fig.add_trace(go.Scatter(
-                x=daily_df['Data'],
-                y=daily_df['Saldo'],
-                name='Saldo',
-                mode='lines+markers',
-                line=dict(color='#FFD700', width=2),
-                marker=dict(size=8)
+            scenario_fig.add_trace(go.Scatter(
+                x=bands["P50"].index, y=bands["P50"][scenario_company],
+                name="Mediana", line=dict(color=DESPESA_COLOR, width=2)
             ))
-            
-            # Atualizar layout
-            fig.update_layout(
-                title='Fluxo de Caixa Diário',
-                xaxis_title='Data',
-                yaxis_title='Valor (R$)',
-                barmode='group',
-                height=500,
-                showlegend=True,
-                legend=dict(
-                    orientation="h",
-                    yanchor="bottom",
-                    y=1.02,
-                    xanchor="right",
-                    x=1
-                )
+            scenario_fig.add_trace(go.Scatter(
+                x=bands["Base"].index, y=bands["Base"][scenario_company],
+                name="Saldo Acumulado", line=dict(color=RECEITA_COLOR, width=2, dash="dash")
+            ))
+            scenario_fig.update_layout(
+                title=f"Faixas de Saldo Acumulado - {scenario_company}",
+                xaxis_title="Data",
+                yaxis_title="Saldo (R$)",
+                height=450
             )
-            
-            # Formatar valores do eixo Y como moeda
-            fig.update_yaxes(tickformat="R$,.2f")
-            
-            # Exibir o gráfico
-            st.plotly_chart(fig, use_container_width=True)
-            
-            # Adicionar legenda explicativa
-            st.markdown("""
-            <div style='background-color: #f8f9fa; padding: 10px; border-radius: 5px; margin-top: 10px;'>
-                <p><strong>Legenda:</strong></p>
-                <ul>
-                    <li>Barras verdes: Receitas</li>
-                    <li>Barras vermelhas: Despesas</li>
-                    <li>Linha amarela: Saldo diário</li>
-                </ul>
-            </div>
-            """, unsafe_allow_html=True)
-            
-            # Adicionar função para gerar PDF
-            def generate_pdf():
-                # Configurar documento PDF
-                buffer = io.BytesIO()
-                doc = SimpleDocTemplate(buffer, pagesize=landscape(A4))
-                elements = []
-                
-                # Estilos
-                styles = getSampleStyleSheet()
-                style_title = ParagraphStyle(
-                    name='TitleStyle',
-                    parent=styles['Heading1'],
-                    fontSize=16,
-                    alignment=1,  # Centralizado
-                    spaceAfter=12
-                )
-                style_header = ParagraphStyle(
-                    name='HeaderStyle',
-                    parent=styles['Heading2'],
-                    fontSize=12,
-                    alignment=1,  # Centralizado
-                    spaceAfter=10
-                )
-                
-                # Título e Cabeçalho
-                title = Paragraph(f"Combrasen Group - Fluxo de Caixa Diário", style_title)
-                subtitle = Paragraph(f"Período: {start_date.strftime('%d/%m/%Y')} a {end_date.strftime('%d/%m/%Y')}", style_header)
-                elements.append(title)
-                elements.append(subtitle)
-                elements.append(Spacer(1, 10))
-                
-                # Dados para a tabela
-                table_data = []
-                
-                # Cabeçalho da tabela
-                header_row = ["OBRA"]
-                for date in unique_dates:
-                    header_row.append(date.strftime("%d/%m/%Y"))
-                table_data.append(header_row)
-                
-                # Receitas
-                table_data.append(["RECEITAS"] + ["" for _ in range(len(unique_dates))])
-                
-                # Dados de receitas
-                for obra in obras_com_receita:
-                    row = [obra]
-                    for date in unique_dates:
-                        value = 0
-                        if date in income_by_date_work.index and obra in income_by_date_work.columns:
-                            value = income_by_date_work.loc[date, obra]
-                        row.append(format_currency_brl(value) if value > 0 else "R$ 0,00")
-                    table_data.append(row)
-                
-                # Total de receitas
-                row_total_income = ["TOTAL RECEITA"]
-                for date in unique_dates:
-                    total_value = income_totals_by_date.get(date, 0)
-                    row_total_income.append(format_currency_brl(total_value) if total_value > 0 else "R$ 0,00")
-                table_data.append(row_total_income)
-                
-                # Despesas
-                table_data.append(["DESPESAS"] + ["" for _ in range(len(unique_dates))])
-                
-                # Dados de despesas
-                for obra in obras_com_despesa:
-                    row = [obra]
-                    for date in unique_dates:
-                        value = 0
-                        if date in expense_by_date_work.index and obra in expense_by_date_work.columns:
-                            value = expense_by_date_work.loc[date, obra]
-                        row.append(format_currency_brl(value) if value > 0 else "R$ 0,00")
-                    table_data.append(row)
-                
-                # Total de despesas
-                row_total_expense = ["TOTAL DESPESA"]
-                for date in unique_dates:
-                    total_value = expense_totals_by_date.get(date, 0)
-                    row_total_expense.append(format_currency_brl(total_value) if total_value > 0 else "R$ 0,00")
-                table_data.append(row_total_expense)
-                
-                # Saldo
-                row_balance = ["SALDO"]
-                for date in unique_dates:
-                    income_value = income_totals_by_date.get(date, 0)
-                    expense_value = expense_totals_by_date.get(date, 0)
-                    balance = income_value - expense_value
-                    row_balance.append(format_currency_brl(balance))
-                table_data.append(row_balance)
-                
-                # Criar tabela para PDF
-                # Ajustar tamanho da coluna automaticamente
-                col_widths = [120] + [90] * len(unique_dates)  # Primeira coluna maior para o nome da obra
-                
-                # Criar a tabela
-                table = Table(table_data, colWidths=col_widths)
-                
-                # Estilos da tabela
-                style = TableStyle([
-                    ('BACKGROUND', (0, 0), (-1, 0), colors.lightgrey),  # Cabeçalho
-                    ('TEXTCOLOR', (0, 0), (-1, 0), colors.black),
-                    ('ALIGN', (0, 0), (-1, 0), 'CENTER'),
-                    ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                    ('FONTSIZE', (0, 0), (-1, 0), 10),
-                    ('BOTTOMPADDING', (0, 0), (-1, 0), 8),
-                    ('BACKGROUND', (0, 1), (-1, 1), colors.lightgreen),  # Seção de receitas
-                    ('FONTNAME', (0, 1), (-1, 1), 'Helvetica-Bold'),
-                    ('ALIGN', (0, 1), (0, 1), 'LEFT'),
-                    ('SPAN', (0, 1), (-1, 1)),  # Mesclar células do cabeçalho de receitas
-                    ('GRID', (0, 0), (-1, -1), 0.5, colors.black),
-                ])
-                
-                # Índice da linha de total de receitas
-                total_income_row = 2 + len(obras_com_receita)
-                # Índice da linha de cabeçalho de despesas
-                expense_header_row = total_income_row + 1
-                # Índice da linha de total de despesas
-                total_expense_row = expense_header_row + 1 + len(obras_com_despesa)
-                # Índice da linha de saldo
-                balance_row = total_expense_row + 1
-                
-                # Estilo para total de receitas
-                style.add('BACKGROUND', (0, total_income_row), (-1, total_income_row), colors.lightyellow)
-                style.add('FONTNAME', (0, total_income_row), (-1, total_income_row), 'Helvetica-Bold')
-                
-                # Estilo para cabeçalho de despesas
-                style.add('BACKGROUND', (0, expense_header_row), (-1, expense_header_row), colors.lightcoral)
-                style.add('FONTNAME', (0, expense_header_row), (-1, expense_header_row), 'Helvetica-Bold')
-                style.add('ALIGN', (0, expense_header_row), (0, expense_header_row), 'LEFT')
-                style.add('SPAN', (0, expense_header_row), (-1, expense_header_row))  # Mesclar células
-                
-                # Estilo para total de despesas
-                style.add('BACKGROUND', (0, total_expense_row), (-1, total_expense_row), colors.lightyellow)
-                style.add('FONTNAME', (0, total_expense_row), (-1, total_expense_row), 'Helvetica-Bold')
-                
-                # Estilo para saldo
-                style.add('BACKGROUND', (0, balance_row), (-1, balance_row), colors.lightyellow)
-                style.add('FONTNAME', (0, balance_row), (-1, balance_row), 'Helvetica-Bold')
-                
-                # Aplicar estilos
-                table.setStyle(style)
-                elements.append(table)
-                
-                # Construir o documento
-                doc.build(elements)
-                
-                buffer.seek(0)
-                return buffer.getvalue()
-            
-            # Botões para download
-            col1, col2 = st.columns(2)
-            
-            with col1:
-                # Botão para baixar como PDF
-                st.download_button(
-                    label="Baixar como PDF",
-                    data=generate_pdf(),
-                    file_name=f"fluxo_caixa_{start_date.strftime('%d%m%Y')}_a_{end_date.strftime('%d%m%Y')}.pdf",
-                    mime="application/pdf"
-                )
-            
-            with col2:
-                # Adicionar botão para baixar como Excel (a ser implementado)
-                st.download_button(
-                    label="Baixar como Excel",
-                    data="Funcionalidade em desenvolvimento",
-                    file_name="fluxo_caixa_diario.xlsx",
-                    mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
-                    disabled=True  # Temporariamente desativado
-                )
-            
-    # Criar tabelas e gráficos com base na seleção
-    elif view_option == "Análise por Dia":
-        # Agrupar por dia
-        daily_income = income_df.groupby(["Date", "Work"])["Value"].sum().reset_index()
-        daily_expense = expense_df.groupby(["Date", "Work"])["Value"].sum().reset_index()
-        
-        # Formatar datas para exibição
-        daily_income["Date_Str"] = daily_income["Date"].dt.strftime("%d/%m/%Y")
-        daily_expense["Date_Str"] = daily_expense["Date"].dt.strftime("%d/%m/%Y")
-        
-        # Criar gráfico de barras empilhadas para receitas
-        if not daily_income.empty:
-            fig_income = px.bar(
-                daily_income,
-                x="Date",
-                y="Value",
-                color="Work",
-                title="Receitas Diárias por Obra",
-                labels={"Value": "Valor (R$)", "Date": "Data", "Work": "Obra"}
+            st.plotly_chart(scenario_fig, use_container_width=True)
+    mark("Cenários")
+
+
+@st.fragment
+@profile_fragment("Exportação")
+def _show_exports(df, initial_balances, start_date, end_date):
+    """
+    Botões de exportação da tabela de fluxo de caixa (PDF e Excel)
+
+    Os arquivos são gerados em segundo plano; "Atualizar" reexecuta apenas
+    este painel para verificar se ficaram prontos.
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+        initial_balances (pandas.DataFrame): DataFrame com saldos iniciais
+        start_date (date): Data inicial
+        end_date (date): Data final (inclusive)
+    """
+    cash_flow = _selected_cash_flow(df, initial_balances, start_date, end_date)
+    
+    # Botões para download
+    col1, col2 = st.columns(2)
+    
+    with col1:
+        # PDF gerado sob demanda em segundo plano, em cache pela chave da tabela
+        pdf_key = ("pdf", cash_flow["key"])
+        pdf_status = export_status(pdf_key)
+        if pdf_status == "done":
+            st.download_button(
+                label="Baixar como PDF",
+                data=export_result(pdf_key),
+                file_name=f"fluxo_caixa_{start_date.strftime('%d%m%Y')}_a_{end_date.strftime('%d%m%Y')}.pdf",
+                mime="application/pdf"
+            )
+        elif pdf_status == "running":
+            st.info("Gerando PDF em segundo plano...")
+            st.button("Atualizar", key="pdf_refresh")
+        else:
+            if pdf_status == "error":
+                st.error("Não foi possível gerar o PDF. Tente novamente.")
+            st.button(
+                "Gerar PDF",
+                on_click=request_export,
+                args=(pdf_key, partial(build_cash_flow_pdf, cash_flow, start_date, end_date))
             )
-            
-            fig_income.update_layout(
-                barmode="stack",
-                xaxis_tickformat="%d/%m/%Y",
-                hovermode="x unified"
+
+    with col2:
+        # Excel também sob demanda, com a mesma chave de cache da tabela
+        excel_key = ("xlsx", cash_flow["key"])
+        excel_status = export_status(excel_key)
+        if excel_status == "done":
+            st.download_button(
+                label="Baixar como Excel",
+                data=export_result(excel_key),
+                file_name=f"fluxo_caixa_{start_date.strftime('%d%m%Y')}_a_{end_date.strftime('%d%m%Y')}.xlsx",
+                mime="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet"
+            )
+        elif excel_status == "running":
+            st.info("Gerando Excel em segundo plano...")
+            st.button("Atualizar", key="excel_refresh")
+        else:
+            if excel_status == "error":
+                st.error("Não foi possível gerar o Excel. Tente novamente.")
+            st.button(
+                "Gerar Excel",
+                on_click=request_export,
+                args=(excel_key, partial(build_cash_flow_excel, cash_flow, start_date, end_date))
             )
-            
+    mark("Exportação")
+
+
+def _show_day_analysis(df, start_date, end_date, range_filters):
+    """
+    Receitas, despesas e fluxo líquido por data, agrupados conforme o tamanho do intervalo
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+        start_date (date): Data inicial
+        end_date (date): Data final (inclusive)
+        range_filters (dict): Filtros do intervalo (ver utils.query.aggregate)
+    """
+    # Agrupar por dia, semana ou mês conforme o tamanho do intervalo
+    granularity = choose_granularity(start_date, end_date)
+    granularity_label = GRANULARITY_LABELS[granularity]
+    daily_income = aggregate(df, ["Date", "Work"], {**range_filters, "Type": "Entrada"}, granularity=granularity)
+    daily_expense = aggregate(df, ["Date", "Work"], {**range_filters, "Type": "Saída"}, granularity=granularity)
+
+    # Formatar datas para exibição
+    daily_income["Date_Str"] = daily_income["Date"].dt.strftime("%d/%m/%Y")
+    daily_expense["Date_Str"] = daily_expense["Date"].dt.strftime("%d/%m/%Y")
+
+    # Criar gráfico de barras empilhadas para receitas
+    if not daily_income.empty:
+        fig_income = px.bar(
+            daily_income,
+            x="Date",
+            y="Value",
+            color="Work",
+            title=f"Receitas por Obra ({granularity_label})",
+            labels={"Value": "Valor (R$)", "Date": "Data", "Work": "Obra"}
+        )
+
+        fig_income.update_layout(
+            barmode="stack",
+            xaxis_tickformat="%d/%m/%Y",
+            hovermode="x unified"
+        )
+
+        st.plotly_chart(fig_income, use_container_width=True)
+    else:
+        st.info("Não há dados de receitas para o período selecionado.")
+
+    # Criar gráfico de barras empilhadas para despesas
+    if not daily_expense.empty:
+        fig_expense = px.bar(
+            daily_expense,
+            x="Date",
+            y="Value",
+            color="Work",
+            title=f"Despesas por Obra ({granularity_label})",
+            labels={"Value": "Valor (R$)", "Date": "Data", "Work": "Obra"}
+        )
+
+        fig_expense.update_layout(
+            barmode="stack",
+            xaxis_tickformat="%d/%m/%Y",
+            hovermode="x unified"
+        )
+
+        st.plotly_chart(fig_expense, use_container_width=True)
+    else:
+        st.info("Não há dados de despesas para o período selecionado.")
+
+    # Fluxo de caixa líquido diário (linha reduzida por LTTB em intervalos longos)
+    daily_net = aggregate(
+        df, ["Date"], range_filters,
+        pivot="Type", columns=["Entrada", "Saída"], net=("Entrada", "Saída")
+    ).rename(columns={"Net": "Net Value"})
+
+    if not daily_net.empty and len(daily_net) > 1:
+        fig_net = go.Figure()
+
+        fig_net.add_trace(line_trace(
+            daily_net["Date"],
+            daily_net["Net Value"],
+            mode="lines+markers",
+            name="Fluxo de Caixa Líquido",
+            line=dict(color="blue", width=2),
+            marker=dict(size=6)
+        ))
+
+        fig_net.update_layout(
+            title="Fluxo de Caixa Líquido Diário",
+            xaxis_title="Data",
+            yaxis_title="Valor (R$)",
+            xaxis_tickformat="%d/%m/%Y",
+            hovermode="x unified"
+        )
+
+        st.plotly_chart(fig_net, use_container_width=True)
+    mark("Análise por Dia", rows=len(daily_income) + len(daily_expense))
+
+
+def _show_work_analysis(df, range_filters):
+    """
+    Receitas, despesas e saldo por Obra no intervalo
+
+    Args:
+        df (pandas.DataFrame): DataFrame processado
+        range_filters (dict): Filtros do intervalo (ver utils.query.aggregate)
+    """
+    # Obter todas as Obras únicas
+    obras = sorted(aggregate(df, ["Work"], range_filters)["Work"])
+    
+    # Agrupar por Obra e calcular totais
+    obra_income = aggregate(df, ["Work"], {**range_filters, "Type": "Entrada"})
+    obra_expense = aggregate(df, ["Work"], {**range_filters, "Type": "Saída"})
+
+    # Formatar para exibição
+    obra_income["Type"] = "Receita"
+    obra_expense["Type"] = "Despesa"
+
+    # Tabelas de valores por Obra
+    col1, col2 = st.columns(2)
+
+    with col1:
+        st.subheader("Receitas por Obra")
+        if not obra_income.empty:
+            obra_income = obra_income.sort_values("Value", ascending=False)
+            st.dataframe(
+                obra_income.rename(columns={"Work": "Obra", "Value": "Valor"}),
+                use_container_width=True,
+                column_config=brl_column_config("Valor")
+            )
+
+            # Gráfico de barras para receitas
+            fig_income = px.bar(
+                obra_income,
+                y="Work",
+                x="Value",
+                orientation="h",
+                title="Total de Receitas por Obra",
+                labels={"Value": "Valor (R$)", "Work": "Obra"},
+                color_discrete_sequence=[RECEITA_COLOR]
+            )
+
+            fig_income.update_layout(yaxis={"categoryorder": "total ascending"})
             st.plotly_chart(fig_income, use_container_width=True)
         else:
             st.info("Não há dados de receitas para o período selecionado.")
-        
-        # Criar gráfico de barras empilhadas para despesas
-        if not daily_expense.empty:
-            fig_expense = px.bar(
-                daily_expense,
-                x="Date",
-                y="Value",
-                color="Work",
-                title="Despesas Diárias por Obra",
-                labels={"Value": "Valor (R$)", "Date": "Data", "Work": "Obra"}
+
+    with col2:
+        st.subheader("Despesas por Obra")
+        if not obra_expense.empty:
+            obra_expense = obra_expense.sort_values("Value", ascending=False)
+            st.dataframe(
+                obra_expense.rename(columns={"Work": "Obra", "Value": "Valor"}),
+                use_container_width=True,
+                column_config=brl_column_config("Valor")
             )
-            
-            fig_expense.update_layout(
-                barmode="stack",
-                xaxis_tickformat="%d/%m/%Y",
-                hovermode="x unified"
+
+            # Gráfico de barras para despesas
+            fig_expense = px.bar(
+                obra_expense,
+                y="Work",
+                x="Value",
+                orientation="h",
+                title="Total de Despesas por Obra",
+                labels={"Value": "Valor (R$)", "Work": "Obra"},
+                color_discrete_sequence=[DESPESA_COLOR]
             )
-            
+
+            fig_expense.update_layout(yaxis={"categoryorder": "total ascending"})
             st.plotly_chart(fig_expense, use_container_width=True)
         else:
             st.info("Não há dados de despesas para o período selecionado.")
-            
-        # Fluxo de caixa líquido diário
-        daily_net = filtered_df.groupby("Date").apply(
-            lambda x: x[x["Type"] == "Entrada"]["Value"].sum() - 
-                     x[x["Type"] == "Saída"]["Value"].sum()
-        ).reset_index(name="Net Value")
-        
-        if not daily_net.empty and len(daily_net) > 1:
-            fig_net = go.Figure()
-            
-            fig_net.add_trace(go.Scatter(
-                x=daily_net["Date"],
-                y=daily_net["Net Value"],
-                mode="lines+markers",
-                name="Fluxo de Caixa Líquido",
-                line=dict(color="blue", width=2),
-                marker=dict(size=6)
+
+    # Saldo por Obra
+    st.subheader("Saldo por Obra")
+
+    # Criar dataframe com o saldo para cada Obra
+    obra_balance = pd.DataFrame(columns=["Work", "Receita", "Despesa", "Saldo"])
+
+    for obra in obras:
+        receita = obra_income[obra_income["Work"] == obra]["Value"].sum() if not obra_income.empty else 0
+        despesa = obra_expense[obra_expense["Work"] == obra]["Value"].sum() if not obra_expense.empty else 0
+        saldo = receita - despesa
+
+        obra_balance = pd.concat([
+            obra_balance, 
+            pd.DataFrame([{"Work": obra, "Receita": receita, "Despesa": despesa, "Saldo": saldo}])
+        ])
+
+    if not obra_balance.empty:
+        # Ordenar por saldo
+        obra_balance = obra_balance.sort_values("Saldo", ascending=False)
+
+        # Exibir tabela (valores numéricos, formatados na exibição)
+        st.dataframe(
+            obra_balance.astype({"Receita": float, "Despesa": float, "Saldo": float}).rename(columns={"Work": "Obra"}),
+            use_container_width=True,
+            column_config=brl_column_config("Receita", "Despesa", "Saldo")
+        )
+
+        # Gráfico de barras para o saldo
+        fig_balance = go.Figure()
+
+        # Adicionar barras para cada obra
+        for i, row in obra_balance.iterrows():
+            color = RECEITA_COLOR if row["Saldo"] >= 0 else DESPESA_COLOR
+
+            fig_balance.add_trace(go.Bar(
+                x=[row["Work"]],
+                y=[row["Saldo"]],
+                name=row["Work"],
+                marker_color=color
             ))
-            
-            fig_net.update_layout(
-                title="Fluxo de Caixa Líquido Diário",
-                xaxis_title="Data",
-                yaxis_title="Valor (R$)",
-                xaxis_tickformat="%d/%m/%Y",
-                hovermode="x unified"
+
+        fig_balance.update_layout(
+            title="Saldo por Obra",
+            xaxis_title="Obra",
+            yaxis_title="Valor (R$)",
+            showlegend=False,
+            hovermode="closest"
+        )
+
+        st.plotly_chart(fig_balance, use_container_width=True)
+    else:
+        st.info("Não há dados suficientes para calcular o saldo por Obra.")
+    mark("Análise por Obra", rows=len(obra_income) + len(obra_expense))
+
+
+@st.fragment
+@profile_fragment("Transações previstas")
+def _show_what_if_editor(companies, default_date):
+    """
+    Editor das transações previstas: incluir, mover e remover
+
+    Roda como fragmento: preencher o formulário ou escolher a transação a
+    mover reexecuta só o editor. As alterações são aplicadas em callbacks e,
+    como mudam a tabela, os cenários e a exportação, disparam um rerun da
+    aplicação inteira.
+
+    Args:
+        companies (list): Empresas disponíveis
+        default_date (date): Data sugerida para novas transações
+    """
+    what_if = st.session_state.what_if_layer
+
+    def _edited(change, *args):
+        change(*args)
+        st.session_state.what_if_edited = True
+
+    def _add():
+        value = st.session_state.what_if_value
+        if value > 0:
+            _edited(
+                what_if.add_transaction,
+                st.session_state.what_if_company,
+                st.session_state.what_if_date,
+                st.session_state.what_if_type,
+                value,
+                st.session_state.what_if_description
             )
-            
-            st.plotly_chart(fig_net, use_container_width=True)
-        
-    else:  # Agrupar por Obra
-        # Agrupar por Obra e calcular totais
-        obra_income = income_df.groupby("Work")["Value"].sum().reset_index()
-        obra_expense = expense_df.groupby("Work")["Value"].sum().reset_index()
-        
-        # Formatar para exibição
-        obra_income["Type"] = "Receita"
-        obra_expense["Type"] = "Despesa"
-        
-        # Tabelas de valores por Obra
-        col1, col2 = st.columns(2)
-        
+
+    # Edição feita no rerun do fragmento: os demais painéis dependem da camada
+    if st.session_state.pop("what_if_edited", False):
+        st.rerun(scope="app")
+
+    with st.expander("Transações Previstas (Simulação)"):
+        with st.form("what_if_form", clear_on_submit=True):
+            col1, col2, col3, col4 = st.columns(4)
+            with col1:
+                st.selectbox("Empresa", options=companies, key="what_if_company")
+            with col2:
+                st.date_input("Data", value=default_date, format="DD/MM/YYYY", key="what_if_date")
+            with col3:
+                st.selectbox("Tipo", options=["Entrada", "Saída"], key="what_if_type")
+            with col4:
+                st.number_input("Valor (R$)", min_value=0.0, step=100.0, key="what_if_value")
+            st.text_input("Descrição", key="what_if_description")
+            st.form_submit_button("Adicionar Transação Prevista", on_click=_add)
+
+        planned = what_if.to_frame()
+        if planned.empty:
+            st.info("Nenhuma transação prevista. As transações previstas não alteram os dados reais.")
+            mark("Transações previstas")
+            return
+
+        display_planned = planned.assign(
+            Date=[date.strftime("%d/%m/%Y") for date in planned["Date"]]
+        ).rename(columns={
+            "Company": "Empresa", "Date": "Data", "Type": "Tipo", "Value": "Valor", "Description": "Descrição"
+        })
+        st.dataframe(
+            display_planned, use_container_width=True, hide_index=True, column_config=brl_column_config("Valor")
+        )
+
+        col1, col2, col3, col4 = st.columns([2, 2, 1, 1])
         with col1:
-            st.subheader("Receitas por Obra")
-            if not obra_income.empty:
-                obra_income = obra_income.sort_values("Value", ascending=False)
-                display_income = obra_income.copy()
-                display_income["Value"] = display_income["Value"].apply(format_currency_brl)
-                
-                st.dataframe(
-                    display_income.rename(columns={"Work": "Obra", "Value": "Valor"}),
-                    use_container_width=True
-                )
-                
-                # Gráfico de barras para receitas
-                fig_income = px.bar(
-                    obra_income,
-                    y="Work",
-                    x="Value",
-                    orientation="h",
-                    title="Total de Receitas por Obra",
-                    labels={"Value": "Valor (R$)", "Work": "Obra"},
-                    color_discrete_sequence=[receita_color]
-                )
-                
-                fig_income.update_layout(yaxis={"categoryorder": "total ascending"})
-                st.plotly_chart(fig_income, use_container_width=True)
-            else:
-                st.info("Não há dados de receitas para o período selecionado.")
-        
-        with col2:
-            st.subheader("Despesas por Obra")
-            if not obra_expense.empty:
-                obra_expense = obra_expense.sort_values("Value", ascending=False)
-                display_expense = obra_expense.copy()
-                display_expense["Value"] = display_expense["Value"].apply(format_currency_brl)
-                
-                st.dataframe(
-                    display_expense.rename(columns={"Work": "Obra", "Value": "Valor"}),
-                    use_container_width=True
-                )
-                
-                # Gráfico de barras para despesas
-                fig_expense = px.bar(
-                    obra_expense,
-                    y="Work",
-                    x="Value",
-                    orientation="h",
-                    title="Total de Despesas por Obra",
-                    labels={"Value": "Valor (R$)", "Work": "Obra"},
-                    color_discrete_sequence=[despesa_color]
+            selected = st.selectbox(
+                "Transação prevista",
+                options=planned["ID"].tolist(),
+                format_func=lambda transaction_id: (
+                    f"#{transaction_id} - {what_if.transactions[transaction_id]['Company']} - "
+                    f"{format_currency_brl(what_if.transactions[transaction_id]['Value'])}"
                 )
-                
-                fig_expense.update_layout(yaxis={"categoryorder": "total ascending"})
-                st.plotly_chart(fig_expense, use_container_width=True)
-            else:
-                st.info("Não há dados de despesas para o período selecionado.")
-        
-        # Saldo por Obra
-        st.subheader("Saldo por Obra")
-        
-        # Criar dataframe com o saldo para cada Obra
-        obra_balance = pd.DataFrame(columns=["Work", "Receita", "Despesa", "Saldo"])
-        
-        for obra in obras:
-            receita = obra_income[obra_income["Work"] == obra]["Value"].sum() if not obra_income.empty else 0
-            despesa = obra_expense[obra_expense["Work"] == obra]["Value"].sum() if not obra_expense.empty else 0
-            saldo = receita - despesa
-            
-            obra_balance = pd.concat([
-                obra_balance, 
-                pd.DataFrame([{"Work": obra, "Receita": receita, "Despesa": despesa, "Saldo": saldo}])
-            ])
-        
-        if not obra_balance.empty:
-            # Ordenar por saldo
-            obra_balance = obra_balance.sort_values("Saldo", ascending=False)
-            
-            # Formatar valores para exibição
-            display_balance = obra_balance.copy()
-            display_balance["Receita"] = display_balance["Receita"].apply(format_currency_brl)
-            display_balance["Despesa"] = display_balance["Despesa"].apply(format_currency_brl)
-            display_balance["Saldo"] = display_balance["Saldo"].apply(format_currency_brl)
-            
-            # Exibir tabela
-            st.dataframe(
-                display_balance.rename(columns={"Work": "Obra"}),
-                use_container_width=True
             )
-            
-            # Gráfico de barras para o saldo
-            fig_balance = go.Figure()
-            
-            # Adicionar barras para cada obra
-            for i, row in obra_balance.iterrows():
-                color = receita_color if row["Saldo"] >= 0 else despesa_color
-                
-                fig_balance.add_trace(go.Bar(
-                    x=[row["Work"]],
-                    y=[row["Saldo"]],
-                    name=row["Work"],
-                    marker_color=color
-                ))
-            
-            fig_balance.update_layout(
-                title="Saldo por Obra",
-                xaxis_title="Obra",
-                yaxis_title="Valor (R$)",
-                showlegend=False,
-                hovermode="closest"
+        with col2:
+            new_date = st.date_input(
+                "Nova data",
+                value=what_if.transactions[selected]["Date"],
+                format="DD/MM/YYYY",
+                key=f"what_if_move_{selected}"
             )
-            
-            st.plotly_chart(fig_balance, use_container_width=True)
-        else:
-            st.info("Não há dados suficientes para calcular o saldo por Obra.")
-    
-    # Tabela detalhada de transações
-    st.subheader("Transações Detalhadas")
-    
-    # Permitir ao usuário ordenar e filtrar a tabela de transações
-    sort_by = st.selectbox(
-        "Ordenar por",
-        options=["Data (mais recente primeiro)", "Data (mais antiga primeiro)", "Valor (maior primeiro)", "Valor (menor primeiro)"]
-    )
-    
-    if sort_by == "Data (mais recente primeiro)":
-        filtered_df = filtered_df.sort_values("Date", ascending=False)
-    elif sort_by == "Data (mais antiga primeiro)":
-        filtered_df = filtered_df.sort_values("Date", ascending=True)
-    elif sort_by == "Valor (maior primeiro)":
-        filtered_df = filtered_df.sort_values("Value", ascending=False)
-    else:  # Valor (menor primeiro)
-        filtered_df = filtered_df.sort_values("Value", ascending=True)
-    
-    # Formatar o dataframe para exibição
-    display_df = filtered_df.copy()
-    display_df["Date"] = display_df["Date"].dt.strftime("%d/%m/%Y")
-    display_df["Value"] = display_df["Value"].apply(format_currency_brl)
-    
-    # Mostrar tabela com colunas selecionadas
-    columns_to_show = ["Date", "Company", "Type", "Work", "Supplier/Client", "Value"]
-    column_names = {
-        "Date": "Data", 
-        "Company": "Empresa", 
-        "Type": "Tipo", 
-        "Work": "Obra", 
-        "Supplier/Client": "Fornecedor/Cliente", 
-        "Value": "Valor"
-    }
-    
-    display_df = display_df[columns_to_show].rename(columns=column_names)
-    st.dataframe(display_df, use_container_width=True)
\ No newline at end of file
+        with col3:
+            st.button("Mover", on_click=_edited, args=(what_if.move_transaction, selected, new_date))
+        with col4:
+            st.button("Remover", on_click=_edited, args=(what_if.remove_transaction, selected))
+    mark("Transações previstas", rows=len(planned))
@@ -3,8 +3,11 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
-import calendar
 from utils.data_processor import format_currency_brl
+from utils.display import brl_column_config
+from utils.monthly import get_monthly_matrix
+from utils.topn import top_transactions
+from utils.profiler import mark, profile_fragment
 
 def show_monthly_view(df):
     """
@@ -19,9 +22,12 @@ def show_monthly_view(df):
         st.warning("Nenhum dado disponível com os filtros atuais.")
         return
     
+    # Matriz Ano × Mês × direção, calculada uma vez por versão dos dados
+    matrix = get_monthly_matrix(df)
+    
     # Get current year and available years for selection
     current_year = datetime.now().year
-    available_years = sorted(df["Year"].unique().tolist())
+    available_years = matrix.years.tolist()
     
     if not available_years:
         st.warning("Nenhum dado de ano disponível.")
@@ -32,33 +38,13 @@ def show_monthly_view(df):
     # Year selection
     selected_year = st.selectbox("Selecione o Ano", available_years, index=available_years.index(default_year) if default_year in available_years else 0)
     
-    # Filter data for selected year
-    year_df = df[df["Year"] == selected_year].copy()
-    
-    if year_df.empty:
+    if selected_year not in matrix:
         st.warning(f"Nenhum dado disponível para {selected_year}.")
         return
     
-    # Prepare monthly aggregation
-    monthly_data = []
-    
-    for month in range(1, 13):
-        month_name = calendar.month_name[month]
-        month_df = year_df[year_df["Month"] == month]
-        
-        income = month_df[month_df["Type"] == "Entrada"]["Value"].sum()
-        expense = month_df[month_df["Type"] == "Saída"]["Value"].sum()
-        net = income - expense
-        
-        monthly_data.append({
-            "Month": month,
-            "Month Name": month_name,
-            "Income": income,
-            "Expense": expense,
-            "Net": net
-        })
-    
-    monthly_df = pd.DataFrame(monthly_data)
+    # Trocar o ano apenas fatia a matriz (12 meses, meses sem movimento = 0)
+    monthly_df = matrix.year_frame(selected_year)
+    mark("Matriz mensal", rows=len(matrix.years) * 12)
     
     # Create visualizations
     col1, col2 = st.columns([2, 1])
@@ -126,14 +112,8 @@ def show_monthly_view(df):
     # Monthly breakdown table
     st.subheader("Detalhamento Mensal")
     
-    # Format the dataframe for display
-    display_df = monthly_df.copy()
-    display_df["Income"] = display_df["Income"].apply(format_currency_brl)
-    display_df["Expense"] = display_df["Expense"].apply(format_currency_brl)
-    display_df["Net"] = display_df["Net"].apply(format_currency_brl)
-    
-    # Rename display columns
-    display_df = display_df[["Month Name", "Income", "Expense", "Net"]].rename(columns={
+    # Rename display columns (valores numéricos, formatados na exibição)
+    display_df = monthly_df[["Month Name", "Income", "Expense", "Net"]].rename(columns={
         "Month Name": "Mês",
         "Income": "Receitas",
         "Expense": "Despesas",
@@ -141,7 +121,14 @@ def show_monthly_view(df):
     })
     
     # Only show Month Name and financial columns
-    st.dataframe(display_df, use_container_width=True)
+    st.dataframe(
+        display_df, use_container_width=True, column_config=brl_column_config("Receitas", "Despesas", "Líquido")
+    )
+    mark("Gráfico e detalhamento mensal", rows=len(display_df), output=fig)
+    
+    # Comparação entre anos: fatias da mesma matriz, sem novas agregações
+    if len(available_years) > 1:
+        _show_year_comparison(matrix, available_years, selected_year, monthly_df["Month Name"].tolist())
     
     # Top transactions for the year
     st.subheader("Principais Transações")
@@ -149,7 +136,7 @@ def show_monthly_view(df):
     tab1, tab2 = st.tabs(["Maiores Despesas", "Maiores Receitas"])
     
     with tab1:
-        top_expenses = year_df[year_df["Type"] == "Saída"].sort_values("Value", ascending=False).head(10)
+        top_expenses = top_transactions(df, {"Year": selected_year}, "Saída")
         if not top_expenses.empty:
             expense_fig = px.bar(
                 top_expenses,
@@ -165,7 +152,7 @@ def show_monthly_view(df):
             st.info("Não há dados de despesas disponíveis.")
     
     with tab2:
-        top_income = year_df[year_df["Type"] == "Entrada"].sort_values("Value", ascending=False).head(10)
+        top_income = top_transactions(df, {"Year": selected_year}, "Entrada")
         if not top_income.empty:
             income_fig = px.bar(
                 top_income,
@@ -179,3 +166,52 @@ def show_monthly_view(df):
             st.plotly_chart(income_fig, use_container_width=True)
         else:
             st.info("Não há dados de receitas disponíveis.")
+    mark("Principais transações", rows=len(top_expenses) + len(top_income))
+
+
+@st.fragment
+@profile_fragment("Comparação entre anos")
+def _show_year_comparison(matrix, available_years, selected_year, month_names):
+    """
+    Comparação de uma medida mensal entre anos (fragmento: trocar anos ou
+    medida reexecuta só este gráfico)
+
+    Args:
+        matrix (utils.monthly.MonthlyMatrix): Matriz mensal
+        available_years (list): Anos disponíveis
+        selected_year (int): Ano selecionado na visualização
+        month_names (list): Nomes dos meses (eixo x)
+    """
+    st.subheader("Comparação entre Anos")
+    
+    col1, col2 = st.columns([3, 1])
+    with col1:
+        previous_year = selected_year - 1 if selected_year - 1 in matrix else None
+        compared_years = st.multiselect(
+            "Anos comparados",
+            options=available_years,
+            default=[year for year in (previous_year, selected_year) if year is not None]
+        )
+    with col2:
+        measure_labels = {"Net": "Líquido", "Income": "Receitas", "Expense": "Despesas"}
+        measure = st.radio("Medida", options=list(measure_labels), format_func=measure_labels.get)
+
+    if compared_years:
+        comparison = matrix.comparison(sorted(compared_years), measure)
+        comparison_fig = go.Figure()
+        for year in comparison.columns:
+            comparison_fig.add_trace(go.Scatter(
+                x=month_names,
+                y=comparison[year],
+                name=str(year),
+                mode="lines+markers"
+            ))
+        comparison_fig.update_layout(
+            title=f"{measure_labels[measure]} por Mês",
+            xaxis_title="Mês",
+            yaxis_title="Valor (R$)",
+            legend_title="Ano",
+            hovermode="x unified"
+        )
+        st.plotly_chart(comparison_fig, use_container_width=True)
+    mark("Comparação entre anos")
@@ -5,6 +5,12 @@ import plotly.graph_objects as go
 from datetime import datetime, timedelta
 import calendar
 from utils.data_processor import format_currency_brl
+from utils.query import aggregate, canonical_filters
+from utils.date_index import slice_by_date
+from utils.topn import top_counterparties
+from utils.transaction_grid import show_transaction_grid
+from utils.charts import GRANULARITY_LABELS, choose_granularity, get_figure, line_trace
+from utils.profiler import mark
 
 def show_period_view(df):
     """
@@ -47,7 +53,8 @@ def show_period_view(df):
         
         if len(date_range) == 2:
             start_date, end_date = date_range
-            filtered_df = df[(df["Date"].dt.date >= start_date) & (df["Date"].dt.date <= end_date)]
+            filtered_df = slice_by_date(df, start_date, end_date)
+            period_filters = {"start_date": start_date, "end_date": end_date}
             # Formato brasileiro de data
             period_title = f"{start_date.strftime('%d/%m/%Y')} a {end_date.strftime('%d/%m/%Y')}"
         else:
@@ -79,7 +86,8 @@ def show_period_view(df):
             
         start_date_dt = pd.to_datetime(start_date)
         end_date_dt = pd.to_datetime(end_date)
-        filtered_df = df[(df["Date"] >= start_date_dt) & (df["Date"] <= end_date_dt)]
+        filtered_df = slice_by_date(df, start_date_dt, end_date_dt)
+        period_filters = {"start_date": start_date_dt, "end_date": end_date_dt}
         period_title = f"{quarter} {selected_year}"
     
     elif period_type == "Semestre":
@@ -101,7 +109,8 @@ def show_period_view(df):
             
         start_date_dt = pd.to_datetime(start_date)
         end_date_dt = pd.to_datetime(end_date)
-        filtered_df = df[(df["Date"] >= start_date_dt) & (df["Date"] <= end_date_dt)]
+        filtered_df = slice_by_date(df, start_date_dt, end_date_dt)
+        period_filters = {"start_date": start_date_dt, "end_date": end_date_dt}
         period_title = f"{half} {selected_year}"
     
     else:  # Meses Personalizados
@@ -129,12 +138,16 @@ def show_period_view(df):
         
         # Obter números dos meses
         month_nums = [month[0] for month in selected_months]
-        filtered_df = df[(df["Year"] == selected_year) & (df["Month"].isin(month_nums))]
+        year_df = slice_by_date(df, f"{selected_year}-01-01", f"{selected_year}-12-31")
+        filtered_df = year_df[year_df["Month"].isin(month_nums)]
+        period_filters = {"Year": selected_year, "Month": month_nums}
         
         # Criar título do período com nomes dos meses
         month_names = [month[1] for month in selected_months]
         period_title = f"{', '.join(month_names)} de {selected_year}"
     
+    mark("Recorte do período", rows=len(filtered_df))
+    
     # Verificar se temos dados para o período selecionado
     if filtered_df.empty:
         st.warning(f"Não há dados disponíveis para o período selecionado: {period_title}")
@@ -154,12 +167,14 @@ def show_period_view(df):
         
         col1, col2, col3, col4 = st.columns(4)
         
-        income_df = filtered_df[filtered_df["Type"] == "Entrada"]
-        expense_df = filtered_df[filtered_df["Type"] == "Saída"]
+        totals = aggregate(
+            df, filters=period_filters,
+            pivot="Type", columns=["Entrada", "Saída"], net=("Entrada", "Saída")
+        ).iloc[0]
         
-        total_income = income_df["Value"].sum()
-        total_expense = expense_df["Value"].sum()
-        net_cashflow = total_income - total_expense
+        total_income = totals["Entrada"]
+        total_expense = totals["Saída"]
+        net_cashflow = totals["Net"]
         
         with col1:
             st.metric("Receitas Totais", format_currency_brl(total_income))
@@ -176,61 +191,23 @@ def show_period_view(df):
         
         with col4:
             # Calcular transações únicas e empresas
-            st.metric("Total de Transações", filtered_df.shape[0])
+            transaction_count = aggregate(df, filters=period_filters, measure="Count")["Count"].iloc[0]
+            st.metric("Total de Transações", int(transaction_count))
+        mark("Resumo do período")
     
     # Tendências ao longo do tempo (se aplicável)
     with trends_container:
         st.subheader("Tendências de Fluxo de Caixa")
         
-        # Agrupar por data para análise de tendência
-        daily_data = filtered_df.groupby(["Date", "Type"])["Value"].sum().unstack(fill_value=0).reset_index()
-        
-        if "Entrada" not in daily_data.columns:
-            daily_data["Entrada"] = 0
-        
-        if "Saída" not in daily_data.columns:
-            daily_data["Saída"] = 0
-        
-        daily_data["Net"] = daily_data["Entrada"] - daily_data["Saída"]
-        daily_data["Cumulative Net"] = daily_data["Net"].cumsum()
-        
-        # Gráfico de linha para fluxo de caixa acumulado
-        fig = go.Figure()
-        
-        fig.add_trace(go.Scatter(
-            x=daily_data["Date"],
-            y=daily_data["Cumulative Net"],
-            mode="lines",
-            name="Fluxo de Caixa Acumulado",
-            line=dict(width=3, color="blue")
-        ))
-        
-        # Adicionar receitas e despesas como gráfico de barras
-        fig.add_trace(go.Bar(
-            x=daily_data["Date"],
-            y=daily_data["Entrada"],
-            name="Receitas",
-            marker_color="green",
-            opacity=0.7
-        ))
-        
-        fig.add_trace(go.Bar(
-            x=daily_data["Date"],
-            y=daily_data["Saída"] * -1,  # Negativo para mostrar abaixo do eixo
-            name="Despesas",
-            marker_color="red",
-            opacity=0.7
-        ))
-        
-        fig.update_layout(
-            title="Tendências Diárias de Fluxo de Caixa",
-            barmode="relative",
-            xaxis_title="Data",
-            yaxis_title="Valor (R$)",
-            hovermode="x unified"
+        # Figura em cache por versão dos dados e período selecionado
+        granularity = choose_granularity(filtered_df["Date"].min(), filtered_df["Date"].max())
+        fig = get_figure(
+            df, "period_trends", canonical_filters(period_filters),
+            lambda: _trends_figure(df, period_filters, granularity)
         )
         
         st.plotly_chart(fig, use_container_width=True)
+        mark("Tendências de fluxo de caixa", output=fig)
     
     # Análise por categorias
     with breakdown_container:
@@ -243,7 +220,7 @@ def show_period_view(df):
             
             # Análise de despesas por código de trabalho
             with col1:
-                expense_by_work = expense_df.groupby("Work")["Value"].sum().reset_index()
+                expense_by_work = aggregate(df, ["Work"], {**period_filters, "Type": "Saída"})
                 if not expense_by_work.empty:
                     expense_by_work = expense_by_work.sort_values("Value", ascending=False)
                     
@@ -261,7 +238,7 @@ def show_period_view(df):
             
             # Análise de receitas por código de trabalho
             with col2:
-                income_by_work = income_df.groupby("Work")["Value"].sum().reset_index()
+                income_by_work = aggregate(df, ["Work"], {**period_filters, "Type": "Entrada"})
                 if not income_by_work.empty:
                     income_by_work = income_by_work.sort_values("Value", ascending=False)
                     
@@ -276,6 +253,7 @@ def show_period_view(df):
                     st.plotly_chart(fig, use_container_width=True)
                 else:
                     st.info("Não há dados de receitas para análise por Obra.")
+            mark("Análise por Obra", rows=len(expense_by_work) + len(income_by_work))
         
         with tab2:
             # Mostrar principais fornecedores/clientes
@@ -283,8 +261,7 @@ def show_period_view(df):
             
             # Principais fornecedores de despesas
             with col1:
-                top_suppliers = expense_df.groupby("Supplier/Client")["Value"].sum().reset_index()
-                top_suppliers = top_suppliers.sort_values("Value", ascending=False).head(10)
+                top_suppliers = top_counterparties(df, period_filters, "Saída")
                 
                 if not top_suppliers.empty:
                     fig = px.bar(
@@ -303,8 +280,7 @@ def show_period_view(df):
             
             # Principais clientes de receitas
             with col2:
-                top_clients = income_df.groupby("Supplier/Client")["Value"].sum().reset_index()
-                top_clients = top_clients.sort_values("Value", ascending=False).head(10)
+                top_clients = top_counterparties(df, period_filters, "Entrada")
                 
                 if not top_clients.empty:
                     fig = px.bar(
@@ -320,40 +296,61 @@ def show_period_view(df):
                     st.plotly_chart(fig, use_container_width=True)
                 else:
                     st.info("Não há dados de clientes disponíveis.")
+            mark("Fornecedores e clientes", rows=len(top_suppliers) + len(top_clients))
     
     # Tabela detalhada de transações
     st.subheader("Transações Detalhadas")
     
-    # Permitir ao usuário ordenar e filtrar a tabela de transações
-    sort_by = st.selectbox(
-        "Ordenar por",
-        options=["Data (mais recente primeiro)", "Data (mais antiga primeiro)", "Valor (maior primeiro)", "Valor (menor primeiro)"]
+    show_transaction_grid(df, filtered_df, key="period_transactions")
+
+
+def _trends_figure(df, period_filters, granularity):
+    # Agrupar por data para análise de tendência; as barras usam dia, semana
+    # ou mês conforme o tamanho do período
+    daily_data = aggregate(
+        df, ["Date"], period_filters,
+        pivot="Type", columns=["Entrada", "Saída"], net=("Entrada", "Saída")
+    )
+    daily_data["Cumulative Net"] = daily_data["Net"].cumsum()
+    bar_data = daily_data if granularity == "day" else aggregate(
+        df, ["Date"], period_filters, granularity=granularity,
+        pivot="Type", columns=["Entrada", "Saída"]
+    )
+
+    # Gráfico de linha para fluxo de caixa acumulado (reduzido por LTTB em períodos longos)
+    fig = go.Figure()
+
+    fig.add_trace(line_trace(
+        daily_data["Date"],
+        daily_data["Cumulative Net"],
+        mode="lines",
+        name="Fluxo de Caixa Acumulado",
+        line=dict(width=3, color="blue")
+    ))
+
+    # Adicionar receitas e despesas como gráfico de barras
+    fig.add_trace(go.Bar(
+        x=bar_data["Date"],
+        y=bar_data["Entrada"],
+        name="Receitas",
+        marker_color="green",
+        opacity=0.7
+    ))
+
+    fig.add_trace(go.Bar(
+        x=bar_data["Date"],
+        y=bar_data["Saída"] * -1,  # Negativo para mostrar abaixo do eixo
+        name="Despesas",
+        marker_color="red",
+        opacity=0.7
+    ))
+
+    fig.update_layout(
+        title=f"Tendências de Fluxo de Caixa ({GRANULARITY_LABELS[granularity]})",
+        barmode="relative",
+        xaxis_title="Data",
+        yaxis_title="Valor (R$)",
+        hovermode="x unified"
     )
     
-    if sort_by == "Data (mais recente primeiro)":
-        filtered_df = filtered_df.sort_values("Date", ascending=False)
-    elif sort_by == "Data (mais antiga primeiro)":
-        filtered_df = filtered_df.sort_values("Date", ascending=True)
-    elif sort_by == "Valor (maior primeiro)":
-        filtered_df = filtered_df.sort_values("Value", ascending=False)
-    else:  # Valor (menor primeiro)
-        filtered_df = filtered_df.sort_values("Value", ascending=True)
-    
-    # Formatar o dataframe para exibição
-    display_df = filtered_df.copy()
-    display_df["Date"] = display_df["Date"].dt.strftime("%d/%m/%Y")
-    display_df["Value"] = display_df["Value"].apply(format_currency_brl)
-    
-    # Mostrar tabela com colunas selecionadas
-    columns_to_show = ["Date", "Company", "Type", "Work", "Supplier/Client", "Value"]
-    column_names = {
-        "Date": "Data", 
-        "Company": "Empresa", 
-        "Type": "Tipo", 
-        "Work": "Obra", 
-        "Supplier/Client": "Fornecedor/Cliente", 
-        "Value": "Valor"
-    }
-    
-    display_df = display_df[columns_to_show].rename(columns=column_names)
-    st.dataframe(display_df, use_container_width=True)
+    return fig
@@ -1,14 +1,14 @@
 import streamlit as st
-import pandas as pd
 from datetime import datetime
 import pytz
-import io
-from utils.google_sheets import fetch_google_sheet_data, get_sheet_names
-import requests
-import re
+from utils.google_sheets import fetch_google_sheet_data, get_workbook, get_uploaded_workbook
 from config import save_config, load_config
 from utils.data_processor import process_data
 
+# Linhas lidas para as prévias: dados brutos e amostra processada
+PREVIEW_ROWS = 5
+SAMPLE_ROWS = 500
+
 def show_settings_view():
     """
     Mostra a página de configurações do sistema
@@ -46,22 +46,26 @@ def show_settings_view():
         save_config(config)
     
     try:
-        # Obter todas as abas disponíveis
-        excel_file = pd.ExcelFile(io.BytesIO(requests.get(f"https://docs.google.com/spreadsheets/d/{re.search(r'/d/([a-zA-Z0-9-_]+)', new_url).group(1)}/export?format=xlsx").content))
-        available_sheets = excel_file.sheet_names
+        # Planilha baixada uma única vez por URL; os reruns reaproveitam a mesma cópia
+        col1, col2 = st.columns([4, 1])
+        with col2:
+            reload = st.button("Recarregar planilha", help="Baixa novamente a planilha do Google Sheets")
+        workbook = get_workbook(new_url, reload=reload)
+        available_sheets = workbook.sheet_names
         
         # Se não houver aba selecionada, usar a primeira ou a última salva
         if st.session_state.gs_selected_sheet is None:
             st.session_state.gs_selected_sheet = config.get('gs_selected_sheet', available_sheets[0])
         
         # Mostrar seleção de aba
-        selected_sheet = st.selectbox(
-            "Selecione a aba com os dados financeiros",
-            options=available_sheets,
-            index=available_sheets.index(st.session_state.gs_selected_sheet) if st.session_state.gs_selected_sheet in available_sheets else 0,
-            key="gs_sheet_selector",
-            help="Escolha a aba que contém os dados financeiros"
-        )
+        with col1:
+            selected_sheet = st.selectbox(
+                "Selecione a aba com os dados financeiros",
+                options=available_sheets,
+                index=available_sheets.index(st.session_state.gs_selected_sheet) if st.session_state.gs_selected_sheet in available_sheets else 0,
+                key="gs_sheet_selector",
+                help="Escolha a aba que contém os dados financeiros"
+            )
         
         # Atualizar a aba selecionada na sessão e no arquivo de configuração
         if selected_sheet != st.session_state.gs_selected_sheet:
@@ -77,57 +81,13 @@ def show_settings_view():
             
             st.success(f"Aba '{selected_sheet}' selecionada!")
         
-        # Mostrar prévia dos dados da aba selecionada
-        with st.expander("Prévia dos dados da aba selecionada"):
-            preview_df = pd.read_excel(io.BytesIO(requests.get(f"https://docs.google.com/spreadsheets/d/{re.search(r'/d/([a-zA-Z0-9-_]+)', new_url).group(1)}/export?format=xlsx").content), sheet_name=selected_sheet, nrows=5)
-            st.dataframe(preview_df)
-        
-        # Carregar e processar os dados usando a função fetch_google_sheet_data
-        processed_preview = fetch_google_sheet_data(new_url, sheet_name=selected_sheet)
-        
-        if processed_preview is not None and not processed_preview.empty:
-            # Mostrar informações de debug
-            with st.expander("Informações de Debug", expanded=False):
-                st.write("**Colunas disponíveis:**")
-                st.write(processed_preview.columns.tolist())
-                st.write("**Tipos de dados:**")
-                st.write(processed_preview.dtypes)
-                st.write("**Primeiras linhas dos dados brutos:**")
-                st.dataframe(processed_preview.head())
-            
-            # Mostrar prévia dos dados processados
-            with st.expander("Prévia dos dados processados"):
-                try:
-                    st.write("**Informações gerais:**")
-                    st.write(f"- Total de registros: {len(processed_preview)}")
-                    
-                    # Verificar se as colunas necessárias existem
-                    if 'Date' in processed_preview.columns:
-                        st.write(f"- Período: {processed_preview['Date'].min().strftime('%d/%m/%Y')} a {processed_preview['Date'].max().strftime('%d/%m/%Y')}")
-                    else:
-                        st.error("Coluna 'Date' não encontrada nos dados processados")
-                    
-                    if 'Type' in processed_preview.columns and 'Value' in processed_preview.columns:
-                        receitas = processed_preview[processed_preview['Type'] == 'Entrada']['Value'].sum()
-                        despesas = processed_preview[processed_preview['Type'] == 'Saída']['Value'].sum()
-                        st.write(f"- Total de receitas: R$ {receitas:,.2f}")
-                        st.write(f"- Total de despesas: R$ {despesas:,.2f}")
-                        st.write(f"- Saldo: R$ {(receitas + despesas):,.2f}")  # Despesas já são negativas
-                    else:
-                        st.error("Colunas 'Type' ou 'Value' não encontradas nos dados processados")
-                    
-                    st.write("**Amostra dos dados processados:**")
-                    st.dataframe(processed_preview.head())
-                except Exception as e:
-                    st.error(f"Erro ao mostrar informações dos dados: {str(e)}")
-                    st.write("**Amostra dos dados processados:**")
-                    st.dataframe(processed_preview.head())
-            
+        # Prévias limitadas em linhas; a aba inteira só é processada ao carregar
+        if _show_previews(workbook, selected_sheet):
             # Botão para carregar os dados
             if st.button("Carregar dados do Google Sheets"):
                 with st.spinner("Carregando dados..."):
-                    # Atualizar os dados na sessão
-                    st.session_state.data = processed_preview
+                    # Atualizar os dados na sessão (aba completa, a partir da planilha em cache)
+                    st.session_state.data = fetch_google_sheet_data(new_url, sheet_name=selected_sheet, workbook=workbook)
                     st.session_state.last_refresh = datetime.now(pytz.timezone('America/Sao_Paulo'))
                     st.session_state.current_data_source = "google_sheets"
                     st.session_state.current_sheet = selected_sheet
@@ -153,19 +113,23 @@ def show_settings_view():
     # Se um arquivo foi carregado, mostrar seleção de aba
     if uploaded_file is not None:
         try:
-            # Limpar dados antigos ao carregar novo arquivo
-            st.session_state.data = None
-            st.session_state.last_refresh = None
-            st.session_state.current_data_source = None
-            st.session_state.current_sheet = None
-            st.session_state.uploaded_file = uploaded_file
+            workbook = get_uploaded_workbook(uploaded_file)
             
-            # Ler todas as abas disponíveis
-            excel_file = pd.ExcelFile(uploaded_file)
-            available_sheets = excel_file.sheet_names
+            # Limpar dados antigos apenas quando um novo arquivo é carregado
+            upload_key = (getattr(uploaded_file, "file_id", None), uploaded_file.name, uploaded_file.size)
+            if st.session_state.get("uploaded_file_key") != upload_key:
+                st.session_state.uploaded_file_key = upload_key
+                st.session_state.data = None
+                st.session_state.last_refresh = None
+                st.session_state.current_data_source = None
+                st.session_state.current_sheet = None
+                st.session_state.uploaded_file = uploaded_file
+            
+            # Abas disponíveis
+            available_sheets = workbook.sheet_names
             
             # Inicializar a aba selecionada na sessão se ainda não existir
-            if 'local_selected_sheet' not in st.session_state:
+            if st.session_state.get('local_selected_sheet') not in available_sheets:
                 st.session_state.local_selected_sheet = available_sheets[0]
             
             # Selecionar a aba
@@ -186,58 +150,12 @@ def show_settings_view():
                 st.session_state.current_sheet = None
                 st.success(f"Aba '{selected_sheet}' selecionada!")
             
-            # Mostrar prévia dos dados da aba selecionada
-            with st.expander("Prévia dos dados da aba selecionada"):
-                preview_df = pd.read_excel(uploaded_file, sheet_name=selected_sheet, nrows=5)
-                st.dataframe(preview_df)
-            
-            # Ler e processar os dados
-            raw_data = pd.read_excel(uploaded_file, sheet_name=selected_sheet, engine='openpyxl')
-            processed_preview = process_data(raw_data)
-            
-            if processed_preview is not None and not processed_preview.empty:
-                # Mostrar informações de debug
-                with st.expander("Informações de Debug", expanded=False):
-                    st.write("**Colunas disponíveis:**")
-                    st.write(processed_preview.columns.tolist())
-                    st.write("**Tipos de dados:**")
-                    st.write(processed_preview.dtypes)
-                    st.write("**Primeiras linhas dos dados brutos:**")
-                    st.dataframe(processed_preview.head())
-                
-                # Mostrar prévia dos dados processados
-                with st.expander("Prévia dos dados processados"):
-                    try:
-                        st.write("**Informações gerais:**")
-                        st.write(f"- Total de registros: {len(processed_preview)}")
-                        
-                        # Verificar se as colunas necessárias existem
-                        if 'Date' in processed_preview.columns:
-                            st.write(f"- Período: {processed_preview['Date'].min().strftime('%d/%m/%Y')} a {processed_preview['Date'].max().strftime('%d/%m/%Y')}")
-                        else:
-                            st.error("Coluna 'Date' não encontrada nos dados processados")
-                        
-                        if 'Type' in processed_preview.columns and 'Value' in processed_preview.columns:
-                            receitas = processed_preview[processed_preview['Type'] == 'Entrada']['Value'].sum()
-                            despesas = processed_preview[processed_preview['Type'] == 'Saída']['Value'].sum()
-                            st.write(f"- Total de receitas: R$ {receitas:,.2f}")
-                            st.write(f"- Total de despesas: R$ {despesas:,.2f}")
-                            st.write(f"- Saldo: R$ {(receitas + despesas):,.2f}")  # Despesas já são negativas
-                        else:
-                            st.error("Colunas 'Type' ou 'Value' não encontradas nos dados processados")
-                        
-                        st.write("**Amostra dos dados processados:**")
-                        st.dataframe(processed_preview.head())
-                    except Exception as e:
-                        st.error(f"Erro ao mostrar informações dos dados: {str(e)}")
-                        st.write("**Amostra dos dados processados:**")
-                        st.dataframe(processed_preview.head())
-                
+            if _show_previews(workbook, selected_sheet):
                 # Botão para carregar os dados
                 if st.button("Carregar dados da aba selecionada"):
                     with st.spinner("Carregando arquivo..."):
-                        # Atualizar os dados na sessão
-                        st.session_state.data = processed_preview
+                        # Atualizar os dados na sessão (aba completa)
+                        st.session_state.data = process_data(workbook.read(selected_sheet))
                         st.session_state.last_refresh = datetime.now(pytz.timezone('America/Sao_Paulo'))
                         st.session_state.current_data_source = "local_file"
                         st.session_state.current_sheet = selected_sheet
@@ -262,4 +180,67 @@ def show_settings_view():
         st.info(f"Última atualização: {last_refresh_br.strftime('%d/%m/%Y %H:%M:%S')} (Brasil)")
     
     # Versão do sistema
-    st.caption("Versão 1.0.0") 
\ No newline at end of file
+    st.caption("Versão 1.0.0")
+
+
+def _show_previews(workbook, sheet_name):
+    """
+    Mostra as prévias de uma aba lendo apenas as primeiras linhas
+
+    A prévia bruta lê PREVIEW_ROWS linhas; a prévia processada e as
+    informações de debug usam uma amostra de SAMPLE_ROWS linhas processada
+    com process_data. O total de registros vem dos metadados da aba.
+
+    Args:
+        workbook (utils.google_sheets.Workbook): Planilha aberta
+        sheet_name (str): Aba selecionada
+
+    Returns:
+        bool: True se a amostra pôde ser processada
+    """
+    # Mostrar prévia dos dados da aba selecionada
+    with st.expander("Prévia dos dados da aba selecionada"):
+        st.dataframe(workbook.read(sheet_name, nrows=PREVIEW_ROWS))
+    
+    processed_sample = process_data(workbook.read(sheet_name, nrows=SAMPLE_ROWS))
+    if processed_sample is None or processed_sample.empty:
+        return False
+    
+    # Mostrar informações de debug
+    with st.expander("Informações de Debug", expanded=False):
+        st.write("**Colunas disponíveis:**")
+        st.write(processed_sample.columns.tolist())
+        st.write("**Tipos de dados:**")
+        st.write(processed_sample.dtypes)
+        st.write("**Primeiras linhas dos dados processados:**")
+        st.dataframe(processed_sample.head())
+    
+    # Mostrar prévia dos dados processados
+    with st.expander("Prévia dos dados processados"):
+        try:
+            st.write("**Informações gerais:**")
+            total_rows = workbook.row_count(sheet_name)
+            if total_rows is not None:
+                st.write(f"- Linhas na aba: {total_rows}")
+            st.write(f"- Amostra: primeiras {SAMPLE_ROWS} linhas ({len(processed_sample)} registros processados)")
+            
+            # Verificar se as colunas necessárias existem
+            if 'Date' in processed_sample.columns:
+                st.write(f"- Período da amostra: {processed_sample['Date'].min().strftime('%d/%m/%Y')} a {processed_sample['Date'].max().strftime('%d/%m/%Y')}")
+            else:
+                st.error("Coluna 'Date' não encontrada nos dados processados")
+            
+            if 'Type' in processed_sample.columns and 'Value' in processed_sample.columns:
+                receitas = processed_sample[processed_sample['Type'] == 'Entrada']['Value'].sum()
+                despesas = processed_sample[processed_sample['Type'] == 'Saída']['Value'].sum()
+                st.write(f"- Receitas na amostra: R$ {receitas:,.2f}")
+                st.write(f"- Despesas na amostra: R$ {despesas:,.2f}")
+            else:
+                st.error("Colunas 'Type' ou 'Value' não encontradas nos dados processados")
+        except Exception as e:
+            st.error(f"Erro ao mostrar informações dos dados: {str(e)}")
+        
+        st.write("**Amostra dos dados processados:**")
+        st.dataframe(processed_sample.head())
+    
+    return True
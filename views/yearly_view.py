@@ -3,7 +3,11 @@ import pandas as pd
 import plotly.express as px
 import plotly.graph_objects as go
 from datetime import datetime
+import calendar
 from utils.data_processor import format_currency_brl
+from utils.display import brl_column_config
+from utils.yearly import get_yearly_summary
+from utils.profiler import mark
 
 def show_yearly_view(df):
     """
@@ -18,8 +22,11 @@ def show_yearly_view(df):
         st.warning("Nenhum dado disponível com os filtros atuais.")
         return
     
+    # Totais trimestrais, mensais e por categoria de todos os anos, em cache por versão dos dados
+    summary = get_yearly_summary(df)
+    
     # Get all available years
-    available_years = sorted(df["Year"].unique().tolist())
+    available_years = summary.years.tolist()
     
     if not available_years:
         st.warning("Nenhum dado de ano disponível.")
@@ -33,22 +40,14 @@ def show_yearly_view(df):
         default_year_index = available_years.index(current_year) if current_year in available_years else len(available_years) - 1
         selected_year = st.selectbox("Selecione o Ano", available_years, index=default_year_index if available_years else 0)
     
-    # Filter data for selected year
-    year_df = df[df["Year"] == selected_year].copy()
-    
-    if year_df.empty:
+    if selected_year not in summary.monthly:
         st.warning(f"Nenhum dado disponível para {selected_year}.")
         return
     
     # Create year summary
     with col2:
         # Calculate metrics
-        income_df = year_df[year_df["Type"] == "Entrada"]
-        expense_df = year_df[year_df["Type"] == "Saída"]
-        
-        total_income = income_df["Value"].sum()
-        total_expense = expense_df["Value"].sum()
-        net_cashflow = total_income - total_expense
+        total_income, total_expense, net_cashflow = summary.totals(selected_year)
         
         # Show year summary metrics
         metrics_col1, metrics_col2, metrics_col3, metrics_col4 = st.columns(4)
@@ -68,8 +67,9 @@ def show_yearly_view(df):
         
         with metrics_col4:
             # Count unique work codes
-            unique_works = year_df["Work"].nunique()
+            unique_works = summary.category_count(selected_year, "Work")
             st.metric("Códigos de Trabalho", unique_works)
+    mark("Resumo anual", rows=len(available_years) * 12)
     
     # Yearly Overview Section
     st.subheader("Visão Geral Anual")
@@ -82,16 +82,7 @@ def show_yearly_view(df):
     # Quarterly breakdown
     with quarterly_container:
         # Prepare quarterly data
-        quarterly_data = year_df.groupby(["Quarter", "Type"])["Value"].sum().unstack(fill_value=0).reset_index()
-        
-        if "Receita" not in quarterly_data.columns:
-            quarterly_data["Receita"] = 0
-        
-        if "Despesa" not in quarterly_data.columns:
-            quarterly_data["Despesa"] = 0
-        
-        quarterly_data["Net"] = quarterly_data["Receita"] - quarterly_data["Despesa"]
-        quarterly_data["Quarter"] = quarterly_data["Quarter"].apply(lambda q: f"T{q}")
+        quarterly_data = summary.quarterly(selected_year).rename(columns={"Income": "Receita", "Expense": "Despesa"})
         
         col1, col2 = st.columns([2, 1])
         
@@ -137,33 +128,22 @@ def show_yearly_view(df):
             # Create quarterly metrics table
             st.subheader("Métricas Trimestrais")
             
-            # Format the dataframe for display
-            display_df = quarterly_data.copy()
-            display_df["Receita"] = display_df["Receita"].apply(format_currency_brl)
-            display_df["Despesa"] = display_df["Despesa"].apply(format_currency_brl)
-            display_df["Net"] = display_df["Net"].apply(format_currency_brl)
-            
-            # Renomear colunas para exibição
-            display_df = display_df[["Quarter", "Receita", "Despesa", "Net"]].rename(columns={
+            # Renomear colunas para exibição (valores numéricos, formatados na exibição)
+            display_df = quarterly_data[["Quarter", "Receita", "Despesa", "Net"]].rename(columns={
                 "Quarter": "Trimestre",
                 "Net": "Líquido"
             })
             
-            st.dataframe(display_df, use_container_width=True)
+            st.dataframe(
+                display_df, use_container_width=True, column_config=brl_column_config("Receita", "Despesa", "Líquido")
+            )
+    mark("Análise trimestral", rows=len(quarterly_data))
     
     # Monthly trends
     with trends_container:
         # Prepare monthly data
-        monthly_data = year_df.groupby(["Month", "Month Name", "Type"])["Value"].sum().unstack(fill_value=0).reset_index()
-        
-        if "Receita" not in monthly_data.columns:
-            monthly_data["Receita"] = 0
-        
-        if "Despesa" not in monthly_data.columns:
-            monthly_data["Despesa"] = 0
-        
-        monthly_data["Net"] = monthly_data["Receita"] - monthly_data["Despesa"]
-        monthly_data = monthly_data.sort_values("Month")
+        monthly_data = summary.monthly.year_frame(selected_year).rename(columns={"Income": "Receita", "Expense": "Despesa"})
+        monthly_data["Month Name"] = monthly_data["Month"].map(lambda m: calendar.month_abbr[m])
         
         # Create monthly trend chart
         fig = go.Figure()
@@ -204,6 +184,7 @@ def show_yearly_view(df):
         )
         
         st.plotly_chart(fig, use_container_width=True)
+    mark("Tendências mensais", rows=len(monthly_data), output=fig)
     
     # Category breakdown
     with category_container:
@@ -216,10 +197,8 @@ def show_yearly_view(df):
             
             # Income by work code
             with col1:
-                income_by_work = income_df.groupby("Work")["Value"].sum().reset_index()
+                income_by_work = summary.by_category(selected_year, "Work", "Income")
                 if not income_by_work.empty:
-                    income_by_work = income_by_work.sort_values("Value", ascending=False)
-                    
                     fig = px.pie(
                         income_by_work,
                         values="Value",
@@ -234,10 +213,8 @@ def show_yearly_view(df):
             
             # Expense by work code
             with col2:
-                expense_by_work = expense_df.groupby("Work")["Value"].sum().reset_index()
+                expense_by_work = summary.by_category(selected_year, "Work", "Expense")
                 if not expense_by_work.empty:
-                    expense_by_work = expense_by_work.sort_values("Value", ascending=False)
-                    
                     fig = px.pie(
                         expense_by_work,
                         values="Value",
@@ -252,17 +229,13 @@ def show_yearly_view(df):
         
         with tab2:
             # Only show if we have multiple companies
-            companies = year_df["Company"].unique()
-            
-            if len(companies) > 1:
+            if summary.category_count(selected_year, "Company") > 1:
                 col1, col2 = st.columns(2)
                 
                 # Income by company
                 with col1:
-                    income_by_company = income_df.groupby("Company")["Value"].sum().reset_index()
+                    income_by_company = summary.by_category(selected_year, "Company", "Income")
                     if not income_by_company.empty:
-                        income_by_company = income_by_company.sort_values("Value", ascending=False)
-                        
                         fig = px.pie(
                             income_by_company,
                             values="Value",
@@ -277,10 +250,8 @@ def show_yearly_view(df):
                 
                 # Expense by company
                 with col2:
-                    expense_by_company = expense_df.groupby("Company")["Value"].sum().reset_index()
+                    expense_by_company = summary.by_category(selected_year, "Company", "Expense")
                     if not expense_by_company.empty:
-                        expense_by_company = expense_by_company.sort_values("Value", ascending=False)
-                        
                         fig = px.pie(
                             expense_by_company,
                             values="Value",
@@ -294,21 +265,14 @@ def show_yearly_view(df):
                         st.info("Sem dados de despesa para análise por empresa.")
             else:
                 st.info("Apenas uma empresa encontrada nos dados filtrados.")
+    mark("Análise por categorias")
     
     # Year-over-Year Comparison (if we have more than one year of data)
     if len(available_years) > 1:
         st.subheader("Comparação Ano a Ano")
         
         # Prepare yearly comparison data
-        yearly_data = df.groupby(["Year", "Type"])["Value"].sum().unstack(fill_value=0).reset_index()
-        
-        if "Receita" not in yearly_data.columns:
-            yearly_data["Receita"] = 0
-        
-        if "Despesa" not in yearly_data.columns:
-            yearly_data["Despesa"] = 0
-        
-        yearly_data["Net"] = yearly_data["Receita"] - yearly_data["Despesa"]
+        yearly_data = summary.year_over_year().rename(columns={"Income": "Receita", "Expense": "Despesa"})
         
         # Create year-over-year comparison chart
         fig = go.Figure()
@@ -349,9 +313,6 @@ def show_yearly_view(df):
         
         # Create yearly metrics table
         yearly_data["Year"] = yearly_data["Year"].astype(str)
-        yearly_data["Receita"] = yearly_data["Receita"].apply(format_currency_brl)
-        yearly_data["Despesa"] = yearly_data["Despesa"].apply(format_currency_brl)
-        yearly_data["Net"] = yearly_data["Net"].apply(format_currency_brl)
         
         # Renomear colunas para exibição
         yearly_data = yearly_data[["Year", "Receita", "Despesa", "Net"]].rename(columns={
@@ -359,4 +320,7 @@ def show_yearly_view(df):
             "Net": "Líquido"
         })
         
-        st.dataframe(yearly_data, use_container_width=True)
+        st.dataframe(
+            yearly_data, use_container_width=True, column_config=brl_column_config("Receita", "Despesa", "Líquido")
+        )
+        mark("Comparação ano a ano", rows=len(yearly_data), output=fig)